@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.db.models.expressions import RawSQL
 from .models import CustomUser, Issue
+from . import search
 from datetime import date
 
 # CustomUser Admin using UserAdmin
@@ -38,6 +40,13 @@ class IssueAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at', 'reporter']
     list_editable = ['status', 'priority']
 
+    def get_search_results(self, request, queryset, search_term):
+        # Use the FTS5 index instead of icontains LIKE scans over search_fields
+        if search_term and search.match_query(search_term) and search.fts_available():
+            sql, params = search.matching_ids_sql(search_term)
+            return queryset.filter(pk__in=RawSQL(sql, params)), False
+        return super().get_search_results(request, queryset, search_term)
+
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         if db_field.name == "resolved_by":
             kwargs["queryset"] = CustomUser.objects.filter(role='admin')
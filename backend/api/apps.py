@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        # Inference workers opt in (CLASSIFIER_WARMUP=1) so the model is loaded
+        # before the first request; every other process never imports TensorFlow.
+        if getattr(settings, 'CLASSIFIER_WARMUP_ON_STARTUP', False):
+            from .classify import warmup
+            warmup()
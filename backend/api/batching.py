@@ -0,0 +1,114 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import numpy as np
+
+
+class BatchScheduler:
+    """Collects concurrent single-image prediction requests into one batch.
+
+    Callers block in `submit()` while a background worker waits up to
+    `max_wait_ms` (or until `max_batch_size` inputs are queued), stacks the
+    inputs into one array, calls `predict_fn` once and hands each caller its
+    own row of the output. Under load this turns N forward passes of batch 1
+    into roughly N / max_batch_size passes.
+
+    A caller whose batch hasn't finished within `timeout_s` stops waiting and
+    runs its input through `predict_fn` on its own, so a stuck or dead worker
+    slows requests down instead of hanging them.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=8, max_wait_ms=5, timeout_s=30):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.timeout = timeout_s
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._batches = 0
+        self._items = 0
+        self._largest_batch = 0
+        self._batch_sizes = {}
+        self._timeouts = 0
+
+    def submit(self, array, timeout=None):
+        """Queue one input (without the batch axis) and wait for its output row,
+        at most `timeout` (default `timeout_s`) seconds before predicting it
+        unbatched.
+        """
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((array, future))
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except FutureTimeout:
+            # Still queued: cancel it so the worker skips it if it recovers
+            future.cancel()
+            with self._lock:
+                self._timeouts += 1
+            print("[DL] ⚠️ Batch worker didn't answer in time; predicting unbatched")
+            return self.predict_fn(np.expand_dims(array, axis=0))[0]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+                "largest_batch": self._largest_batch,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "timeouts": self._timeouts,
+            }
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="classify-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Drop inputs whose callers gave up waiting
+            batch = [(array, future) for array, future in self._collect() if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            arrays, futures = zip(*batch)
+            try:
+                outputs = self.predict_fn(np.stack(arrays))
+                if len(outputs) != len(futures):
+                    raise ValueError(f"predict_fn returned {len(outputs)} rows for {len(futures)} inputs")
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            with self._lock:
+                size = len(batch)
+                self._batches += 1
+                self._items += size
+                self._largest_batch = max(self._largest_batch, size)
+                self._batch_sizes[size] = self._batch_sizes.get(size, 0) + 1
+
+            for future, output in zip(futures, outputs):
+                future.set_result(output)
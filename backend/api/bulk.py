@@ -0,0 +1,69 @@
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import live, response_cache, rollups
+from .models import Issue
+
+# Bulk status/priority changes for admin triage. The change is written with
+# one UPDATE per chunk of ids inside a single transaction instead of a model
+# save per issue, so everything the save path and its signals maintain is
+# done here in bulk: resolved_by/resolved_at/activity_at/updated_at in the
+# same statement, rollup buckets moved once per bucket, caches invalidated once,
+# one live feed message for the whole change.
+
+CHUNK_SIZE = 500
+
+UPDATED, UNCHANGED, NOT_FOUND = 'updated', 'unchanged', 'not_found'
+
+
+def update_issues(issues, user, status=None, priority=None, ids=None):
+    """Set `status` and/or `priority` on every issue in the `issues` queryset.
+    Resolving statuses record `user` as resolved_by. Returns {id: outcome};
+    ids listed in `ids` but not matched are reported as not_found.
+    """
+    now = timezone.now()
+    outcomes = {pk: NOT_FOUND for pk in ids or ()}
+    with transaction.atomic():
+        rows = list(issues.select_for_update().order_by('pk').values_list('pk', *rollups.ROLLUP_FIELDS))
+        changed, moves, events = [], [], []
+        for pk, created_at, category, old_status, old_priority, resolved_at, updated_at in rows:
+            new_status = status or old_status
+            new_priority = priority or old_priority
+            if (new_status, new_priority) == (old_status, old_priority):
+                outcomes[pk] = UNCHANGED
+                continue
+            outcomes[pk] = UPDATED
+            changed.append(pk)
+            events.append((pk, [name for name, old, new in (
+                (live.STATUS, old_status, new_status), (live.PRIORITY, old_priority, new_priority),
+            ) if old != new], {'status': new_status, 'priority': new_priority}))
+            if new_status in Issue.RESOLVED_STATUSES:
+                new_resolved_at = resolved_at or now
+            else:
+                new_resolved_at = None
+            moves.append((
+                rollups.bucket(created_at, category, old_status, old_priority, resolved_at, updated_at),
+                rollups.bucket(created_at, category, new_status, new_priority, new_resolved_at, now),
+            ))
+
+        changes = {'activity_at': now, 'updated_at': now}
+        if priority:
+            changes['priority'] = priority
+        if status:
+            changes['status'] = status
+            if status in Issue.RESOLVED_STATUSES:
+                # Rows already in this status (a priority-only change) keep their resolver
+                changes['resolved_by'] = Case(When(status=status, then=F('resolved_by')), default=Value(user.pk))
+                changes['resolved_at'] = Coalesce(F('resolved_at'), now)
+            else:
+                changes['resolved_at'] = None
+        for start in range(0, len(changed), CHUNK_SIZE):
+            Issue.objects.filter(pk__in=changed[start:start + CHUNK_SIZE]).update(**changes)
+
+        rollups.move_many(moves)
+        if changed:
+            response_cache.invalidate()
+        live.publish_many(events)
+    return outcomes
@@ -1,82 +1,270 @@
-from tensorflow.keras.preprocessing import image
 import numpy as np
+import io
 import os
+import threading
 import joblib
-from tensorflow.keras.models import load_model
+from PIL import Image
+from django.conf import settings
+from .batching import BatchScheduler
+from .inference import load_backend
+from .prediction_cache import PredictionCache, content_hash, perceptual_hash
+
+# TensorFlow is imported only when the model is first needed, so processes that
+# never classify (migrate, shell, admin-only workers) don't pay for it.
+# settings.CLASSIFIER_BACKEND picks the full Keras model or the quantized
+# TFLite export written by export_model.py.
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
-model_path = os.path.join(current_dir, 'model.keras')
+MODEL_PATHS = {
+    'keras': os.path.join(current_dir, 'model.keras'),
+    'tflite': os.path.join(current_dir, 'model.tflite'),
+}
+backend_name = getattr(settings, 'CLASSIFIER_BACKEND', 'keras')
+model_path = MODEL_PATHS.get(backend_name, MODEL_PATHS['keras'])
 labels_path = os.path.join(current_dir, 'class_labels.pkl')
- 
-
-# ✅ Load Model
-if os.path.exists(model_path):
-    model = load_model(model_path)
-    print(f"[DL] ✅ Model loaded from {model_path}")
-else:
-    print(f"[DL] ❌ Model not found")
-    model = None
-
-# ✅ Load Class Labels
-if os.path.exists(labels_path):
-    class_labels = joblib.load(open(labels_path, 'rb'))
-    print(f"[DL] ✅ Loaded class labels: {class_labels}")
-else:
-    class_labels = ['electricity', 'garbage', 'other', 'road', 'water']  # fallback
-    print("[DL] ⚠️ Using hardcoded class labels.")
-
-# def classify_issue_image(img_path):
-#     if model is None:
-#         print("[DL] ❌ Model not loaded. Returning default category.")
-#         return "other", 0.0
-
-#     try:
-#         img = image.load_img(img_path, target_size=(224, 224))
-#         img_array = image.img_to_array(img) / 255.0
-#         img_array = np.expand_dims(img_array, axis=0)
-
-#         predictions = model.predict(img_array)[0]
-#         predicted_index = np.argmax(predictions)
-#         predicted_class = class_labels[predicted_index]
-#         confidence = float(predictions[predicted_index])
-
-#         print(f"[DL] ✅ Prediction: {predicted_class} ({confidence*100:.2f}% confidence)")
-#         return predicted_class, confidence
-
-#     except Exception as e:
-#         print(f"[DL] ❌ Error classifying image: {e}")
-#         return "other", 0.0
-def classify_issue_image(img_path, threshold=0.5, other_threshold=0.9):
+
+IMAGE_SIZE = (224, 224)
+# Allowed ML categories. The UI and thresholds rely on this list.
+VALID_CATEGORIES = ['water', 'road', 'electricity', 'garbage', 'other']
+FALLBACK_LABELS = ['electricity', 'garbage', 'other', 'road', 'water']
+
+_model = None
+_model_version = None
+_class_labels = None
+_model_loaded = False
+_load_lock = threading.Lock()
+
+
+def get_model():
+    """Load the configured inference backend on first use (thread-safe).
+    None if its model artifact is missing.
+    """
+    global _model, _model_version, _model_loaded
+    if _model_loaded:
+        return _model
+    with _load_lock:
+        if not _model_loaded:
+            _model = load_backend(backend_name, model_path)
+            if _model is not None:
+                stat = os.stat(model_path)
+                _model_version = f"{backend_name}:{stat.st_size}:{stat.st_mtime_ns}"
+                print(f"[DL] ✅ Model loaded from {model_path} ({backend_name} backend)")
+            else:
+                print(f"[DL] ❌ Model not found")
+            _model_loaded = True
+    return _model
+
+
+def get_class_labels():
+    global _class_labels
+    if _class_labels is not None:
+        return _class_labels
+    with _load_lock:
+        if _class_labels is None:
+            if os.path.exists(labels_path):
+                with open(labels_path, 'rb') as f:
+                    _class_labels = joblib.load(f)
+                print(f"[DL] ✅ Loaded class labels: {_class_labels}")
+            else:
+                _class_labels = FALLBACK_LABELS
+                print("[DL] ⚠️ Using hardcoded class labels.")
+    return _class_labels
+
+
+def open_image(source):
+    """Open a path, raw bytes or file-like object with PIL. Pixel data is not
+    decoded until image_to_array(), so callers can inspect it (e.g. for
+    animation) on the same object first.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    return Image.open(source)
+
+
+def is_animated_image(img):
+    return getattr(img, "is_animated", False) or getattr(img, "n_frames", 1) > 1
+
+
+_buffers = threading.local()
+
+
+def image_to_array(img):
+    """Decode an opened image to a (224, 224, 3) float32 array in [0, 1].
+    JPEGs are decoded in draft mode, letting libjpeg scale by 1/2..1/8 while
+    decoding instead of producing a full 12MP frame just to shrink it. The
+    result is written into a per-thread buffer that the next call on the same
+    thread overwrites.
+    """
+    img.draft('RGB', IMAGE_SIZE)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    if img.size != IMAGE_SIZE:
+        img = img.resize(IMAGE_SIZE, Image.NEAREST)
+
+    buf = getattr(_buffers, 'array', None)
+    if buf is None:
+        buf = _buffers.array = np.empty((*IMAGE_SIZE, 3), dtype=np.float32)
+    np.multiply(np.asarray(img), 1.0 / 255.0, out=buf)
+    return buf
+
+
+def warmup():
+    """Load model and labels and run one dummy prediction so the first real
+    request doesn't pay for graph tracing. Returns False if there is no model.
+    """
+    get_class_labels()
+    model = get_model()
+    if model is None:
+        return False
+    model.predict(np.zeros((1, *IMAGE_SIZE, 3), dtype=np.float32))
+    return True
+
+# ✅ Batch concurrent requests into one forward pass
+def _predict_batch(batch):
+    probabilities, embeddings = get_model().predict(batch)
+    if embeddings is None:
+        embeddings = [None] * len(probabilities)
+    return list(zip(probabilities, embeddings))
+
+scheduler = BatchScheduler(
+    _predict_batch,
+    max_batch_size=getattr(settings, 'CLASSIFIER_BATCH_MAX_SIZE', 8),
+    max_wait_ms=getattr(settings, 'CLASSIFIER_BATCH_MAX_WAIT_MS', 5),
+    timeout_s=getattr(settings, 'CLASSIFIER_BATCH_TIMEOUT_S', 30),
+)
+
+
+# ✅ Cache predictions so the same (or a near-identical) photo is only run once
+prediction_cache = PredictionCache(
+    max_entries=getattr(settings, 'CLASSIFIER_CACHE_SIZE', 2048),
+    phash_max_distance=getattr(settings, 'CLASSIFIER_CACHE_PHASH_DISTANCE', None),
+)
+
+
+def model_version():
+    """Identifies the loaded model artifact; part of every cache key."""
+    get_model()
+    return _model_version
+
+
+def predict_one(img_array):
+    """(probabilities, embedding) for one preprocessed (224, 224, 3) image.
+    The embedding is None if the backend doesn't expose it.
+    """
+    if getattr(settings, 'CLASSIFIER_BATCHING', True):
+        return scheduler.submit(img_array)
+    return _predict_batch(np.expand_dims(img_array, axis=0))[0]
+
+
+def cached_prediction(source, image_bytes=None, need_embedding=True):
+    """(probabilities, embedding) for `source` (path, bytes or opened PIL image),
+    served from prediction_cache when the same image bytes, or with a
+    perceptual-hash tier a near-identical image, were classified before.
+    `image_bytes` supplies the raw bytes when `source` is an opened image.
+    The perceptual tier only serves callers that don't need the embedding.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        image_bytes = source
+    elif isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            image_bytes = f.read()
+        source = image_bytes
+
+    use_cache = prediction_cache.max_entries > 0 and image_bytes is not None
+    version = model_version()
+    sha = content_hash(image_bytes) if use_cache else None
+    if use_cache:
+        prediction = prediction_cache.get(version, sha)
+        if prediction is not None:
+            return prediction
+
+    if isinstance(source, Image.Image):
+        img_array = image_to_array(source)
+    else:
+        with open_image(source) as img:
+            img_array = image_to_array(img)
+
+    phash = None
+    if use_cache and prediction_cache.phash_max_distance is not None:
+        phash = perceptual_hash(img_array)
+        similar = None if need_embedding else prediction_cache.get_similar(version, phash)
+        if similar is not None:
+            # The near-duplicate's label, without running the model. Its
+            # embedding describes another image, and this isn't stored under
+            # this image's hash, whose entry must carry its own embedding
+            return similar[0], None
+
+    prediction = predict_one(img_array)
+    if use_cache:
+        prediction_cache.record_miss()
+        prediction_cache.put(version, sha, prediction, phash)
+    return prediction
+
+
+def classify_issue_image(source, threshold=0.5, other_threshold=0.9, image_bytes=None):
     """
     Predicts category of an issue image.
+    `source` is a path, raw image bytes, or an already opened PIL image
+    (pass its `image_bytes` too so the prediction cache can be used).
     - 'other' is valid for infrastructure/misc issues.
     - 'unknown' is for images that don't confidently match any class.
     """
-    if model is None:
+    category, confidence, _ = classify_with_embedding(
+        source, threshold=threshold, other_threshold=other_threshold, image_bytes=image_bytes,
+        need_embedding=False,
+    )
+    return category, confidence
+
+
+def classify_with_embedding(source, threshold=0.5, other_threshold=0.9, image_bytes=None, need_embedding=True):
+    """classify_issue_image() plus the image embedding used for duplicate
+    detection: returns (category, confidence, embedding or None).
+    """
+    if get_model() is None:
         print("[DL] ❌ Model not loaded. Returning default 'unknown'.")
-        return "unknown", 0.0
+        return "unknown", 0.0, None
 
     try:
-        img = image.load_img(img_path, target_size=(224, 224))
-        img_array = image.img_to_array(img) / 255.0
-        img_array = np.expand_dims(img_array, axis=0)
+        predictions, embedding = cached_prediction(source, image_bytes=image_bytes, need_embedding=need_embedding)
+        predicted_class, confidence = label_prediction(predictions, threshold, other_threshold)
+        if predicted_class != "unknown":
+            print(f"[DL] ✅ Prediction: {predicted_class} ({confidence*100:.2f}% confidence)")
+        return predicted_class, confidence, embedding
 
-        predictions = model.predict(img_array)[0]
-        predicted_index = np.argmax(predictions)
-        predicted_class = class_labels[predicted_index]
-        confidence = float(predictions[predicted_index])
+    except Exception as e:
+        print(f"[DL] ❌ Error classifying image: {e}")
+        return "unknown", 0.0, None
 
-        # ✅ If predicted class is 'other' but confidence is too low, classify as unknown
-        if predicted_class == "other" and confidence < other_threshold:
-            return "unknown", confidence
 
-        # ✅ Any non-other class with low confidence is unknown
-        if predicted_class != "other" and confidence < threshold:
-            return "unknown", confidence
+def label_prediction(predictions, threshold=0.5, other_threshold=0.9):
+    """(category, confidence) for one row of class probabilities."""
+    predicted_index = np.argmax(predictions)
+    predicted_class = get_class_labels()[predicted_index]
+    confidence = float(predictions[predicted_index])
 
-        print(f"[DL] ✅ Prediction: {predicted_class} ({confidence*100:.2f}% confidence)")
-        return predicted_class, confidence
+    # ✅ If predicted class is 'other' but confidence is too low, classify as unknown
+    if predicted_class == "other" and confidence < other_threshold:
+        return "unknown", confidence
 
-    except Exception as e:
-        print(f"[DL] ❌ Error classifying image: {e}")
-        return "unknown", 0.0
+    # ✅ Any non-other class with low confidence is unknown
+    if predicted_class != "other" and confidence < threshold:
+        return "unknown", confidence
+
+    return predicted_class, confidence
+
+
+def classify_arrays(arrays, threshold=0.5, other_threshold=0.9):
+    """[(category, confidence, embedding or None)] for preprocessed images,
+    in one forward pass and without the prediction cache or the request
+    batcher. Meant for bulk jobs that already hold a full batch.
+    """
+    model = get_model()
+    if model is None or not len(arrays):
+        return [("unknown", 0.0, None)] * len(arrays)
+    probabilities, embeddings = model.predict(np.stack(arrays))
+    if embeddings is None:
+        embeddings = [None] * len(probabilities)
+    return [
+        (*label_prediction(predictions, threshold, other_threshold), embedding)
+        for predictions, embedding in zip(probabilities, embeddings)
+    ]
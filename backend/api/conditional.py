@@ -0,0 +1,77 @@
+import hashlib
+import time
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .models import Issue
+
+# Conditional GET for issue reads. Validators come from Issue.activity_at,
+# which every write path bumps (saves, votes, comments, classification), so
+# checking them is one small query and a matching poll gets an empty 304
+# before anything is serialized.
+#
+# Last-Modified has one-second precision, so it is only sent once its second
+# has passed: otherwise a second write within that second would leave it
+# unchanged and If-Modified-Since would get a stale 304. Feeds send none at
+# all, since deleting an issue doesn't move their latest activity; the ETag
+# (which includes the issue count) covers them.
+
+
+class Validators:
+    def __init__(self, parts, last_modified=None, per_user=False):
+        digest = hashlib.md5(repr(parts).encode()).hexdigest()
+        self.etag = quote_etag(digest)
+        self.last_modified = None
+        if last_modified is not None and int(last_modified.timestamp()) < int(time.time()):
+            self.last_modified = int(last_modified.timestamp())
+        self.per_user = per_user
+
+    def not_modified(self, request):
+        """A 304 response if the client's copy is current, else None."""
+        response = get_conditional_response(request, etag=self.etag, last_modified=self.last_modified)
+        if response is not None:
+            self.apply(response)
+        return response
+
+    def apply(self, response):
+        response['ETag'] = self.etag
+        if self.last_modified is not None:
+            response['Last-Modified'] = http_date(self.last_modified)
+        # Clients must revalidate, which is what makes polling cheap
+        if self.per_user:
+            patch_cache_control(response, no_cache=True, private=True)
+            patch_vary_headers(response, ['Authorization'])
+        else:
+            patch_cache_control(response, no_cache=True)
+        return response
+
+
+def _user_key(request):
+    return request.user.pk if request.user.is_authenticated else None
+
+
+def feed_state():
+    """(issue count, latest activity) over all issues, in one aggregate query."""
+    agg = Issue.objects.aggregate(n=Count('id'), last=Max('activity_at'))
+    return agg['n'], agg['last']
+
+
+def feed_validators(request, per_user=True, state=None):
+    """ETag-only validators for lists over all issues, from `state` (see
+    feed_state()) when the caller already has it.
+    """
+    n, last = state if state is not None else feed_state()
+    parts = ['feed', n, last, request.get_full_path()]
+    if per_user:
+        parts.append(_user_key(request))
+    return Validators(parts, per_user=per_user)
+
+
+def issue_validators(request, issue_id, scope):
+    """Validators for one issue, or None if it doesn't exist."""
+    last = Issue.objects.filter(pk=issue_id).values_list('activity_at', flat=True).first()
+    if last is None:
+        return None
+    return Validators([scope, issue_id, last, _user_key(request)], last, per_user=True)
@@ -0,0 +1,52 @@
+import asyncio
+
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
+
+from . import live
+
+
+class IssueFeedConsumer(AsyncJsonWebsocketConsumer):
+    """Pushes issue events: ws/issues/ for every issue, ws/issues/<id>/ for
+    one. Clients receive {"type": "issues", "issues": [{"issue_id", "events",
+    "changes"}, ...]}, one entry per issue that changed during the window.
+    """
+
+    async def connect(self):
+        issue_id = self.scope['url_route']['kwargs'].get('issue_id')
+        self.group = live.issue_group(issue_id) if issue_id else live.FEED_GROUP
+        self.pending = {}
+        self.flush_task = None
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        await self.channel_layer.group_discard(self.group, self.channel_name)
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+
+    async def receive_json(self, content, **kwargs):
+        # The feed is push-only; answer pings so clients can detect dead sockets
+        if content.get('type') == 'ping':
+            await self.send_json({'type': 'pong'})
+
+    async def issue_event(self, message):
+        self.merge(message)
+
+    async def issue_batch(self, message):
+        for event in message['messages']:
+            self.merge(event)
+
+    def merge(self, message):
+        entry = self.pending.setdefault(message['issue_id'], {
+            'issue_id': message['issue_id'], 'events': [], 'changes': {},
+        })
+        entry['events'] += [event for event in message['events'] if event not in entry['events']]
+        entry['changes'].update(message['changes'])
+        if self.flush_task is None:
+            self.flush_task = asyncio.ensure_future(self.flush_later())
+
+    async def flush_later(self):
+        await asyncio.sleep(settings.LIVE_FEED_COALESCE_SECONDS)
+        issues, self.pending, self.flush_task = list(self.pending.values()), {}, None
+        await self.send_json({'type': 'issues', 'issues': issues})
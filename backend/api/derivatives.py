@@ -0,0 +1,133 @@
+import os
+import shutil
+from io import BytesIO
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+# Resized copies of uploaded images. An original at MEDIA_ROOT/<name> gets
+# MEDIA_ROOT/variants/<name without extension>/<variant>.webp and .jpg for
+# every variant in IMAGE_VARIANTS (longest edge in px, never upscaled). The
+# copies are rotated upright from the EXIF orientation and carry no metadata.
+# The smallest variant's WebP is written last, so its presence means the set
+# is complete.
+
+VARIANTS_DIR = 'variants'
+FORMATS = (('webp', 'WEBP'), ('jpeg', 'JPEG'))
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+
+def variant_sizes():
+    return getattr(settings, 'IMAGE_VARIANTS', {'thumb': 320, 'medium': 1024})
+
+
+def quality():
+    return getattr(settings, 'IMAGE_VARIANT_QUALITY', 80)
+
+
+def variant_name(name, variant, fmt):
+    """Storage name of one derivative of the original `name`."""
+    return f"{VARIANTS_DIR}/{os.path.splitext(name)[0]}/{variant}.{EXTENSIONS[fmt]}"
+
+
+def _marker(name):
+    sizes = variant_sizes()
+    return variant_name(name, min(sizes, key=sizes.get), 'webp')
+
+
+def has_variants(name):
+    return bool(name) and os.path.exists(os.path.join(settings.MEDIA_ROOT, _marker(name)))
+
+
+def render(src_path, out_dir, sizes, quality):
+    """Write every variant of the image at `src_path` into `out_dir`.
+    Plain paths and arguments only, so process-pool workers need no Django
+    setup. Returns the number of bytes written.
+    """
+    with Image.open(src_path) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+            # JPEG has no alpha: flatten onto white for both formats
+            rgba = img.convert('RGBA')
+            img = Image.new('RGB', rgba.size, (255, 255, 255))
+            img.paste(rgba, mask=rgba.getchannel('A'))
+        else:
+            img = img.convert('RGB')
+
+    os.makedirs(out_dir, exist_ok=True)
+    written = 0
+    # Largest first and WebP last, so the marker file appears only once the rest are there
+    for variant, size in sorted(sizes.items(), key=lambda item: -item[1]):
+        resized = img.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        for fmt, pil_format in reversed(FORMATS):
+            buffer = BytesIO()
+            if pil_format == 'WEBP':
+                resized.save(buffer, pil_format, quality=quality, method=4)
+            else:
+                resized.save(buffer, pil_format, quality=quality, optimize=True, progressive=True)
+            path = os.path.join(out_dir, f"{variant}.{EXTENSIONS[fmt]}")
+            tmp_path = f"{path}.part"
+            with open(tmp_path, 'wb') as f:
+                f.write(buffer.getvalue())
+            os.replace(tmp_path, path)
+            written += buffer.tell()
+    return written
+
+
+def render_job(name):
+    """Arguments for render() for the original `name`."""
+    return (
+        os.path.join(settings.MEDIA_ROOT, name),
+        os.path.join(settings.MEDIA_ROOT, VARIANTS_DIR, os.path.splitext(name)[0]),
+        variant_sizes(),
+        quality(),
+    )
+
+
+def generate(name):
+    """Create the variants of one stored original. Errors are logged, not
+    raised: the original stays usable without them.
+    """
+    try:
+        return render(*render_job(name))
+    except Exception as e:
+        print(f"❌ Could not build image variants for {name}: {e}")
+        return 0
+
+
+def delete(name):
+    if name:
+        shutil.rmtree(os.path.join(settings.MEDIA_ROOT, VARIANTS_DIR, os.path.splitext(name)[0]), ignore_errors=True)
+
+
+def variant_urls(field_file, request=None):
+    """{'original': url, '<variant>': {'webp': url, 'jpeg': url}, ...} for an
+    image field, absolute when `request` is given. Variants not built yet are
+    left out; None without an image.
+    """
+    if not field_file:
+        return None
+
+    def url(path):
+        return request.build_absolute_uri(path) if request is not None else path
+
+    urls = {'original': url(field_file.url)}
+    if has_variants(field_file.name):
+        for variant in variant_sizes():
+            urls[variant] = {
+                fmt: url(settings.MEDIA_URL + variant_name(field_file.name, variant, fmt))
+                for fmt, _ in FORMATS
+            }
+    return urls
+
+
+def absolute_variant_urls(urls, request):
+    """Relative variant_urls() output made absolute for `request`."""
+    if not urls:
+        return urls
+    return {
+        name: request.build_absolute_uri(value) if isinstance(value, str)
+        else {fmt: request.build_absolute_uri(path) for fmt, path in value.items()}
+        for name, value in urls.items()
+    }
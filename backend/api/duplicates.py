@@ -0,0 +1,36 @@
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from .vector_index import EmbeddingIndex
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = EmbeddingIndex(settings.EMBEDDING_INDEX_PATH)
+    return _index
+
+
+def embedding_to_bytes(embedding):
+    return np.asarray(embedding, dtype=np.float16).tobytes()
+
+
+def embedding_from_bytes(data):
+    return np.frombuffer(bytes(data), dtype=np.float16).astype(np.float32)
+
+
+def find_similar(embedding, k=5, exclude=()):
+    """[(issue_id, similarity)] of likely duplicates, most similar first."""
+    return get_index().search(
+        embedding,
+        k=k,
+        min_similarity=getattr(settings, 'DUPLICATE_MIN_SIMILARITY', 0.85),
+        exclude=exclude,
+    )
@@ -0,0 +1,137 @@
+import csv
+import json
+from datetime import date, datetime
+
+from asgiref.sync import sync_to_async
+
+from .models import Issue
+
+# Bulk issue export for analytics, shared by the admin endpoint and
+# `manage.py export_issues`. Rows come from a .values() queryset read with
+# iterator(), so neither model instances nor the result list are ever built
+# and memory stays flat however many rows are exported. Under ASGI the body
+# must be an async iterator (aiter_chunks): Django reads a sync streaming
+# body there with sync_to_async(list), i.e. all of it into memory.
+
+FORMATS = ('csv', 'ndjson')
+CHUNK_SIZE = 2000
+
+# (output column, queryset lookup)
+COLUMNS = (
+    ('id', 'id'),
+    ('title', 'title'),
+    ('description', 'description'),
+    ('address', 'address'),
+    ('latitude', 'latitude'),
+    ('longitude', 'longitude'),
+    ('category', 'category'),
+    ('priority', 'priority'),
+    ('status', 'status'),
+    ('classification_status', 'classification_status'),
+    ('confidence', 'confidence'),
+    ('upvotes_count', 'upvotes_count'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+    ('resolved_at', 'resolved_at'),
+    ('reporter_username', 'reporter__username'),
+    ('resolved_by_username', 'resolved_by__username'),
+)
+
+
+def parse_filters(params):
+    """Filters from request/command options: from, to (YYYY-MM-DD, by creation
+    date), status, category. Raises ValueError on bad dates.
+    """
+    try:
+        start = date.fromisoformat(params['from']) if params.get('from') else None
+        end = date.fromisoformat(params['to']) if params.get('to') else None
+    except ValueError:
+        raise ValueError("from and to must be YYYY-MM-DD dates")
+    return {'start': start, 'end': end, 'status': params.get('status'), 'category': params.get('category')}
+
+
+def issue_rows(start=None, end=None, status=None, category=None, chunk_size=CHUNK_SIZE):
+    """Yield one tuple per matching issue, in id order, COLUMNS order."""
+    issues = Issue.objects.all()
+    if start:
+        issues = issues.filter(created_at__date__gte=start)
+    if end:
+        issues = issues.filter(created_at__date__lte=end)
+    if status:
+        issues = issues.filter(status=status)
+    if category:
+        issues = issues.filter(category=category)
+    rows = issues.order_by('id').values_list(*(lookup for _, lookup in COLUMNS))
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield tuple(value.isoformat() if isinstance(value, datetime) else value for value in row)
+
+
+class _Line:
+    """File-like target for csv.writer that hands back the formatted line."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Line())
+    yield writer.writerow([name for name, _ in COLUMNS])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(rows):
+    names = [name for name, _ in COLUMNS]
+    for row in rows:
+        yield json.dumps(dict(zip(names, row)), ensure_ascii=False) + '\n'
+
+
+def lines(fmt, rows):
+    return csv_lines(rows) if fmt == 'csv' else ndjson_lines(rows)
+
+
+def batched(lines, size=256):
+    """Join lines into larger chunks so each write to the client isn't one row.
+    The first line (the CSV header) is sent alone, before the query runs.
+    """
+    lines = iter(lines)
+    first = next(lines, None)
+    if first is None:
+        return
+    yield first
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+async def aiter_chunks(chunks):
+    """Async iterator over the sync `chunks`, for StreamingHttpResponse under
+    ASGI. Each chunk is produced in the thread that runs the request's sync
+    code, which owns its database connection.
+    """
+    chunks = iter(chunks)
+    next_chunk = sync_to_async(next)
+    try:
+        while True:
+            chunk = await next_chunk(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        # Closes the queryset cursor when the client disconnects early
+        await sync_to_async(chunks.close)()
+
+
+def for_handler(chunks, meta):
+    """`chunks` in the form the serving handler streams without buffering:
+    as is under WSGI, wrapped by aiter_chunks under ASGI. Tells the two apart
+    by request.META, since only a WSGI environ carries wsgi.input.
+    """
+    if 'wsgi.input' in meta:
+        return chunks
+    return aiter_chunks(chunks)
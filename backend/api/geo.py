@@ -0,0 +1,97 @@
+import math
+
+from django.conf import settings
+from django.db.models import ExpressionWrapper, F, FloatField, Q
+
+# Fixed lat/lng grid used to index issue locations. Each issue stores the
+# integer id of the cell containing it (row-major from lat -90, lng -180), so
+# a bounding box becomes one indexed range lookup per grid row it spans.
+
+EARTH_RADIUS_M = 6371008.8
+MAX_CELL_ROWS = 256
+
+
+def cell_size():
+    return getattr(settings, 'GEO_CELL_DEGREES', 0.01)
+
+
+def _columns():
+    return int(round(360 / cell_size()))
+
+
+def _row(lat):
+    return int((min(max(lat, -90.0), 90.0) + 90.0) // cell_size())
+
+
+def _col(lng):
+    return min(int((min(max(lng, -180.0), 180.0) + 180.0) // cell_size()), _columns() - 1)
+
+
+def cell_for(lat, lng):
+    if lat is None or lng is None:
+        return None
+    return _row(lat) * _columns() + _col(lng)
+
+
+def parse_bbox(value):
+    """'min_lng,min_lat,max_lng,max_lat' -> tuple of floats. Raises ValueError."""
+    parts = [float(p) for p in (value or '').split(',')]
+    if len(parts) != 4:
+        raise ValueError("bbox must be min_lng,min_lat,max_lng,max_lat")
+    min_lng, min_lat, max_lng, max_lat = parts
+    if not (-180 <= min_lng <= max_lng <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise ValueError("bbox is out of range or inverted")
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def bbox_q(min_lng, min_lat, max_lng, max_lat):
+    """Q matching issues inside the box. Only the grid cells the box overlaps
+    are read through the geo_cell index; the exact lat/lng test then trims
+    the edge cells. Very large boxes skip the cell ranges.
+    """
+    exact = Q(latitude__range=(min_lat, max_lat), longitude__range=(min_lng, max_lng))
+    first_row, last_row = _row(min_lat), _row(max_lat)
+    if last_row - first_row + 1 > MAX_CELL_ROWS:
+        return exact
+
+    columns = _columns()
+    first_col, last_col = _col(min_lng), _col(max_lng)
+    cells = Q()
+    for row in range(first_row, last_row + 1):
+        cells |= Q(geo_cell__range=(row * columns + first_col, row * columns + last_col))
+    return cells & exact
+
+
+def bbox_around(lat, lng, radius_m):
+    """Bounding box (min_lng, min_lat, max_lng, max_lat) enclosing a circle."""
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    dlng = dlat / max(math.cos(math.radians(lat)), 1e-6)
+    return (
+        max(lng - dlng, -180.0), max(lat - dlat, -90.0),
+        min(lng + dlng, 180.0), min(lat + dlat, 90.0),
+    )
+
+
+def distance_order(lat, lng):
+    """SQL expression to order rows by distance from (lat, lng): the squared
+    equirectangular distance in degrees, which ranks like haversine_m() at the
+    radii the map allows.
+    """
+    scale = math.cos(math.radians(lat)) ** 2
+    dlat, dlng = F('latitude') - lat, F('longitude') - lng
+    return ExpressionWrapper(dlat * dlat + dlng * dlng * scale, output_field=FloatField())
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def cluster_degrees(zoom):
+    """Cluster cell width in degrees for a web-map zoom level: four clusters
+    across each 256px tile, i.e. roughly one bucket per 64px.
+    """
+    return 360.0 / (2 ** zoom) / 4
@@ -0,0 +1,101 @@
+import os
+import threading
+
+import numpy as np
+
+# Inference backends for the issue classifier. Each takes a float32 batch of
+# shape (N, 224, 224, 3) scaled to [0, 1] and returns a pair: (N, num_classes)
+# probabilities and (N, D) penultimate-layer embeddings, or None when the
+# artifact doesn't expose them. Selected with settings.CLASSIFIER_BACKEND.
+
+
+class KerasBackend:
+    name = 'keras'
+
+    def __init__(self, path):
+        from tensorflow.keras import Model
+        from tensorflow.keras.models import load_model
+        self.path = path
+        model = load_model(path)
+        # Same weights, second output: the input of the softmax layer
+        self.model = Model(model.inputs, [model.output, model.layers[-1].input])
+
+    def predict(self, batch):
+        probabilities, embeddings = self.model.predict_on_batch(batch)
+        return np.asarray(probabilities), np.asarray(embeddings)
+
+
+class TFLiteBackend:
+    """Runs the exported .tflite model (see export_model.py).
+
+    Uses the standalone tflite-runtime package when installed, which avoids
+    loading TensorFlow at all, and falls back to tf.lite otherwise.
+    """
+    name = 'tflite'
+
+    def __init__(self, path):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+        self.path = path
+        self.interpreter = Interpreter(model_path=path)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._outputs = self._sorted_outputs()
+        self._batch_size = int(self._input['shape'][0])
+        # The interpreter keeps per-invocation state, so calls are serialized
+        self._lock = threading.Lock()
+
+    def _resize(self, batch_size):
+        if batch_size != self._batch_size:
+            shape = [batch_size, *self._input['shape'][1:]]
+            self.interpreter.resize_tensor_input(self._input['index'], shape)
+            self.interpreter.allocate_tensors()
+            self._input = self.interpreter.get_input_details()[0]
+            self._outputs = self._sorted_outputs()
+            self._batch_size = batch_size
+
+    def _sorted_outputs(self):
+        # export_model.py writes [probabilities, embedding]; the converter does
+        # not keep output order, but the embedding is always the wider one.
+        return sorted(self.interpreter.get_output_details(), key=lambda d: d['shape'][-1])
+
+    def _read(self, detail):
+        out = self.interpreter.get_tensor(detail['index'])
+        if detail['dtype'] in (np.int8, np.uint8):
+            scale, zero_point = detail['quantization']
+            out = (out.astype(np.float32) - zero_point) * scale
+        return np.array(out, dtype=np.float32)
+
+    def predict(self, batch):
+        with self._lock:
+            self._resize(len(batch))
+            dtype = self._input['dtype']
+            if dtype in (np.int8, np.uint8):
+                scale, zero_point = self._input['quantization']
+                batch = np.round(batch / scale + zero_point).astype(dtype)
+            else:
+                batch = batch.astype(dtype, copy=False)
+            self.interpreter.set_tensor(self._input['index'], batch)
+            self.interpreter.invoke()
+            probabilities = self._read(self._outputs[0])
+            embeddings = self._read(self._outputs[-1]) if len(self._outputs) > 1 else None
+            return probabilities, embeddings
+
+
+BACKENDS = {
+    KerasBackend.name: KerasBackend,
+    TFLiteBackend.name: TFLiteBackend,
+}
+
+
+def load_backend(name, path):
+    """Instantiate backend `name` for the artifact at `path`, or None if the
+    artifact does not exist. Raises ValueError for an unknown backend.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown classifier backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    if not os.path.exists(path):
+        return None
+    return BACKENDS[name](path)
@@ -0,0 +1,95 @@
+from asgiref.sync import async_to_sync
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.db import transaction
+from django.utils.timezone import localtime
+
+# Live issue feed over WebSockets (api/consumers.py). Signals and the bulk
+# write paths publish one small event per changed issue to the channel layer
+# once the transaction commits: to the global feed group and to the issue's
+# own group. Each event carries only what changed, so consumers never query;
+# they merge the events of an issue arriving within LIVE_FEED_COALESCE_SECONDS
+# into one message, and a burst of votes reaches clients as a single update.
+
+FEED_GROUP = 'issues'
+
+# Set by backend/asgi.py. The in-memory channel layer can't carry events out
+# of the process, so with it only the process serving the WebSockets
+# publishes; management commands and the like need CHANNEL_REDIS_URL.
+serving = False
+
+CREATED = 'created'
+STATUS = 'status'
+PRIORITY = 'priority'
+CATEGORY = 'category'
+VOTES = 'votes'
+COMMENTS = 'comments'
+DELETED = 'deleted'
+
+
+def issue_group(issue_id):
+    return f'issue_{issue_id}'
+
+
+def created_fields(issue):
+    """What a client needs to show a new issue without fetching it."""
+    return {
+        'title': issue.title,
+        'description': issue.description,
+        'category': issue.category,
+        'priority': issue.priority,
+        'status': issue.status,
+        'created_at': localtime(issue.created_at).isoformat(),
+        'reporter': issue.reporter.username,
+    }
+
+
+def field_changes(old, issue):
+    """(events, changes) for whichever of category, status and priority
+    differ between `old`, a (category, status, priority) tuple, and `issue`.
+    """
+    events, changes = [], {}
+    for name, value in zip((CATEGORY, STATUS, PRIORITY), old):
+        new = getattr(issue, name)
+        if (new or '') != (value or ''):
+            events.append(name)
+            changes[name] = new
+    return events, changes
+
+
+def publish(issue_id, *events, **changes):
+    """Publish `events` (CREATED, STATUS, ...) for one issue with its new
+    field values, after the current transaction commits.
+    """
+    publish_many([(issue_id, events, changes)])
+
+
+def publish_many(updates):
+    """publish() for many (issue id, events, changes) at once: one message
+    to the global feed, one per issue group.
+    """
+    messages = [
+        {'type': 'issue.event', 'issue_id': issue_id, 'events': list(events), 'changes': changes}
+        for issue_id, events, changes in updates
+    ]
+    layer = get_channel_layer()
+    if isinstance(layer, InMemoryChannelLayer) and not serving:
+        return
+    if messages and layer is not None:
+        transaction.on_commit(lambda: _send(layer, messages))
+
+
+def _send(layer, messages):
+    try:
+        async_to_sync(_group_send)(layer, messages)
+    except Exception as e:
+        # A down channel layer must not fail the write that was just committed
+        print(f"❌ Live feed publish failed: {e}")
+
+
+async def _group_send(layer, messages):
+    for message in messages:
+        await layer.group_send(issue_group(message['issue_id']), message)
+    if len(messages) == 1:
+        await layer.group_send(FEED_GROUP, messages[0])
+    else:
+        await layer.group_send(FEED_GROUP, {'type': 'issue.batch', 'messages': messages})
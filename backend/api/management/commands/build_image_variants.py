@@ -0,0 +1,60 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import derivatives
+from api.models import CustomUser, Issue
+
+
+def _render(name, job):
+    try:
+        return name, derivatives.render(*job), None
+    except Exception as e:
+        return name, 0, str(e)
+
+
+class Command(BaseCommand):
+    help = "Build thumb/medium WebP and JPEG variants for existing issue images and profile pictures."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count).")
+        parser.add_argument('--force', action='store_true', help="Rebuild variants that already exist.")
+
+    def handle(self, *args, **options):
+        names = set(
+            Issue.objects.exclude(image='').exclude(image__isnull=True).values_list('image', flat=True)
+        ) | set(
+            CustomUser.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+            .values_list('profile_picture', flat=True)
+        )
+        names = sorted(
+            name for name in names
+            if os.path.isfile(os.path.join(settings.MEDIA_ROOT, name))
+            and (options['force'] or not derivatives.has_variants(name))
+        )
+        if not names:
+            self.stdout.write(self.style.SUCCESS("All images already have variants."))
+            return
+
+        start = time.perf_counter()
+        done = failed = written = 0
+        # Workers only decode and encode; job arguments are resolved here
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            futures = [pool.submit(_render, name, derivatives.render_job(name)) for name in names]
+            for future in as_completed(futures):
+                name, size, error = future.result()
+                if error:
+                    failed += 1
+                    self.stderr.write(f"❌ {name}: {error}")
+                else:
+                    done += 1
+                    written += size
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Built variants for {done} image(s) in {elapsed:.1f}s "
+            f"({done / elapsed:.1f} images/sec, {written / 1e6:.1f} MB written); {failed} failed."
+        ))
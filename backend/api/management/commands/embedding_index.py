@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+
+from api.classify import classify_with_embedding
+from api.duplicates import embedding_from_bytes, embedding_to_bytes, get_index
+from api.models import Issue
+
+
+class Command(BaseCommand):
+    help = "Inspect, compact or rebuild the duplicate-detection embedding index."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill', action='store_true',
+                            help="Classify issues that have an image but no stored embedding.")
+        parser.add_argument('--rebuild', action='store_true',
+                            help="Rewrite the index from the embeddings stored on Issue rows.")
+        parser.add_argument('--compact', action='store_true',
+                            help="Drop tombstoned and superseded rows.")
+        parser.add_argument('--if-needed', action='store_true',
+                            help="With --compact, only compact once dead rows pass the index's "
+                                 "compact ratio (for running from cron).")
+
+    def handle(self, *args, **options):
+        index = get_index()
+
+        if options['backfill']:
+            missing = (
+                Issue.objects.filter(embedding__isnull=True)
+                .exclude(image='').exclude(image__isnull=True)
+                .only('id', 'image')
+            )
+            done = 0
+            for issue in missing.iterator(chunk_size=500):
+                # Only the embedding is filled in; category/priority are left alone
+                _, _, embedding = classify_with_embedding(issue.image.path)
+                if embedding is None:
+                    continue
+                Issue.objects.filter(pk=issue.pk).update(embedding=embedding_to_bytes(embedding))
+                index.add(issue.pk, embedding)
+                done += 1
+            self.stdout.write(f"Backfilled embeddings for {done} issue(s).")
+
+        if options['rebuild']:
+            rows = (
+                Issue.objects.filter(embedding__isnull=False)
+                .values_list('id', 'embedding')
+                .iterator(chunk_size=2000)
+            )
+            index.rebuild((pk, embedding_from_bytes(data)) for pk, data in rows)
+            self.stdout.write("Rebuilt embedding index.")
+        elif options['compact']:
+            if options['if_needed'] and not index.needs_compaction():
+                self.stdout.write("Embedding index doesn't need compacting yet.")
+            else:
+                removed = index.compact()
+                self.stdout.write(f"Compacted embedding index, dropped {removed} row(s).")
+
+        self.stdout.write(self.style.SUCCESS(f"Index: {index.stats()}"))
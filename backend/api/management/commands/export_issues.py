@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import export
+
+
+class Command(BaseCommand):
+    help = "Stream issues as CSV or NDJSON (to stdout or --output), filtered by creation date, status and category."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=export.FORMATS, default='csv')
+        parser.add_argument('--from', dest='from', help="First creation date, YYYY-MM-DD.")
+        parser.add_argument('--to', help="Last creation date, YYYY-MM-DD.")
+        parser.add_argument('--status')
+        parser.add_argument('--category')
+        parser.add_argument('--output', help="File to write (default: stdout).")
+
+    def handle(self, *args, **options):
+        try:
+            filters = export.parse_filters(options)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        rows = export.issue_rows(**filters)
+        counted = [0]
+
+        def counting(rows):
+            for row in rows:
+                counted[0] += 1
+                yield row
+
+        out = open(options['output'], 'w', encoding='utf-8', newline='') if options['output'] else sys.stdout
+        try:
+            for chunk in export.batched(export.lines(options['format'], counting(rows))):
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        # stderr, so piping stdout gives clean data
+        self.stderr.write(self.style.SUCCESS(f"Exported {counted[0]} issue(s)."))
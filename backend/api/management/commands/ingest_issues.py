@@ -0,0 +1,335 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from django.core.files import File
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from api import geo, response_cache, rollups, search
+from api.classify import (
+    VALID_CATEGORIES, classify_arrays, get_model, image_to_array, is_animated_image, open_image,
+)
+from api.duplicates import embedding_to_bytes, get_index
+from api.models import CustomUser, Issue, IssueImport, priority_for_category
+from api.storage import content_storage, retain_many
+
+CATEGORIES = dict(Issue.CATEGORY_CHOICES)
+STATUSES = dict(Issue.STATUS_CHOICES)
+PRIORITIES = dict(Issue.PRIORITY_CHOICES)
+MAX_REPORTED_ERRORS = 20
+
+
+def read_records(path):
+    """Yield one dict per record of a .csv (header row) or NDJSON file."""
+    if path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            yield from csv.DictReader(f)
+    else:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def parse_timestamp(value):
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"bad timestamp {value!r}")
+        parsed = datetime.combine(day, datetime.min.time())
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def parse_coordinate(value, limit):
+    if value in (None, ''):
+        return None
+    value = float(value)
+    if not -limit <= value <= limit:
+        raise ValueError(f"coordinate {value} out of range")
+    return value
+
+
+def decode(path):
+    """('ok', array), ('animated', None) or ('error', message) for one image,
+    opened once.
+    """
+    try:
+        with open_image(path) as img:
+            if is_animated_image(img):
+                return 'animated', None
+            # image_to_array() reuses a per-thread buffer
+            return 'ok', image_to_array(img).copy()
+    except Exception as e:
+        return 'error', str(e)
+
+
+class Command(BaseCommand):
+    help = (
+        "Import issues from NDJSON or CSV (title, description, address, category, priority, status, "
+        "latitude, longitude, created_at, resolved_at, reporter, image) with images from --images. "
+        "Issues are classified in batches and inserted with bulk_create; an interrupted import "
+        "resumes after the last committed batch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help="NDJSON (.ndjson/.jsonl) or CSV file.")
+        parser.add_argument('--images', help="Directory that the records' image paths are relative to.")
+        parser.add_argument('--reporter', required=True,
+                            help="Username of the reporter for records without a known 'reporter'.")
+        parser.add_argument('--name', help="Import name used for resuming (default: the source path).")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Records per insert transaction.")
+        parser.add_argument('--classify-batch', type=int, default=32, help="Images per model forward pass.")
+        parser.add_argument('--workers', type=int, default=4, help="Image decoding threads.")
+        parser.add_argument('--no-classify', action='store_true', help="Store images without classifying them.")
+        parser.add_argument('--skip-variants', action='store_true',
+                            help="Don't run build_image_variants afterwards.")
+        parser.add_argument('--restart', action='store_true', help="Forget earlier progress of this import.")
+
+    def handle(self, *args, **options):
+        source = options['source']
+        if not os.path.isfile(source):
+            raise CommandError(f"{source} not found")
+        try:
+            self.default_reporter = CustomUser.objects.get(username=options['reporter'])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"No user named {options['reporter']!r}")
+        self.options = options
+        self.reporters = {self.default_reporter.username: self.default_reporter}
+        self.errors = 0
+        self.classify = not options['no_classify']
+        if self.classify and get_model() is None:
+            self.stderr.write("⚠️ No classifier model found; images are stored with category 'unknown' results.")
+
+        progress, _ = IssueImport.objects.get_or_create(source=options['name'] or os.path.abspath(source))
+        if options['restart']:
+            progress.records_done = progress.issues_created = 0
+            progress.finished = False
+            progress.save()
+        elif progress.finished:
+            self.stdout.write(self.style.SUCCESS(
+                f"{progress.source} was already imported ({progress.issues_created} issues); use --restart to redo it."
+            ))
+            return
+        elif progress.records_done:
+            self.stdout.write(f"Resuming after record {progress.records_done}.")
+
+        start = time.perf_counter()
+        created_before = progress.issues_created
+        records = read_records(source)
+        for _ in range(progress.records_done):
+            next(records, None)
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            self.pool = pool
+            batch = []
+            for record in records:
+                batch.append(record)
+                if len(batch) >= options['batch_size']:
+                    self.import_batch(batch, progress)
+                    batch = []
+                    self.report(progress, created_before, start)
+            if batch:
+                self.import_batch(batch, progress)
+                self.report(progress, created_before, start)
+
+        progress.finished = True
+        progress.save(update_fields=['finished', 'updated_at'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {progress.issues_created - created_before} issue(s) in {time.perf_counter() - start:.1f}s "
+            f"({self.errors} record(s) skipped)."
+        ))
+        if not options['skip_variants']:
+            call_command('build_image_variants', stdout=self.stdout, stderr=self.stderr)
+
+    def report(self, progress, created_before, start):
+        created = progress.issues_created - created_before
+        self.stdout.write(
+            f"   {progress.records_done} records done, {created} issues created "
+            f"({created / (time.perf_counter() - start):.0f} issues/sec)"
+        )
+
+    def error(self, number, message):
+        self.errors += 1
+        if self.errors <= MAX_REPORTED_ERRORS:
+            self.stderr.write(f"❌ Record {number}: {message}")
+        elif self.errors == MAX_REPORTED_ERRORS + 1:
+            self.stderr.write("❌ Further record errors are counted but not shown.")
+
+    # --- one batch ------------------------------------------------------------
+
+    def import_batch(self, records, progress):
+        first_number = progress.records_done + 1
+        self.load_reporters(records)
+
+        issues, image_paths, timestamps, given_priorities = [], [], [], []
+        for number, record in enumerate(records, start=first_number):
+            try:
+                issue, image_path, created_at, given_priority = self.build_issue(record)
+            except (KeyError, TypeError, ValueError) as e:
+                self.error(number, e)
+                continue
+            issues.append(issue)
+            image_paths.append(image_path)
+            timestamps.append(created_at)
+            given_priorities.append(given_priority)
+
+        self.store_images(issues, image_paths)
+        if self.classify:
+            embeddings = self.classify_images(issues, image_paths, given_priorities)
+        else:
+            embeddings = {}
+            for issue in issues:
+                if issue.image:
+                    issue.classification_status = 'skipped'
+
+        with transaction.atomic():
+            Issue.objects.bulk_create(issues)
+            # created_at is auto_now_add; keep the legacy timestamps where given
+            dated = []
+            for issue, created_at in zip(issues, timestamps):
+                if created_at is not None:
+                    issue.created_at = created_at
+                    dated.append(issue)
+            Issue.objects.bulk_update(dated, ['created_at'], batch_size=500)
+
+            # Everything the save path and its signals would have done, in bulk
+            retain_many(issue.image.name for issue in issues)
+            rollups.move_many((None, rollups.bucket_for(issue)) for issue in issues)
+            search.index_issues(issues)
+            response_cache.invalidate()
+
+            progress.records_done += len(records)
+            progress.issues_created += len(issues)
+            progress.save(update_fields=['records_done', 'issues_created', 'updated_at'])
+
+        if embeddings:
+            # After commit, so the index never points at rows that were rolled back
+            get_index().add_many((issues[i].pk, embedding) for i, embedding in embeddings.items())
+
+    def load_reporters(self, records):
+        wanted = {record.get('reporter') for record in records} - set(self.reporters) - {None, ''}
+        for user in CustomUser.objects.filter(username__in=wanted):
+            self.reporters[user.username] = user
+
+    def build_issue(self, record):
+        title = (record.get('title') or '').strip()
+        description = (record.get('description') or '').strip()
+        if not title or not description:
+            raise ValueError("title and description are required")
+
+        latitude = parse_coordinate(record.get('latitude'), 90)
+        longitude = parse_coordinate(record.get('longitude'), 180)
+        if (latitude is None) != (longitude is None):
+            raise ValueError("latitude and longitude must be given together")
+
+        status = record.get('status') or 'Open'
+        if status not in STATUSES:
+            raise ValueError(f"unknown status {status!r}")
+        category = (record.get('category') or 'other').lower()
+        if category not in CATEGORIES:
+            category = 'other'
+        priority = (record.get('priority') or '').lower()
+        if priority and priority not in PRIORITIES:
+            raise ValueError(f"unknown priority {priority!r}")
+
+        now = timezone.now()
+        created_at = parse_timestamp(record.get('created_at'))
+        resolved_at = None
+        if status in Issue.RESOLVED_STATUSES:
+            resolved_at = parse_timestamp(record.get('resolved_at')) or now
+
+        issue = Issue(
+            title=title[:200],
+            description=description,
+            address=(record.get('address') or '')[:255],
+            latitude=latitude,
+            longitude=longitude,
+            # Issue.save() isn't called, so set what it derives
+            geo_cell=geo.cell_for(latitude, longitude),
+            category=category,
+            status=status,
+            resolved_at=resolved_at,
+            activity_at=now,
+            reporter=self.reporters.get(record.get('reporter'), self.default_reporter),
+        )
+        # Reporter-given priority wins; otherwise derived from the (predicted) category
+        issue.priority = priority or priority_for_category(category)
+
+        image_path = None
+        if record.get('image'):
+            if not self.options['images']:
+                raise ValueError("record has an image but --images was not given")
+            image_path = os.path.join(self.options['images'], record['image'])
+            if not os.path.isfile(image_path):
+                raise ValueError(f"image {record['image']!r} not found")
+        return issue, image_path, created_at, bool(priority)
+
+    def store_images(self, issues, image_paths):
+        for issue, path in zip(issues, image_paths):
+            if path is None:
+                continue
+            with open(path, 'rb') as f:
+                # Content-addressed: duplicate photos are stored once
+                issue.image.name = content_storage.save(f"issue_images/{os.path.basename(path)}", File(f))
+
+    def classify_images(self, issues, image_paths, given_priorities):
+        """Classify the batch's images --classify-batch at a time, filling in
+        category, priority (unless the record gave one), confidence and status.
+        Returns {issue index: embedding}.
+        """
+        indexed = [(i, path) for i, path in enumerate(image_paths) if path is not None]
+        size = self.options['classify_batch']
+        slices = [indexed[start:start + size] for start in range(0, len(indexed), size)]
+
+        def decode_slice(n):
+            if n >= len(slices):
+                return []
+            return [self.pool.submit(decode, path) for _, path in slices[n]]
+
+        # Decoded arrays are ~600 KB each: decode one slice ahead of the model
+        # rather than the whole batch, so at most two slices are held at once
+        embeddings = {}
+        pending = decode_slice(0)
+        for n, indexed_slice in enumerate(slices):
+            decoded = [future.result() for future in pending]
+            pending = decode_slice(n + 1)
+            chunk = []
+            for (i, _), (result, value) in zip(indexed_slice, decoded):
+                if result == 'ok':
+                    chunk.append((i, value))
+                elif result == 'animated':
+                    issues[i].classification_status = 'skipped'
+                    issues[i].confidence = 0.0
+                else:
+                    issues[i].classification_status = 'failed'
+            if not chunk:
+                continue
+            try:
+                results = classify_arrays([array for _, array in chunk], threshold=0.5, other_threshold=0.6)
+            except Exception as e:
+                self.stderr.write(f"[DL] ❌ Batch classification failed: {e}")
+                for i, _ in chunk:
+                    issues[i].classification_status = 'failed'
+                continue
+            for (i, _), (category, confidence, embedding) in zip(chunk, results):
+                issue = issues[i]
+                issue.classification_status = 'done'
+                issue.confidence = confidence
+                if category in VALID_CATEGORIES:
+                    issue.category = category
+                    if not given_priorities[i]:
+                        issue.priority = priority_for_category(category)
+                if embedding is not None:
+                    issue.embedding = embedding_to_bytes(embedding)
+                    embeddings[i] = embedding
+        return embeddings
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api import geo
+from api.models import Issue
+
+
+class Command(BaseCommand):
+    help = "Recompute Issue.geo_cell from latitude/longitude (needed after changing GEO_CELL_DEGREES)."
+
+    def handle(self, *args, **options):
+        changed = []
+        rows = Issue.objects.values_list('pk', 'latitude', 'longitude', 'geo_cell').iterator()
+        for pk, latitude, longitude, cell in rows:
+            new_cell = geo.cell_for(latitude, longitude)
+            if new_cell != cell:
+                changed.append(Issue(pk=pk, geo_cell=new_cell))
+
+        with transaction.atomic():
+            Issue.objects.bulk_update(changed, ['geo_cell'], batch_size=500)
+        self.stdout.write(self.style.SUCCESS(f"Updated grid cells on {len(changed)} issue(s)."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the FTS5 full-text index of issue title, description and address."
+
+    def handle(self, *args, **options):
+        if not search.fts_available():
+            raise CommandError("The default database is not SQLite with FTS5; nothing to rebuild.")
+        with transaction.atomic():
+            count = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} issue(s)."))
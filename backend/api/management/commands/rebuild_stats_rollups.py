@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api import rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the dashboard statistics rollups (IssueStatsRollup) from all issues."
+
+    def handle(self, *args, **options):
+        buckets = rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {buckets} statistics bucket(s)."))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from api.models import Issue
+
+
+class Command(BaseCommand):
+    help = "Recompute Issue.upvotes_count from the upvotes M2M table for issues that have drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report drifted issues without fixing them.")
+        parser.add_argument('--batch-size', type=int, default=500, help="Issues per UPDATE; keeps the id list under SQLite's variable limit.")
+
+    def handle(self, *args, **options):
+        drifted = Issue.objects.with_upvote_counts().exclude(upvotes_count=F('actual_upvotes'))
+        drifted_ids = list(drifted.values_list('pk', flat=True))
+
+        if not drifted_ids:
+            self.stdout.write(self.style.SUCCESS("All upvote counters are in sync."))
+            return
+
+        if options['dry_run']:
+            self.stdout.write(f"{len(drifted_ids)} issue(s) have drifted upvote counters.")
+            return
+
+        size = max(1, options['batch_size'])
+        updated = 0
+        with transaction.atomic():
+            for start in range(0, len(drifted_ids), size):
+                updated += Issue.objects.filter(pk__in=drifted_ids[start:start + size]).sync_upvote_counts()
+        self.stdout.write(self.style.SUCCESS(f"Reconciled upvote counters on {updated} issue(s)."))
@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from api import storage
+
+
+class Command(BaseCommand):
+    help = "Delete content-addressed media files that no issue has referenced for the grace period."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-minutes', type=int, default=60,
+                            help="Only remove blobs unreferenced for at least this long (default 60).")
+        parser.add_argument('--rebuild-refcounts', action='store_true',
+                            help="Recount references from the Issue table first (also registers older files).")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be removed.")
+
+    def handle(self, *args, **options):
+        if options['rebuild_refcounts']:
+            changed = storage.rebuild_refcounts()
+            self.stdout.write(f"Corrected reference counts on {changed} blob(s).")
+
+        removed, freed = storage.sweep(timedelta(minutes=options['grace_minutes']), dry_run=options['dry_run'])
+        verb = "Would remove" if options['dry_run'] else "Removed"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {removed} unreferenced blob(s), {freed / 1e6:.1f} MB."))
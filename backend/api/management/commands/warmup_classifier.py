@@ -0,0 +1,33 @@
+import resource
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+
+def _max_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+class Command(BaseCommand):
+    help = "Load the image classifier and run a dummy prediction, reporting load time and memory."
+
+    def handle(self, *args, **options):
+        from api import classify
+
+        tf_before = 'tensorflow' in sys.modules
+        rss_before = _max_rss_mb()
+        started = time.perf_counter()
+
+        if not classify.warmup():
+            self.stdout.write(self.style.WARNING(f"No model at {classify.model_path}; nothing to warm up."))
+            return
+
+        elapsed = time.perf_counter() - started
+        rss_after = _max_rss_mb()
+        self.stdout.write(f"TensorFlow imported before warmup: {tf_before}")
+        self.stdout.write(f"Model load + dummy predict: {elapsed:.2f}s")
+        self.stdout.write(f"Peak RSS: {rss_before:.0f} MB -> {rss_after:.0f} MB (+{rss_after - rss_before:.0f} MB)")
+        self.stdout.write(self.style.SUCCESS("Classifier warmed up."))
@@ -1,4 +1,9 @@
 from django.contrib.auth.models import BaseUserManager
+from django.db import models
+from django.db.models import Count, Exists, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
 
 class CustomUserManager(BaseUserManager):
     def create_user(self, username, email, password=None, **extra_fields):
@@ -15,3 +20,88 @@ class CustomUserManager(BaseUserManager):
         extra_fields.setdefault('is_superuser', True)
         extra_fields.setdefault('role', 'admin')
         return self.create_user(username, email, password, **extra_fields)
+
+
+class IssueQuerySet(models.QuerySet):
+    def with_feed_data(self, user=None, fields=None):
+        """Attach what IssueSerializer reads so a page of issues costs a fixed
+        number of queries: usernames via select_related, the comment count and
+        vote flag as subquery annotations, voter ids and comments as prefetches.
+
+        `fields` is the set of serializer fields that will be rendered (None
+        means all of them); joins, annotations, prefetches and columns for
+        anything outside it are skipped.
+        """
+        from .models import Comment, CustomUser
+
+        def wanted(name):
+            return fields is None or name in fields
+
+        qs = self
+        if fields is None:
+            qs = qs.defer('embedding')
+        else:
+            # Columns for the selected model fields plus what the computed ones read
+            columns = {f.name for f in self.model._meta.concrete_fields if f.name in fields}
+            columns |= {'id', 'created_at'}
+            if 'image_variants' in fields:
+                columns.add('image')
+            if 'days_open' in fields:
+                columns |= {'status', 'updated_at'}
+            if 'reporter_username' in fields:
+                columns.add('reporter')
+            if 'resolved_by_username' in fields:
+                columns.add('resolved_by')
+            qs = qs.only(*columns)
+
+        related = [name for name in ('reporter', 'resolved_by') if wanted(f'{name}_username')]
+        if related:
+            qs = qs.select_related(*related)
+
+        if wanted('comments_count'):
+            comment_counts = (
+                Comment.objects.filter(issue_id=OuterRef('pk'))
+                .order_by()
+                .values('issue_id')
+                .annotate(n=Count('pk'))
+                .values('n')
+            )
+            qs = qs.annotate(num_comments=Coalesce(Subquery(comment_counts), 0))
+        if wanted('user_has_voted') and user is not None and user.is_authenticated:
+            qs = qs.annotate(has_voted=Exists(
+                self.model.upvotes.through.objects.filter(issue_id=OuterRef('pk'), customuser_id=user.pk)
+            ))
+        if wanted('upvotes'):
+            # The serialized `upvotes` field is a list of voter ids; fetch just those
+            qs = qs.prefetch_related(Prefetch('upvotes', queryset=CustomUser.objects.only('id')))
+        if wanted('comments'):
+            qs = qs.prefetch_related(Prefetch(
+                'comments',
+                queryset=Comment.objects.select_related('user').order_by('created_at'),
+            ))
+        return qs
+
+    def with_upvote_counts(self):
+        """Annotate `actual_upvotes`, the live count from the upvotes M2M table."""
+        return self.annotate(actual_upvotes=upvote_count_expression(self.model))
+
+    def sync_upvote_counts(self):
+        """Rewrite the stored upvotes_count of every issue in the queryset from
+        the M2M table in a single UPDATE. Returns the number of rows updated.
+        """
+        return self.update(upvotes_count=upvote_count_expression(self.model), activity_at=timezone.now())
+
+    def touch(self):
+        """Mark the issues as changed for conditional GETs without saving them."""
+        return self.update(activity_at=timezone.now())
+
+
+def upvote_count_expression(issue_model):
+    counts = (
+        issue_model.upvotes.through.objects.filter(issue_id=OuterRef('pk'))
+        .order_by()
+        .values('issue_id')
+        .annotate(n=Count('pk'))
+        .values('n')
+    )
+    return Coalesce(Subquery(counts), 0)
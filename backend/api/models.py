@@ -1,6 +1,11 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-import os
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db.models.fields.files import FieldFile
+from django.utils import timezone
+from .managers import IssueQuerySet
+from .storage import content_storage
+from . import geo
 
 
 # Custom User Manager
@@ -36,6 +41,16 @@ class CustomUser(AbstractUser):
         return self.username
 
 
+def priority_for_category(category):
+    """Default priority for an issue category when the reporter gives none."""
+    category = (category or '').lower()
+    if category in ['electricity', 'water']:
+        return 'high'
+    if category in ['garbage', 'road']:
+        return 'medium'
+    return 'low'
+
+
 class Issue(models.Model):
     STATUS_CHOICES = (
         ('Open', 'Open'),
@@ -59,30 +74,105 @@ class Issue(models.Model):
         ('high', 'High'),
     ]
 
+    CLASSIFICATION_STATUS_CHOICES = (
+        ('none', 'No image'),
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('skipped', 'Skipped'),
+        ('failed', 'Failed'),
+    )
+
     title = models.CharField(max_length=200)
     description = models.TextField()
-    image = models.ImageField(upload_to='issue_images/', blank=True, null=True)
+    # Stored once per distinct content; see api/storage.py
+    image = models.ImageField(upload_to='issue_images/', storage=content_storage, blank=True, null=True)
     address = models.CharField(max_length=255)
+    latitude = models.FloatField(null=True, blank=True, validators=[MinValueValidator(-90), MaxValueValidator(90)])
+    longitude = models.FloatField(null=True, blank=True, validators=[MinValueValidator(-180), MaxValueValidator(180)])
+    # Grid cell of (latitude, longitude), see api/geo.py; set on save
+    geo_cell = models.IntegerField(null=True, blank=True, editable=False, db_index=True)
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES, default='other')
     priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, default='medium', blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Open')
+    classification_status = models.CharField(max_length=10, choices=CLASSIFICATION_STATUS_CHOICES, default='none')
+    confidence = models.FloatField(null=True, blank=True)
+    # float16 image embedding from the classifier, mirrored in the duplicate index
+    embedding = models.BinaryField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Bumped on every change that alters how the issue is rendered, including
+    # votes, comments and classification; drives the ETag/Last-Modified validators
+    activity_at = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
+    # When the issue entered a resolved status; cleared if it is reopened
+    resolved_at = models.DateTimeField(null=True, blank=True, editable=False)
     reporter = models.ForeignKey('CustomUser', on_delete=models.CASCADE, related_name='reported_issues')
     resolved_by = models.ForeignKey('CustomUser', on_delete=models.SET_NULL, null=True, blank=True, related_name='resolved_issues')
     upvotes = models.ManyToManyField('CustomUser', related_name='upvoted_issues', blank=True)
+    # Denormalized len(upvotes); maintained by the upvote toggle and the m2m_changed
+    # receiver, repaired with `manage.py reconcile_upvote_counts`.
+    upvotes_count = models.PositiveIntegerField(default=0, editable=False)
+
+    RESOLVED_STATUSES = ('Resolved', 'Closed')
+
+    objects = IssueQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination for the public feed walks (created_at, id) descending
+            models.Index(fields=['-created_at', '-id'], name='issue_feed_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.status})"
 
-    def delete(self, *args, **kwargs):
-        if self.image and os.path.isfile(self.image.path):
-            os.remove(self.image.path)
-        super().delete(*args, **kwargs)
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The row as loaded, so save signals can diff against it without a query
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def loaded_values(self, names):
+        """Values of the fields `names` as last loaded or saved, or None if any
+        of them isn't known (deferred, or the instance was never loaded).
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None or any(name not in loaded for name in names):
+            return None
+        return [loaded[name] for name in names]
+
+    def remember_saved(self, names=None):
+        """Record the current values of the fields `names` (default: every
+        loaded field) as what the row now holds.
+        """
+        loaded = self.__dict__.setdefault('_loaded_values', {})
+        deferred = self.get_deferred_fields()
+        for field in self._meta.concrete_fields:
+            if names is None and field.attname in deferred:
+                continue
+            if names is not None and field.name not in names and field.attname not in names:
+                continue
+            value = getattr(self, field.attname)
+            loaded[field.attname] = value.name if isinstance(value, FieldFile) else value
+
+    def save(self, *args, **kwargs):
+        self.geo_cell = geo.cell_for(self.latitude, self.longitude)
+        self.activity_at = timezone.now()
+        if self.status in self.RESOLVED_STATUSES:
+            self.resolved_at = self.resolved_at or timezone.now()
+        else:
+            self.resolved_at = None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields) | {'activity_at'}
+            if {'latitude', 'longitude'} & update_fields:
+                update_fields.add('geo_cell')
+            if 'status' in update_fields:
+                update_fields.add('resolved_at')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+        self.remember_saved(update_fields)
 
-    @property
-    def upvotes_count(self):
-        return self.upvotes.count()
 
 
 class Comment(models.Model):
@@ -95,3 +185,54 @@ class Comment(models.Model):
         return f"Comment by {self.user.username} on {self.issue.title}"
 
 
+class MediaBlob(models.Model):
+    """One stored file of the content-addressed media storage and the number
+    of model fields referencing it. Unreferenced blobs are removed by
+    `manage.py sweep_media` once `unreferenced_at` is older than its grace period.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    size = models.BigIntegerField(null=True, blank=True)
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    unreferenced_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount} refs)"
+
+
+class IssueImport(models.Model):
+    """Progress of one `manage.py ingest_issues` source, committed together
+    with each batch of issues so an interrupted import resumes after the last
+    committed batch.
+    """
+    source = models.CharField(max_length=255, unique=True)
+    records_done = models.PositiveIntegerField(default=0)
+    issues_created = models.PositiveIntegerField(default=0)
+    finished = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source}: {self.records_done} records"
+
+
+class IssueStatsRollup(models.Model):
+    """Issue counts per (creation day, category, status, priority), kept
+    current by the signals in api/signals.py. Resolved buckets also carry the
+    summed seconds from creation to resolution. Rebuild with
+    `manage.py rebuild_stats_rollups`.
+    """
+    day = models.DateField()
+    category = models.CharField(max_length=50)
+    status = models.CharField(max_length=20)
+    priority = models.CharField(max_length=10, blank=True)
+    issue_count = models.IntegerField(default=0)
+    resolution_seconds = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'category', 'status', 'priority'], name='issue_rollup_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.category}/{self.status}/{self.priority}: {self.issue_count}"
@@ -0,0 +1,63 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(issue):
+    """Opaque cursor pointing just past `issue` in (created_at, id) order."""
+    raw = f"{issue.created_at.isoformat()}|{issue.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|', 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(str(e))
+
+
+class KeysetPaginator:
+    """Keyset pagination over (created_at, id), newest first.
+
+    Unlike offset pagination the cost of a page does not grow with how deep
+    the client has scrolled: every page is an index range scan that stops
+    after `page_size + 1` rows.
+    """
+    default_page_size = 20
+    max_page_size = 100
+
+    def __init__(self, request):
+        self.request = request
+        try:
+            size = int(request.query_params.get('page_size', self.default_page_size))
+        except (TypeError, ValueError):
+            size = self.default_page_size
+        self.page_size = max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset):
+        queryset = queryset.order_by('-created_at', '-id')
+        cursor = self.request.query_params.get('cursor')
+        if cursor:
+            created_at, pk = decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            )
+
+        rows = list(queryset[:self.page_size + 1])
+        page = rows[:self.page_size]
+        self.next_cursor = encode_cursor(page[-1]) if len(rows) > self.page_size else None
+        return page
+
+    def get_paginated_data(self, data):
+        return {
+            'results': data,
+            'next': self.next_cursor,
+            'page_size': self.page_size,
+        }
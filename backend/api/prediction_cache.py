@@ -0,0 +1,117 @@
+import hashlib
+import threading
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+from PIL import Image
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def perceptual_hash(img_array):
+    """64-bit difference hash of a (H, W, 3) float image.
+    Near-identical photos (recompressed, resized, slightly cropped) land
+    within a few bits of each other.
+    """
+    gray = Image.fromarray(np.asarray(img_array, dtype=np.float32).mean(axis=2), mode='F')
+    small = np.asarray(gray.resize((9, 8), Image.BOX))
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+class PredictionCache:
+    """Bounded LRU of model outputs, keyed by model version plus the
+    SHA-256 of the image bytes. An optional second tier matches near-duplicate
+    images by perceptual hash within `phash_max_distance` bits.
+
+    The perceptual tier splits each hash into phash_max_distance + 1 bands:
+    two hashes within that distance agree exactly on at least one band, so a
+    lookup only compares the entries sharing a band with it, not every entry.
+    """
+
+    def __init__(self, max_entries=2048, phash_max_distance=None):
+        self.max_entries = max_entries
+        self.phash_max_distance = phash_max_distance
+        self._entries = OrderedDict()  # (version, sha) -> (prediction, phash)
+        self._bands = defaultdict(set)  # (version, band, band bits) -> keys
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.perceptual_hits = 0
+        self.misses = 0
+
+    def get(self, version, sha):
+        with self._lock:
+            entry = self._entries.get((version, sha))
+            if entry is None:
+                return None
+            self._entries.move_to_end((version, sha))
+            self.exact_hits += 1
+            return entry[0]
+
+    def _band_keys(self, version, phash):
+        count = min(self.phash_max_distance + 1, 64)
+        width = 64 // count
+        for band in range(count):
+            bits = 64 - band * width if band == count - 1 else width
+            yield version, band, (phash >> (band * width)) & ((1 << bits) - 1)
+
+    def get_similar(self, version, phash):
+        """Prediction for the closest cached image within the distance limit."""
+        if self.phash_max_distance is None or phash is None:
+            return None
+        with self._lock:
+            candidates = set()
+            for band_key in self._band_keys(version, phash):
+                candidates |= self._bands.get(band_key, set())
+            best_key, best_distance = None, self.phash_max_distance + 1
+            for key in candidates:
+                distance = (phash ^ self._entries[key][1]).bit_count()
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+            if best_key is None:
+                return None
+            self._entries.move_to_end(best_key)
+            self.perceptual_hits += 1
+            return self._entries[best_key][0]
+
+    def put(self, version, sha, prediction, phash=None):
+        key = (version, sha)
+        with self._lock:
+            if key in self._entries:
+                self._unband(key, self._entries[key][1])
+            self._entries[key] = (prediction, phash)
+            self._entries.move_to_end(key)
+            if phash is not None and self.phash_max_distance is not None:
+                for band_key in self._band_keys(version, phash):
+                    self._bands[band_key].add(key)
+            while len(self._entries) > self.max_entries:
+                old_key, (_, old_phash) = self._entries.popitem(last=False)
+                self._unband(old_key, old_phash)
+
+    def _unband(self, key, phash):
+        if phash is None or self.phash_max_distance is None:
+            return
+        for band_key in self._band_keys(key[0], phash):
+            keys = self._bands.get(band_key)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._bands[band_key]
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.exact_hits + self.perceptual_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "exact_hits": self.exact_hits,
+                "perceptual_hits": self.perceptual_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.exact_hits + self.perceptual_hits) / lookups, 4) if lookups else 0.0,
+            }
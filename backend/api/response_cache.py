@@ -0,0 +1,104 @@
+import hashlib
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+# Shared cache for the anonymous, non-personalized feed responses. Entries
+# are keyed by a generation token that any change to issues, comments or
+# votes replaces, so invalidation is one cache write no matter how many
+# query-string variants are cached. The write only reaches processes that
+# share the cache backend: with the default per-process locmem, other
+# workers keep serving their entries for up to RESPONSE_CACHE_TIMEOUT, so
+# run more than one worker with RESPONSE_CACHE=file or redis.
+
+GENERATION_KEY = 'responses:generation'
+
+
+class ResponseCache:
+    """get_or_build() returns the cached entry for (endpoint, variant) or
+    builds it. When an entry is cold, only the request holding the rebuild
+    lock runs `build`; the others wait briefly for its result instead of
+    all hitting the database.
+    """
+    poll_interval = 0.01
+
+    def __init__(self, alias='responses', timeout=300, lock_timeout=10, wait_timeout=2.0):
+        self.alias = alias
+        self.timeout = timeout
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self._counts = defaultdict(lambda: {'hits': 0, 'misses': 0, 'waits': 0})
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _count(self, endpoint, outcome):
+        with self._lock:
+            self._counts[endpoint][outcome] += 1
+
+    def generation(self):
+        generation = self.cache.get(GENERATION_KEY)
+        if generation is None:
+            # First use, or evicted: start a generation no old entry can have
+            self.cache.add(GENERATION_KEY, time.time_ns(), None)
+            generation = self.cache.get(GENERATION_KEY)
+        return generation
+
+    def invalidate(self):
+        self.cache.set(GENERATION_KEY, time.time_ns(), None)
+
+    def get_or_build(self, endpoint, variant, build):
+        digest = hashlib.md5(variant.encode()).hexdigest()
+        key = f'responses:{endpoint}:{self.generation()}:{digest}'
+        entry = self.cache.get(key)
+        if entry is not None:
+            self._count(endpoint, 'hits')
+            return entry
+
+        lock_key = key + ':lock'
+        if self.cache.add(lock_key, 1, self.lock_timeout):
+            try:
+                entry = build()
+                self.cache.set(key, entry, self.timeout)
+            finally:
+                self.cache.delete(lock_key)
+            self._count(endpoint, 'misses')
+            return entry
+
+        # Another request is rebuilding this entry; wait for it
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            entry = self.cache.get(key)
+            if entry is not None:
+                self._count(endpoint, 'waits')
+                return entry
+        # The builder is slow or died; don't hold this request any longer
+        self._count(endpoint, 'misses')
+        return build()
+
+    def stats(self):
+        with self._lock:
+            stats = {}
+            for endpoint, counts in self._counts.items():
+                served = counts['hits'] + counts['waits']
+                total = served + counts['misses']
+                stats[endpoint] = {**counts, 'hit_rate': round(served / total, 4) if total else 0.0}
+        return {'backend': settings.CACHES[self.alias]['BACKEND'], 'endpoints': stats}
+
+
+response_cache = ResponseCache(timeout=getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+
+
+def invalidate():
+    """Drop every cached response in this cache backend once the current
+    transaction commits (right away outside one), so no request can re-cache
+    the old rows.
+    """
+    transaction.on_commit(response_cache.invalidate)
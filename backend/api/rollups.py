@@ -0,0 +1,200 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Issue, IssueStatsRollup
+
+# Dashboard statistics read from IssueStatsRollup instead of scanning issues.
+# Every issue counts once in the bucket for (creation day, category, status,
+# priority); saves and deletes move it between buckets with F() updates, so
+# the table stays O(buckets) and summary() never touches api_issue.
+
+ROLLUP_FIELDS = ('created_at', 'category', 'status', 'priority', 'resolved_at', 'updated_at')
+TRACKED_FIELDS = frozenset(['category', 'status', 'priority', 'resolved_at'])
+
+
+def bucket(created_at, category, status, priority, resolved_at, updated_at):
+    """(bucket key, resolution seconds) that an issue with these values adds."""
+    key = (timezone.localdate(created_at), category, status, priority or '')
+    seconds = 0
+    if status in Issue.RESOLVED_STATUSES:
+        # Issues resolved before resolved_at existed fall back to their last
+        # update, like get_days_open does
+        resolved_at = resolved_at or updated_at
+        seconds = max(int((resolved_at - created_at).total_seconds()), 0)
+    return key, seconds
+
+
+def bucket_for(issue):
+    return bucket(*(getattr(issue, name) for name in ROLLUP_FIELDS))
+
+
+def stored_bucket(issue_id):
+    """Bucket of the issue as currently saved, or None if it isn't."""
+    row = Issue.objects.filter(pk=issue_id).values_list(*ROLLUP_FIELDS).first()
+    return bucket(*row) if row else None
+
+
+def _apply(key, count, seconds):
+    day, category, status, priority = key
+    rows = IssueStatsRollup.objects.filter(day=day, category=category, status=status, priority=priority)
+    changes = {
+        'issue_count': F('issue_count') + count,
+        'resolution_seconds': F('resolution_seconds') + seconds,
+    }
+    if rows.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            IssueStatsRollup.objects.create(
+                day=day, category=category, status=status, priority=priority,
+                issue_count=count, resolution_seconds=seconds,
+            )
+    except IntegrityError:
+        # Another request created the bucket first
+        rows.update(**changes)
+
+
+def move(before, after):
+    """Move one issue from bucket `before` to `after`; either may be None
+    (created / deleted).
+    """
+    if before == after:
+        return
+    if before is not None:
+        _apply(before[0], -1, -before[1])
+    if after is not None:
+        _apply(after[0], 1, after[1])
+
+
+BULK_BUCKETS = 50
+
+
+def move_many(moves):
+    """Apply many (before, after) moves, for bulk writes that bypass the save
+    signals. Few buckets get one F() update each; many (e.g. an import spread
+    over years of creation days) are read once, then written with
+    bulk_update/bulk_create.
+    """
+    counts, seconds = Counter(), Counter()
+    for before, after in moves:
+        if before == after:
+            continue
+        if before is not None:
+            counts[before[0]] -= 1
+            seconds[before[0]] -= before[1]
+        if after is not None:
+            counts[after[0]] += 1
+            seconds[after[0]] += after[1]
+    keys = [key for key in counts.keys() | seconds.keys() if counts[key] or seconds[key]]
+    if len(keys) >= BULK_BUCKETS:
+        try:
+            with transaction.atomic():
+                _apply_many(keys, counts, seconds)
+            return
+        except IntegrityError:
+            pass  # a bucket was created concurrently; fall back to per-bucket updates
+    for key in keys:
+        _apply(key, counts[key], seconds[key])
+
+
+def _apply_many(keys, counts, seconds):
+    existing = {
+        (row.day, row.category, row.status, row.priority): row
+        for row in IssueStatsRollup.objects.select_for_update().filter(day__in={key[0] for key in keys})
+    }
+    changed, created = [], []
+    for key in keys:
+        row = existing.get(key)
+        if row is None:
+            day, category, status, priority = key
+            created.append(IssueStatsRollup(
+                day=day, category=category, status=status, priority=priority,
+                issue_count=counts[key], resolution_seconds=seconds[key],
+            ))
+        else:
+            row.issue_count += counts[key]
+            row.resolution_seconds += seconds[key]
+            changed.append(row)
+    IssueStatsRollup.objects.bulk_update(changed, ['issue_count', 'resolution_seconds'], batch_size=500)
+    IssueStatsRollup.objects.bulk_create(created, batch_size=500)
+
+
+def rebuild():
+    """Recompute every bucket from api_issue. Returns the number of buckets."""
+    counts, seconds = Counter(), Counter()
+    for row in Issue.objects.values_list(*ROLLUP_FIELDS).iterator(chunk_size=2000):
+        key, resolution = bucket(*row)
+        counts[key] += 1
+        seconds[key] += resolution
+
+    with transaction.atomic():
+        IssueStatsRollup.objects.all().delete()
+        IssueStatsRollup.objects.bulk_create(
+            [
+                IssueStatsRollup(
+                    day=day, category=category, status=status, priority=priority,
+                    issue_count=n, resolution_seconds=seconds[(day, category, status, priority)],
+                )
+                for (day, category, status, priority), n in counts.items()
+            ],
+            batch_size=500,
+        )
+    return len(counts)
+
+
+def _days(total_seconds, n):
+    return round(total_seconds / n / 86400, 2) if n else None
+
+
+def summary(start=None, end=None, category=None):
+    """Dashboard numbers for issues created between `start` and `end`
+    (inclusive dates), optionally for one category.
+    """
+    rows = IssueStatsRollup.objects.filter(issue_count__gt=0)
+    if start:
+        rows = rows.filter(day__gte=start)
+    if end:
+        rows = rows.filter(day__lte=end)
+    if category:
+        rows = rows.filter(category=category)
+
+    today = timezone.localdate()
+    by_status, by_category, by_priority, daily = Counter(), Counter(), Counter(), Counter()
+    resolved_n, resolved_s = Counter(), Counter()
+    open_n = open_days = 0
+    buckets = 0
+    for day, cat, status, priority, n, seconds in rows.values_list(
+        'day', 'category', 'status', 'priority', 'issue_count', 'resolution_seconds'
+    ):
+        buckets += 1
+        by_status[status] += n
+        by_category[cat] += n
+        by_priority[priority] += n
+        daily[day] += n
+        if status in Issue.RESOLVED_STATUSES:
+            resolved_n[cat] += n
+            resolved_s[cat] += seconds
+        else:
+            open_n += n
+            open_days += n * (today - day).days
+
+    return {
+        "total": sum(by_status.values()),
+        "by_status": dict(by_status),
+        "by_category": dict(by_category),
+        "by_priority": dict(by_priority),
+        "resolution": {
+            "resolved": sum(resolved_n.values()),
+            "avg_days": _days(sum(resolved_s.values()), sum(resolved_n.values())),
+            "avg_days_by_category": {cat: _days(resolved_s[cat], n) for cat, n in resolved_n.items()},
+        },
+        "open": {
+            "count": open_n,
+            "avg_days_open": round(open_days / open_n, 2) if open_n else None,
+        },
+        "daily": [{"day": day.isoformat(), "count": n} for day, n in sorted(daily.items())],
+        "buckets": buckets,
+    }
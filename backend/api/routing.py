@@ -0,0 +1,8 @@
+from django.urls import path
+
+from .consumers import IssueFeedConsumer
+
+websocket_urlpatterns = [
+    path('ws/issues/', IssueFeedConsumer.as_asgi()),
+    path('ws/issues/<int:issue_id>/', IssueFeedConsumer.as_asgi()),
+]
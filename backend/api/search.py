@@ -0,0 +1,151 @@
+import html
+import re
+
+from django.db import DatabaseError, connection
+
+from .models import Issue
+
+# Full-text issue search on an SQLite FTS5 table. The table keeps its own copy
+# of title/description/address with rowid = issue id; signals keep it in sync
+# and `manage.py rebuild_search_index` backfills it. Queries are index lookups
+# ranked by bm25(), so latency doesn't grow with the issue table like LIKE scans.
+
+FTS_TABLE = 'api_issue_fts'
+INDEXED_FIELDS = ('title', 'description', 'address')
+
+# highlight()/snippet() wrap matches in these private-use characters; the
+# column text is HTML-escaped first, then they become <mark> tags
+MARK_START, MARK_END = '\ue000', '\ue001'
+
+_available = None
+
+
+def fts_available():
+    """True when the default database is SQLite built with FTS5. The first
+    call also creates the index table if it is missing.
+    """
+    global _available
+    if _available is None:
+        _available = connection.vendor == 'sqlite' and ensure_table()
+    return _available
+
+
+def ensure_table():
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                f"USING fts5({', '.join(INDEXED_FIELDS)}, tokenize='porter unicode61')"
+            )
+        return True
+    except DatabaseError:
+        # SQLite compiled without FTS5
+        return False
+
+
+def index_issue(issue):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [issue.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(INDEXED_FIELDS)}) VALUES (%s, %s, %s, %s)",
+            [issue.pk, issue.title, issue.description, issue.address],
+        )
+
+
+def index_issues(issues):
+    """Add newly created issues in one executemany (bulk imports skip the
+    save signal that calls index_issue()).
+    """
+    if not fts_available() or not issues:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(INDEXED_FIELDS)}) VALUES (%s, %s, %s, %s)",
+            [[issue.pk, issue.title, issue.description, issue.address] for issue in issues],
+        )
+
+
+def remove_issue(issue_id):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [issue_id])
+
+
+def rebuild():
+    """Recreate the index from api_issue in one INSERT ... SELECT. Returns row count."""
+    if not fts_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    ensure_table()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(INDEXED_FIELDS)}) "
+            f"SELECT id, {', '.join(INDEXED_FIELDS)} FROM api_issue"
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT COUNT(*) FROM {FTS_TABLE}")
+        return cursor.fetchone()[0]
+
+
+def match_query(term):
+    """Turn free text into a safe FTS5 query: every word must match, and the
+    last one may be a prefix (so results update while typing). Returns None
+    if there is nothing to search for.
+    """
+    words = re.findall(r'\w+', term or '')
+    if not words:
+        return None
+    quoted = [f'"{word}"' for word in words]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def matching_ids_sql(term):
+    """(sql, params) selecting ids of issues matching `term`, for pk__in filters."""
+    return f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match_query(term)]
+
+
+def marked_html(text):
+    """Escape user text from highlight()/snippet() and mark its matches."""
+    return html.escape(text or '').replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+def search(term, status=None, category=None, limit=20, offset=0):
+    """BM25-ranked matches, best first, as Issue instances carrying extra
+    `rank`, `title_highlight` and `description_snippet` attributes (escaped
+    HTML with <mark> around the matches).
+    """
+    query = match_query(term)
+    if query is None:
+        return []
+
+    where = [f"{FTS_TABLE} MATCH %s"]
+    params = [query]
+    if status:
+        where.append("i.status = %s")
+        params.append(status)
+    if category:
+        where.append("i.category = %s")
+        params.append(category)
+    params += [limit, offset]
+
+    sql = f"""
+        SELECT i.id, i.title, i.status, i.category, i.priority, i.address, i.created_at,
+               bm25({FTS_TABLE}, 10.0, 1.0, 2.0) AS rank,
+               highlight({FTS_TABLE}, 0, '{MARK_START}', '{MARK_END}') AS title_highlight,
+               snippet({FTS_TABLE}, 1, '{MARK_START}', '{MARK_END}', '…', 16) AS description_snippet
+        FROM {FTS_TABLE}
+        JOIN api_issue i ON i.id = {FTS_TABLE}.rowid
+        WHERE {' AND '.join(where)}
+        ORDER BY rank
+        LIMIT %s OFFSET %s
+    """
+    results = list(Issue.objects.raw(sql, params))
+    for issue in results:
+        issue.title_highlight = marked_html(issue.title_highlight)
+        issue.description_snippet = marked_html(issue.description_snippet)
+    return results
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import CustomUser, Issue ,Comment
+from .models import CustomUser, Issue ,Comment, priority_for_category
+from . import derivatives
 from datetime import date
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError as DjangoValidationError
@@ -7,10 +8,14 @@ from django.core.exceptions import ValidationError as DjangoValidationError
 class UserSerializer(serializers.ModelSerializer):
     date_joined = serializers.DateTimeField(format="%Y-%m-%dT%H:%M:%S.%fZ", read_only=True)
     confirm_password = serializers.CharField(write_only=True, required=True)
+    profile_picture_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = CustomUser
-        fields = ['id', 'username', 'email', 'password', 'confirm_password', 'role', 'profile_picture', 'date_joined']
+        fields = [
+            'id', 'username', 'email', 'password', 'confirm_password', 'role',
+            'profile_picture', 'profile_picture_variants', 'date_joined',
+        ]
         extra_kwargs = {
             'password': {'write_only': True},
             'role': {'read_only': True},
@@ -59,6 +64,9 @@ class UserSerializer(serializers.ModelSerializer):
         if 'email' in validated_data and validated_data['email']:
             validated_data['email'] = validated_data['email'].strip().lower()
         return CustomUser.objects.create_user(**validated_data)
+
+    def get_profile_picture_variants(self, obj):
+        return derivatives.variant_urls(obj.profile_picture, self.context.get('request'))
     
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -71,35 +79,100 @@ class CommentSerializer(serializers.ModelSerializer):
         fields = ['id', 'issue', 'issue_title', 'user_id', 'user_username', 'text', 'created_at']
 
 
+class SparseFieldsMixin:
+    """Render only the fields the client asks for.
+
+    ?fields=a,b,c picks fields explicitly (id is always kept) and
+    ?expand=x adds fields from `expandable_fields`. Without ?fields= the
+    serializer falls back to `default_fields` (None = every field), and
+    expandable fields are always left out unless asked for.
+    """
+    default_fields = None
+    expandable_fields = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        params = request.query_params if request is not None else {}
+        requested = _split(params.get('fields'))
+        expand = _split(params.get('expand')) & set(self.expandable_fields)
+
+        if requested:
+            keep = requested | {'id'} | expand
+        elif self.default_fields is not None:
+            keep = set(self.default_fields) | expand
+        else:
+            keep = (set(self.fields) - set(self.expandable_fields)) | expand
+        for name in list(self.fields):
+            if name not in keep:
+                self.fields.pop(name)
+
+    @classmethod
+    def selected_fields(cls, request):
+        """Names of the fields this serializer will render for `request`."""
+        return set(cls(context={'request': request}).fields)
+
+
+def _split(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+class SharedImageField(serializers.ImageField):
+    """ImageField that renders a relative URL in responses cached for every
+    client (context 'shared'); views make it absolute per request.
+    """
+
+    def to_representation(self, value):
+        if self.context.get('shared'):
+            return value.url if value else None
+        return super().to_representation(value)
+
+
 class IssueSerializer(serializers.ModelSerializer):
     reporter_username = serializers.CharField(source='reporter.username', read_only=True)
     resolved_by_username = serializers.SerializerMethodField()
-    image = serializers.ImageField(use_url=True, required=False)
+    image = SharedImageField(use_url=True, required=False)
+    # Resized WebP/JPEG copies; see api/derivatives.py
+    image_variants = serializers.SerializerMethodField()
     days_open = serializers.SerializerMethodField()
     comments = CommentSerializer(many=True, read_only=True)
     comments_count = serializers.SerializerMethodField()
-    upvotes_count = serializers.SerializerMethodField()
     user_has_voted = serializers.SerializerMethodField()
 
     class Meta:
         model = Issue
-        fields = '__all__'
-        read_only_fields = ['reporter', 'resolved_by']  
+        exclude = ['embedding', 'geo_cell']
+        read_only_fields = ['reporter', 'resolved_by', 'upvotes_count', 'classification_status', 'confidence']  
+
+    def validate(self, attrs):
+        latitude = attrs.get('latitude', getattr(self.instance, 'latitude', None))
+        longitude = attrs.get('longitude', getattr(self.instance, 'longitude', None))
+        if (latitude is None) != (longitude is None):
+            raise serializers.ValidationError("latitude and longitude must be given together")
+        return attrs
+
+    def get_image_variants(self, obj):
+        request = None if self.context.get('shared') else self.context.get('request')
+        return derivatives.variant_urls(obj.image, request)
 
     def get_days_open(self, obj):
         if obj.status and obj.status.lower() == 'resolved' and obj.updated_at:
             return (obj.updated_at.date() - obj.created_at.date()).days
         return (date.today() - obj.created_at.date()).days
 
-    def get_upvotes_count(self, obj):
-        return obj.upvotes.count()
-
+    # The count/vote getters prefer annotations from Issue.objects.with_feed_data()
+    # and only fall back to per-row queries for plain querysets.
     def get_comments_count(self, obj):
+        if hasattr(obj, 'num_comments'):
+            return obj.num_comments
         return obj.comments.count()
 
     def get_user_has_voted(self, obj):
         request = self.context.get('request')
-        if request and request.user.is_authenticated:
+        # Responses cached for everyone leave this False; views merge it per user
+        if request and request.user.is_authenticated and not self.context.get('shared'):
+            if hasattr(obj, 'has_voted'):
+                return obj.has_voted
             return obj.upvotes.filter(pk=request.user.pk).exists()
         return False
 
@@ -110,11 +183,17 @@ class IssueSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         if 'priority' not in validated_data or not validated_data['priority']:
-            category = validated_data.get('category', '').lower()
-            if category in ['electricity', 'water']:
-                validated_data['priority'] = 'high'
-            elif category in ['garbage', 'road']:
-                validated_data['priority'] = 'medium'
-            else:
-                validated_data['priority'] = 'low'
+            validated_data['priority'] = priority_for_category(validated_data.get('category', ''))
         return super().create(validated_data)
+
+
+class IssueListSerializer(SparseFieldsMixin, IssueSerializer):
+    """Compact issue representation for list endpoints: no nested comments,
+    voter ids or classifier internals unless requested.
+    """
+    default_fields = (
+        'id', 'title', 'description', 'address', 'latitude', 'longitude', 'category',
+        'priority', 'status', 'image', 'image_variants', 'created_at', 'updated_at', 'upvotes_count',
+        'reporter_username', 'days_open', 'user_has_voted',
+    )
+    expandable_fields = ('comments',)
@@ -0,0 +1,190 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import derivatives, live, response_cache, rollups, search, storage, tasks
+from .duplicates import get_index
+from .models import Comment, CustomUser, Issue
+
+
+@receiver(m2m_changed, sender=Issue.upvotes.through)
+def sync_upvotes_count(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep Issue.upvotes_count right when votes change through the related
+    managers (admin form, shell, user.upvoted_issues). The API toggle writes
+    the through table directly and maintains the counter itself.
+    """
+    if reverse:
+        # Changed from the user side: instance is a user, pk_set holds issue ids
+        if action == 'pre_clear':
+            instance._cleared_issue_ids = list(instance.upvoted_issues.values_list('pk', flat=True))
+            return
+        if action == 'post_clear':
+            pk_set = getattr(instance, '_cleared_issue_ids', [])
+        elif action not in ('post_add', 'post_remove'):
+            return
+        issues = Issue.objects.filter(pk__in=pk_set or [])
+    else:
+        if action not in ('post_add', 'post_remove', 'post_clear'):
+            return
+        issues = Issue.objects.filter(pk=instance.pk)
+    issues.sync_upvote_counts()
+    response_cache.invalidate()
+    live.publish_many(
+        (issue_id, [live.VOTES], {'upvotes_count': count})
+        for issue_id, count in issues.values_list('pk', 'upvotes_count')
+    )
+
+
+@receiver(post_delete, sender=Issue)
+def drop_issue_embedding(sender, instance, **kwargs):
+    """Tombstone a deleted issue in the duplicate index."""
+    if 'embedding' in instance.get_deferred_fields() or instance.embedding is not None:
+        get_index().remove(instance.pk)
+
+
+@receiver(post_save, sender=Issue)
+def index_issue_text(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) & set(search.INDEXED_FIELDS):
+        return
+    search.index_issue(instance)
+
+
+@receiver(post_delete, sender=Issue)
+def unindex_issue_text(sender, instance, **kwargs):
+    search.remove_issue(instance.pk)
+
+
+@receiver(pre_save, sender=Issue)
+def remember_rollup_bucket(sender, instance, update_fields=None, **kwargs):
+    """Note which stats bucket the issue leaves; saves that don't touch the
+    bucketed fields skip the lookup.
+    """
+    if update_fields is not None and not set(update_fields) & rollups.TRACKED_FIELDS:
+        instance._rollup_pending = False
+        instance._rollup_before = None
+        return
+    instance._rollup_pending = True
+    if instance._state.adding:
+        instance._rollup_before = None
+    else:
+        values = instance.loaded_values(rollups.ROLLUP_FIELDS)
+        instance._rollup_before = rollups.bucket(*values) if values else rollups.stored_bucket(instance.pk)
+
+
+@receiver(post_save, sender=Issue)
+def update_rollup_bucket(sender, instance, **kwargs):
+    if getattr(instance, '_rollup_pending', False):
+        instance._rollup_pending = False
+        rollups.move(instance._rollup_before, rollups.bucket_for(instance))
+
+
+@receiver(post_delete, sender=Issue)
+def drop_from_rollup(sender, instance, **kwargs):
+    rollups.move(rollups.bucket_for(instance), None)
+
+
+def _build_image_variants(instance, field_name, update_fields):
+    if update_fields is not None and field_name not in update_fields:
+        return
+    if field_name in instance.get_deferred_fields():
+        return
+    field_file = getattr(instance, field_name)
+    if field_file and not derivatives.has_variants(field_file.name):
+        # Off the request: serializers leave out variants until they exist
+        name = field_file.name
+        transaction.on_commit(lambda: tasks.submit_image_variants(name))
+
+
+@receiver(post_save, sender=Issue)
+def build_issue_image_variants(sender, instance, update_fields=None, **kwargs):
+    _build_image_variants(instance, 'image', update_fields)
+
+
+@receiver(post_save, sender=CustomUser)
+def build_profile_picture_variants(sender, instance, update_fields=None, **kwargs):
+    _build_image_variants(instance, 'profile_picture', update_fields)
+
+
+@receiver(pre_save, sender=Issue)
+def remember_stored_image(sender, instance, update_fields=None, **kwargs):
+    """Note the image the row referenced before this save, for the media refcounts."""
+    if update_fields is not None and 'image' not in update_fields:
+        instance._image_before = instance._image_pending = None
+        return
+    instance._image_pending = True
+    if instance._state.adding:
+        instance._image_before = None
+    else:
+        loaded = instance.loaded_values(['image'])
+        instance._image_before = loaded[0] if loaded else (
+            Issue.objects.filter(pk=instance.pk).values_list('image', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Issue)
+def count_stored_image(sender, instance, **kwargs):
+    if not getattr(instance, '_image_pending', None):
+        return
+    instance._image_pending = None
+    before, after = instance._image_before or '', instance.image.name or ''
+    if before != after:
+        storage.retain(after)
+        storage.release(before)
+
+
+@receiver(pre_delete, sender=Issue)
+def remember_deleted_image(sender, instance, **kwargs):
+    # Read now: a deferred image field can't be loaded once the row is gone
+    instance._image_before = instance.image.name
+
+
+@receiver(post_delete, sender=Issue)
+def release_stored_image(sender, instance, **kwargs):
+    """Deleting an issue only drops its reference; sweep_media removes the file."""
+    storage.release(getattr(instance, '_image_before', None))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def touch_commented_issue(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Issue) or getattr(origin, 'model', None) is Issue:
+        # Cascade from deleting the issue itself: nothing left to touch or count
+        return
+    Issue.objects.filter(pk=instance.issue_id).touch()
+    response_cache.invalidate()
+    live.publish(instance.issue_id, live.COMMENTS,
+                 comments_count=Comment.objects.filter(issue_id=instance.issue_id).count())
+
+
+@receiver(post_save, sender=Issue)
+def publish_issue_change(sender, instance, created, **kwargs):
+    """Live feed events for new issues and category/status/priority changes,
+    diffed against the bucket remember_rollup_bucket read before the save.
+    """
+    if created:
+        live.publish(instance.pk, live.CREATED, **live.created_fields(instance))
+        return
+    before = getattr(instance, '_rollup_before', None)
+    if before is None:
+        return
+    (_, category, status, priority), _ = before
+    events, changes = live.field_changes((category, status, priority), instance)
+    if events:
+        live.publish(instance.pk, *events, **changes)
+
+
+@receiver(post_delete, sender=Issue)
+def publish_issue_deleted(sender, instance, **kwargs):
+    live.publish(instance.pk, live.DELETED)
+
+
+@receiver(post_save, sender=Issue)
+@receiver(post_delete, sender=Issue)
+def invalidate_cached_responses(sender, **kwargs):
+    response_cache.invalidate()
+
+
+@receiver(post_migrate)
+def create_search_table(sender, app_config=None, **kwargs):
+    if app_config is not None and app_config.label == 'api':
+        search.ensure_table()
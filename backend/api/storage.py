@@ -0,0 +1,180 @@
+import hashlib
+import os
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from . import derivatives
+
+# Content-addressed media. A file is stored once per distinct content, as
+# <upload dir>/<sha[:2]>/<sha256>.<ext>, and has a MediaBlob row counting the
+# model fields that point at it. Signals in api/signals.py keep the counts;
+# deleting an issue only decrements, and `manage.py sweep_media` removes
+# blobs that have been unreferenced for longer than the grace period.
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names files by SHA-256 and skips writing bytes
+    it already has.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content in _save(); never suffix it
+        return name
+
+    def _save(self, name, content):
+        from .models import MediaBlob
+
+        digest = hashlib.sha256()
+        size = 0
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+            size += len(chunk)
+        sha256 = digest.hexdigest()
+        folder = os.path.dirname(name)
+
+        existing = MediaBlob.objects.filter(sha256=sha256, name__startswith=f"{folder}/").first()
+        if existing is not None and self.exists(existing.name):
+            if existing.refcount == 0:
+                # Keep the sweeper off a blob that is about to be referenced again
+                MediaBlob.objects.filter(pk=existing.pk, refcount=0).update(unreferenced_at=timezone.now())
+            return existing.name
+
+        extension = os.path.splitext(name)[1].lower()
+        blob_name = f"{folder}/{sha256[:2]}/{sha256}{extension}"
+        if not self.exists(blob_name):
+            path = self.path(blob_name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.part"
+            content.seek(0)
+            with open(tmp_path, 'wb') as f:
+                for chunk in content.chunks():
+                    f.write(chunk)
+            os.replace(tmp_path, path)
+        # Unreferenced until a model row is saved with it, so an abandoned
+        # upload is swept like any other orphan
+        MediaBlob.objects.get_or_create(
+            name=blob_name, defaults={'sha256': sha256, 'size': size, 'unreferenced_at': timezone.now()}
+        )
+        return blob_name
+
+
+content_storage = ContentAddressedStorage()
+
+
+def retain(name):
+    from .models import MediaBlob
+
+    if not name:
+        return
+    if not MediaBlob.objects.filter(name=name).update(refcount=F('refcount') + 1, unreferenced_at=None):
+        # A file stored before content addressing (or by another storage)
+        MediaBlob.objects.get_or_create(name=name, defaults={'refcount': 0})
+        MediaBlob.objects.filter(name=name).update(refcount=F('refcount') + 1, unreferenced_at=None)
+
+
+def retain_many(names):
+    """retain() for many names (stored through content_storage) with one
+    UPDATE per distinct reference count.
+    """
+    from .models import MediaBlob
+
+    by_count = defaultdict(list)
+    for name, count in Counter(name for name in names if name).items():
+        by_count[count].append(name)
+    for count, group in by_count.items():
+        for start in range(0, len(group), 500):
+            MediaBlob.objects.filter(name__in=group[start:start + 500]).update(
+                refcount=F('refcount') + count, unreferenced_at=None
+            )
+
+
+def release(name):
+    from .models import MediaBlob
+
+    if not name:
+        return
+    blobs = MediaBlob.objects.filter(name=name, refcount__gt=0)
+    blobs.update(refcount=F('refcount') - 1)
+    MediaBlob.objects.filter(name=name, refcount=0, unreferenced_at__isnull=True).update(unreferenced_at=timezone.now())
+
+
+def sweep(grace=timedelta(hours=1), dry_run=False, batch_size=500):
+    """Delete blobs unreferenced for longer than `grace`: their rows in bulk,
+    then the files and image variants. Returns (blobs removed, bytes freed).
+    """
+    from .models import Issue, MediaBlob
+
+    cutoff = timezone.now() - grace
+    candidates = MediaBlob.objects.filter(refcount=0, unreferenced_at__lt=cutoff)
+    removed = freed = 0
+    last_pk = 0
+    while True:
+        batch = list(candidates.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'name', 'size')[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1][0]
+        # Counts can only be wrong towards "still referenced"; double-check anyway
+        in_use = set(Issue.objects.filter(image__in=[name for _, name, _ in batch]).values_list('image', flat=True))
+        batch = [(pk, name, size) for pk, name, size in batch if name not in in_use]
+        if dry_run:
+            removed += len(batch)
+            freed += sum(size or 0 for _, _, size in batch)
+            continue
+        with transaction.atomic():
+            # Re-check the count in the DELETE: a new reference may have arrived
+            deletable = list(
+                MediaBlob.objects.select_for_update()
+                .filter(pk__in=[pk for pk, _, _ in batch], refcount=0, unreferenced_at__lt=cutoff)
+                .values_list('name', 'size')
+            )
+            MediaBlob.objects.filter(name__in=[name for name, _ in deletable]).delete()
+        for name, size in deletable:
+            if content_storage.exists(name):
+                os.remove(content_storage.path(name))
+            derivatives.delete(name)
+            removed += 1
+            freed += size or 0
+    return removed, freed
+
+
+def rebuild_refcounts():
+    """Recount references from the Issue table, registering stored files that
+    have no MediaBlob row. Returns the number of blobs whose count changed.
+    """
+    from .models import Issue, MediaBlob
+
+    referenced = dict(
+        Issue.objects.exclude(image='').exclude(image__isnull=True)
+        .values_list('image').annotate(n=Count('pk')).order_by()
+    )
+    known = set(MediaBlob.objects.values_list('name', flat=True))
+    now = timezone.now()
+    new_blobs = []
+    for root, _, files in os.walk(content_storage.path(Issue._meta.get_field('image').upload_to)):
+        for file_name in files:
+            if file_name.endswith('.part'):
+                continue
+            name = os.path.relpath(os.path.join(root, file_name), content_storage.location).replace(os.sep, '/')
+            if name not in known:
+                new_blobs.append(MediaBlob(name=name, size=os.path.getsize(os.path.join(root, file_name))))
+                known.add(name)
+    for name in referenced:
+        if name not in known:
+            new_blobs.append(MediaBlob(name=name))
+    MediaBlob.objects.bulk_create(new_blobs, batch_size=500)
+
+    changed = []
+    for blob in MediaBlob.objects.only('pk', 'name', 'refcount', 'unreferenced_at').iterator(chunk_size=2000):
+        count = referenced.get(blob.name, 0)
+        if blob.refcount != count or (count == 0) != (blob.unreferenced_at is not None):
+            blob.refcount = count
+            blob.unreferenced_at = None if count else (blob.unreferenced_at or now)
+            changed.append(blob)
+    MediaBlob.objects.bulk_update(changed, ['refcount', 'unreferenced_at'], batch_size=500)
+    return len(changed)
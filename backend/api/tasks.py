@@ -0,0 +1,124 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from .classify import VALID_CATEGORIES, classify_with_embedding, open_image, is_animated_image
+from . import derivatives, live, response_cache, rollups
+from .duplicates import embedding_to_bytes, get_index
+from .models import Issue, priority_for_category
+
+_executor = None
+_executor_lock = threading.Lock()
+# Originals whose variants are queued or being built
+_pending_variants = set()
+
+
+def classify_issue(issue, update_priority=True, image_bytes=None):
+    """Classify `issue.image` (or `image_bytes`, the upload already in memory)
+    and store category, confidence, status, the image embedding and (when the
+    reporter left it blank) the derived priority with one UPDATE, then add the
+    embedding to the duplicate index.
+    The instance is updated in place too. Returns (category, confidence).
+    """
+    predicted_category, confidence, embedding = None, None, None
+    fields = {}
+    try:
+        if image_bytes is None:
+            with issue.image.open('rb') as f:
+                image_bytes = f.read()
+        # One open serves the animation check and the classifier
+        with open_image(image_bytes) as img:
+            if is_animated_image(img):
+                # Skip classification for animated images; treat as unknown
+                predicted_category, confidence = "unknown", 0.0
+                fields['classification_status'] = 'skipped'
+            else:
+                predicted_category, confidence, embedding = classify_with_embedding(
+                    img, threshold=0.5, other_threshold=0.6, image_bytes=image_bytes,
+                )
+                fields['classification_status'] = 'done'
+                if embedding is not None:
+                    fields['embedding'] = embedding_to_bytes(embedding)
+
+        fields['confidence'] = confidence
+        if predicted_category in VALID_CATEGORIES:
+            fields['category'] = predicted_category
+            if update_priority:
+                fields['priority'] = priority_for_category(predicted_category)
+        print(f"[DL] Image classified as: {predicted_category} ({confidence*100:.2f}% confidence)")
+    except Exception as e:
+        print(f"[DL] Image classification failed: {e}")
+        fields = {'classification_status': 'failed'}
+
+    fields['activity_at'] = timezone.now()
+    before = rollups.bucket_for(issue)
+    Issue.objects.filter(pk=issue.pk).update(**fields)
+    for name, value in fields.items():
+        setattr(issue, name, value)
+    issue.remember_saved(fields)
+    # The UPDATE bypasses save signals, so move the stats bucket here
+    rollups.move(before, rollups.bucket_for(issue))
+    response_cache.invalidate()
+    (_, category, status, priority), _ = before
+    events, changes = live.field_changes((category, status, priority), issue)
+    if events:
+        live.publish(issue.pk, *events, **changes)
+
+    if 'embedding' in fields:
+        try:
+            get_index().add(issue.pk, embedding)
+        except Exception as e:
+            print(f"[DL] Could not index embedding for issue {issue.pk}: {e}")
+    return predicted_category, confidence
+
+
+def _run_classification(issue_id, update_priority):
+    close_old_connections()
+    try:
+        issue = Issue.objects.filter(pk=issue_id).first()
+        if issue is not None and issue.image:
+            classify_issue(issue, update_priority)
+    finally:
+        # Worker threads own their DB connection; don't leak it between tasks
+        connection.close()
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'CLASSIFY_ASYNC_WORKERS', 2),
+                    thread_name_prefix='classify',
+                )
+    return _executor
+
+
+def submit_classification(issue_id, update_priority=True):
+    """Queue classification of a saved issue on the local worker pool."""
+    return _pool().submit(_run_classification, issue_id, update_priority)
+
+
+def _run_image_variants(name):
+    try:
+        if derivatives.generate(name):
+            # Cached feeds were built without the variants
+            response_cache.invalidate()
+    finally:
+        with _executor_lock:
+            _pending_variants.discard(name)
+
+
+def submit_image_variants(name):
+    """Queue building the resized copies of the stored original `name` on the
+    local worker pool. Returns None if that original is already queued.
+    """
+    with _executor_lock:
+        if name in _pending_variants:
+            return None
+        _pending_variants.add(name)
+    return _pool().submit(_run_image_variants, name)
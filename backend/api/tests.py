@@ -1,3 +1,583 @@
-from django.test import TestCase
+import base64
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+import numpy as np
+from PIL import Image
+from rest_framework.test import APIClient
+
+from . import derivatives, live, response_cache, rollups, storage
+from .models import Comment, CustomUser, Issue, IssueStatsRollup, MediaBlob
+from .pagination import InvalidCursor, decode_cursor, encode_cursor
+from .routing import websocket_urlpatterns
+from .storage import content_storage
+from .vector_index import EmbeddingIndex
+from .votes import toggle_upvote
+
+
+def make_user(username, **extra):
+    return CustomUser.objects.create_user(username=username, email=f'{username}@example.com', **extra)
+
+
+def clear_response_cache():
+    # response_cache.invalidate() waits for a commit, which never comes inside a TestCase
+    response_cache.response_cache.invalidate()
+
+
+def make_issue(reporter, **fields):
+    fields.setdefault('title', 'Pothole')
+    fields.setdefault('description', 'Deep pothole near the bus stop')
+    fields.setdefault('address', 'Main Street')
+    return Issue.objects.create(reporter=reporter, **fields)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        clear_response_cache()
+        self.client = APIClient()
+        self.reporter = make_user('reporter')
+        self.issues = [make_issue(self.reporter, title=f'Issue {i}') for i in range(25)]
+        # Ties on created_at must be broken by id without skipping or repeating rows
+        tied = [issue.pk for issue in self.issues[5:15]]
+        Issue.objects.filter(pk__in=tied).update(created_at=self.issues[5].created_at)
+
+    def walk(self, page_size):
+        ids, cursor, pages = [], None, 0
+        while True:
+            params = {'page_size': page_size}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get('/api/public-issues/', params)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), page_size)
+            ids += [item['id'] for item in response.data['results']]
+            pages += 1
+            cursor = response.data['next']
+            if cursor is None:
+                return ids, pages
+
+    def test_pages_cover_every_issue_once_newest_first(self):
+        ids, pages = self.walk(page_size=7)
+        expected = list(Issue.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 4)
+
+    def test_cursor_round_trips(self):
+        issue = Issue.objects.get(pk=self.issues[7].pk)
+        self.assertEqual(decode_cursor(encode_cursor(issue)), (issue.created_at, issue.pk))
+
+    def test_invalid_cursor_is_rejected(self):
+        bad_pk = base64.urlsafe_b64encode(b'2024-01-01T00:00:00+00:00|abc').decode()
+        for cursor in ['not-a-cursor', '!!!', bad_pk]:
+            with self.assertRaises(InvalidCursor):
+                decode_cursor(cursor)
+            response = self.client.get('/api/public-issues/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data, {"error": "Invalid cursor"})
+
+    def test_page_queries_do_not_grow_with_page_size(self):
+        voter = make_user('voter')
+        for issue in self.issues:
+            issue.upvotes.add(voter)
+            Comment.objects.create(issue=issue, user=voter, text='Same here')
+
+        def queries(page_size):
+            clear_response_cache()
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get('/api/public-issues/', {'page_size': page_size, 'expand': 'comments'})
+            self.assertEqual(len(response.data['results']), page_size)
+            return len(captured)
+
+        self.assertEqual(queries(2), queries(20))
+
+
+class UpvoteCounterTests(TransactionTestCase):
+    def setUp(self):
+        self.reporter = make_user('reporter')
+        self.issue = make_issue(self.reporter)
+        self.voters = [make_user(f'voter{i}') for i in range(16)]
+
+    def stored_count(self):
+        return Issue.objects.values_list('upvotes_count', flat=True).get(pk=self.issue.pk)
+
+    def linked_count(self):
+        return Issue.upvotes.through.objects.filter(issue_id=self.issue.pk).count()
+
+    def run_concurrently(self, calls):
+        barrier = threading.Barrier(len(calls))
+        errors = []
+
+        def run(fn, *args):
+            try:
+                barrier.wait()
+                fn(*args)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=call) for call in calls]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_concurrent_toggles_keep_the_counter_exact(self):
+        # Every voter votes at once, then five of them withdraw at once
+        self.run_concurrently([(toggle_upvote, self.issue.pk, voter) for voter in self.voters])
+        self.assertEqual(self.linked_count(), len(self.voters))
+        self.assertEqual(self.stored_count(), len(self.voters))
+
+        self.run_concurrently([(toggle_upvote, self.issue.pk, voter) for voter in self.voters[:5]])
+        self.assertEqual(self.linked_count(), len(self.voters) - 5)
+        self.assertEqual(self.stored_count(), len(self.voters) - 5)
+
+    def test_double_submit_from_one_user_counts_once(self):
+        voter = self.voters[0]
+        self.run_concurrently([(toggle_upvote, self.issue.pk, voter), (toggle_upvote, self.issue.pk, voter)])
+        self.assertEqual(self.stored_count(), self.linked_count())
+
+    def test_self_vote_and_endpoint_response(self):
+        self.assertEqual(toggle_upvote(self.issue.pk, self.reporter), ('self', 0, False))
+
+        client = APIClient()
+        client.force_authenticate(self.voters[0])
+        response = client.post(f'/api/issue/{self.issue.pk}/upvote/')
+        self.assertEqual((response.data['upvotes_count'], response.data['user_has_voted']), (1, True))
+        response = client.post(f'/api/issue/{self.issue.pk}/upvote/')
+        self.assertEqual((response.data['upvotes_count'], response.data['user_has_voted']), (0, False))
+        self.assertEqual(self.stored_count(), 0)
+
+
+def rollup_rows():
+    return sorted(
+        IssueStatsRollup.objects.exclude(issue_count=0, resolution_seconds=0)
+        .values_list('day', 'category', 'status', 'priority', 'issue_count', 'resolution_seconds')
+    )
+
+
+class StatsRollupTests(TestCase):
+    def setUp(self):
+        self.reporter = make_user('reporter')
+        self.issues = [
+            make_issue(self.reporter, category=category, priority=priority)
+            for category in ('road', 'water', 'garbage')
+            for priority in ('low', 'high')
+        ]
+
+    def assertRollupsMatchRebuild(self):
+        maintained = rollup_rows()
+        rollups.rebuild()
+        self.assertEqual(maintained, rollup_rows())
+        return maintained
+
+    def test_creates_and_saves_move_issues_between_buckets(self):
+        first, second = self.issues[:2]
+        first.status = 'Resolved'
+        first.save()
+        second.category = 'water'
+        second.priority = 'medium'
+        second.save(update_fields=['category', 'priority'])
+        # Reloaded instances diff against the row they were read with
+        third = Issue.objects.get(pk=self.issues[2].pk)
+        third.status = 'Closed'
+        third.save()
+        third.status = 'Open'
+        third.save()
+        self.assertRollupsMatchRebuild()
+        self.assertEqual(rollups.summary()['by_status'], {'Open': 5, 'Resolved': 1})
+
+    def test_deletes_remove_issues_from_their_bucket(self):
+        self.issues[0].delete()
+        Issue.objects.filter(category='water').delete()
+        maintained = self.assertRollupsMatchRebuild()
+        self.assertEqual(sum(row[4] for row in maintained), 3)
+
+        # Cascades from a deleted reporter too
+        self.reporter.delete()
+        self.assertEqual(self.assertRollupsMatchRebuild(), [])
+
+
+class BulkUpdateTests(TestCase):
+    def setUp(self):
+        clear_response_cache()
+        self.admin = make_user('admin', role='admin')
+        self.reporter = make_user('reporter')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def make_issues(self, n, days_apart=0):
+        issues = [make_issue(self.reporter, category='road', priority='low') for _ in range(n)]
+        now = timezone.now()
+        for i, issue in enumerate(issues):
+            Issue.objects.filter(pk=issue.pk).update(created_at=now - timedelta(days=i * days_apart))
+        rollups.rebuild()
+        return [issue.pk for issue in issues]
+
+    def assertRollupsMatchRebuild(self):
+        maintained = rollup_rows()
+        rollups.rebuild()
+        self.assertEqual(maintained, rollup_rows())
+
+    def test_outcomes_and_rollups_after_bulk_update(self):
+        ids = self.make_issues(4)
+        Issue.objects.filter(pk=ids[0]).update(status='Resolved')
+        rollups.rebuild()
+
+        response = self.client.post('/api/issues/bulk-update/', {'ids': ids + [999999], 'status': 'Resolved'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['updated'], response.data['unchanged'], response.data['not_found']), (3, 1, 1))
+        self.assertEqual(Issue.objects.filter(status='Resolved', resolved_at__isnull=False).count(), 3)
+        self.assertEqual(set(Issue.objects.filter(resolved_by=self.admin).values_list('pk', flat=True)), set(ids[1:]))
+        self.assertRollupsMatchRebuild()
+
+        response = self.client.post('/api/issues/bulk-update/', {'filter': {'category': 'road'}, 'status': 'Open', 'priority': 'high'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Issue.objects.filter(resolved_at__isnull=False).exists())
+        self.assertRollupsMatchRebuild()
+
+    def test_rollups_after_bulk_update_across_many_days(self):
+        # More buckets than rollups.BULK_BUCKETS takes the bulk_update/bulk_create path
+        ids = self.make_issues(rollups.BULK_BUCKETS + 10, days_apart=1)
+        response = self.client.post('/api/issues/bulk-update/', {'ids': ids, 'status': 'Closed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertRollupsMatchRebuild()
+
+        Issue.objects.filter(pk__in=ids[::2]).delete()
+        self.assertRollupsMatchRebuild()
+        self.assertEqual(rollups.summary()['total'], len(ids[1::2]))
+
+    def test_requires_admin(self):
+        ids = self.make_issues(1)
+        self.client.force_authenticate(self.reporter)
+        response = self.client.post('/api/issues/bulk-update/', {'ids': ids, 'status': 'Closed'}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Issue.objects.get(pk=ids[0]).status, 'Open')
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        clear_response_cache()
+        self.reporter = make_user('reporter')
+        self.voter = make_user('voter')
+        self.issue = make_issue(self.reporter)
+        self.client = APIClient()
+        self.client.force_authenticate(self.voter)
+        self.detail_url = f'/api/issue/{self.issue.pk}/'
+
+    def test_detail_etag_and_304(self):
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+        # A vote bumps activity_at, so the old copy is stale
+        toggle_upvote(self.issue.pk, self.voter)
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['user_has_voted'])
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_detail_etag_is_per_user(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        other = APIClient()
+        other.force_authenticate(self.reporter)
+        response = other.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Authorization', response['Vary'])
+
+    def test_last_modified_only_once_its_second_has_passed(self):
+        # Written this second: another write in the same second would keep
+        # the same Last-Modified, so none is sent
+        self.assertFalse(self.client.get(self.detail_url).has_header('Last-Modified'))
+
+        Issue.objects.filter(pk=self.issue.pk).update(activity_at=timezone.now() - timedelta(minutes=5))
+        last_modified = self.client.get(self.detail_url)['Last-Modified']
+        response = self.client.get(self.detail_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        Issue.objects.filter(pk=self.issue.pk).update(activity_at=timezone.now())
+        response = self.client.get(self.detail_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+
+    def test_feed_etag_changes_on_delete(self):
+        other = make_issue(self.reporter, title='Streetlight out')
+        response = self.client.get('/api/public-issues/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Last-Modified'))
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/api/public-issues/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Deleting the newest issue leaves the latest remaining activity
+        # older than before; the issue count in the ETag still changes
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        response = self.client.get('/api/public-issues/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data], [self.issue.pk])
+
+    def test_unknown_issue_is_404(self):
+        self.assertEqual(self.client.get('/api/issue/999999/').status_code, 404)
+
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.reporter = make_user('reporter')
+        self.issue = make_issue(
+            self.reporter,
+            title='<script>alert(1)</script> Pothole & crack',
+            description='Deep pothole & broken <img src=x onerror=alert(1)> kerb',
+        )
+
+    def search(self, q):
+        response = self.client.get('/api/search/', {'q': q})
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_highlights_are_escaped_apart_from_marks(self):
+        [result] = self.search('pothole')
+        self.assertEqual(result['id'], self.issue.pk)
+        self.assertEqual(
+            result['title_highlight'],
+            '&lt;script&gt;alert(1)&lt;/script&gt; <mark>Pothole</mark> &amp; crack',
+        )
+        self.assertIn('<mark>pothole</mark> &amp; broken &lt;img', result['description_snippet'])
+        for text in (result['title_highlight'], result['description_snippet']):
+            unmarked = text.replace('<mark>', '').replace('</mark>', '')
+            self.assertNotIn('<', unmarked)
+            self.assertNotIn('>', unmarked)
+
+    def test_fts_operators_are_searched_as_text(self):
+        for q in ['"', '*', 'AND OR NOT']:
+            self.assertEqual(self.search(q), [], q)
+        # Operators mixed with words don't change what must match
+        for q in ['"pothole', 'pothole*', '(pothole', '^pothole:', '"pothole" crack']:
+            self.assertEqual([result['id'] for result in self.search(q)], [self.issue.pk], q)
+
+
+def jpeg_bytes(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+class MediaStorageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.reporter = make_user('reporter')
+
+    def upload(self, data, name='photo.jpg'):
+        return make_issue(self.reporter, image=SimpleUploadedFile(name, data, content_type='image/jpeg'))
+
+    def blob(self, name):
+        return MediaBlob.objects.get(name=name)
+
+    def test_identical_uploads_share_one_blob(self):
+        data = jpeg_bytes('red')
+        first, second = self.upload(data, 'a.jpg'), self.upload(data, 'b.jpg')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertIn(hashlib.sha256(data).hexdigest(), first.image.name)
+        self.assertEqual(MediaBlob.objects.count(), 1)
+        blob = self.blob(first.image.name)
+        self.assertEqual((blob.refcount, blob.size, blob.unreferenced_at), (2, len(data), None))
+        self.assertEqual(len(os.listdir(os.path.dirname(content_storage.path(blob.name)))), 1)
+
+    def test_replacing_an_image_moves_the_reference(self):
+        issue = self.upload(jpeg_bytes('red'))
+        old_name = issue.image.name
+        issue.image = SimpleUploadedFile('new.jpg', jpeg_bytes('blue'), content_type='image/jpeg')
+        issue.save()
+        self.assertEqual(self.blob(old_name).refcount, 0)
+        self.assertIsNotNone(self.blob(old_name).unreferenced_at)
+        self.assertEqual(self.blob(issue.image.name).refcount, 1)
+
+    def test_sweep_waits_for_the_last_reference_and_the_grace_period(self):
+        first, second = self.upload(jpeg_bytes('red')), self.upload(jpeg_bytes('red'))
+        name = first.image.name
+        first.delete()
+        self.assertEqual(storage.sweep(grace=timedelta(0)), (0, 0))
+        self.assertEqual(self.blob(name).refcount, 1)
+
+        second.delete()
+        self.assertEqual(self.blob(name).refcount, 0)
+        self.assertEqual(storage.sweep(), (0, 0))
+        self.assertTrue(content_storage.exists(name))
+
+        removed, freed = storage.sweep(grace=timedelta(0))
+        self.assertEqual((removed, freed), (1, len(jpeg_bytes('red'))))
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+        self.assertFalse(content_storage.exists(name))
+        self.assertFalse(derivatives.has_variants(name))
+
+    def test_reupload_revives_an_unreferenced_blob(self):
+        issue = self.upload(jpeg_bytes('red'))
+        name = issue.image.name
+        issue.delete()
+        self.upload(jpeg_bytes('red'))
+        self.assertEqual(self.blob(name).refcount, 1)
+        self.assertEqual(storage.sweep(grace=timedelta(0)), (0, 0))
+        self.assertTrue(content_storage.exists(name))
+
+    def test_rebuild_refcounts_repairs_drift(self):
+        issue = self.upload(jpeg_bytes('red'))
+        MediaBlob.objects.filter(name=issue.image.name).update(refcount=5)
+        self.assertEqual(storage.rebuild_refcounts(), 1)
+        self.assertEqual(self.blob(issue.image.name).refcount, 1)
+        self.assertEqual(storage.rebuild_refcounts(), 0)
+
+    def test_cached_feed_urls_follow_each_requests_host(self):
+        issue = self.upload(jpeg_bytes('red'))
+        derivatives.generate(issue.image.name)
+        clear_response_cache()
+        client = APIClient()
+        for host in ('first.example', 'second.example'):
+            item = client.get('/api/public-issues/', HTTP_HOST=host).data[0]
+            base = f'http://{host}/media/'
+            self.assertTrue(item['image'].startswith(base), item['image'])
+            urls = [item['image_variants']['original']]
+            urls += [url for variant in derivatives.variant_sizes() for url in item['image_variants'][variant].values()]
+            self.assertTrue(all(url.startswith(base) for url in urls), urls)
+
+
+class EmbeddingIndexTests(SimpleTestCase):
+    def setUp(self):
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder, ignore_errors=True)
+        self.path = os.path.join(folder, 'embeddings.f16')
+        self.index = EmbeddingIndex(self.path)
+        rng = np.random.default_rng(7)
+        self.vectors = {issue_id: rng.standard_normal(16) for issue_id in range(1, 9)}
+
+    def ids(self, index=None, **kwargs):
+        return {issue_id for issue_id, _ in (index or self.index).search(self.vectors[1], k=100, **kwargs)}
+
+    def test_re_adding_an_id_replaces_its_vector(self):
+        self.index.add_many((issue_id, self.vectors[issue_id]) for issue_id in (1, 2, 3))
+        self.index.add(1, self.vectors[4])
+        top_id, similarity = self.index.search(self.vectors[4], k=1)[0]
+        self.assertEqual(top_id, 1)
+        self.assertAlmostEqual(similarity, 1.0, places=2)
+        results = self.index.search(self.vectors[1], k=100)
+        self.assertEqual(sorted(issue_id for issue_id, _ in results), [1, 2, 3])
+        self.assertLess(dict(results)[1], 0.99)
+
+    def test_removed_ids_never_come_back(self):
+        self.index.add_many((issue_id, vector) for issue_id, vector in self.vectors.items())
+        self.index.remove(2)
+        self.index.remove(5)
+        self.index.add(9, self.vectors[3])
+        self.assertEqual(self.ids(), {1, 3, 4, 6, 7, 8, 9})
+        self.index.compact()
+        self.assertEqual(self.ids(), {1, 3, 4, 6, 7, 8, 9})
+        # A fresh instance (another process) reads the same state from disk
+        self.assertEqual(self.ids(EmbeddingIndex(self.path)), {1, 3, 4, 6, 7, 8, 9})
+
+    def test_compact_keeps_exactly_the_live_rows(self):
+        self.index.add_many((issue_id, vector) for issue_id, vector in self.vectors.items())
+        self.index.add(1, self.vectors[2])
+        self.index.remove(3)
+        self.index.remove(4)
+        before = self.index.search(self.vectors[1], k=100)
+        self.assertEqual(self.index.stats(), {"rows": 11, "live": 6, "dead": 5, "dim": 16})
+        self.assertTrue(self.index.needs_compaction())
+
+        self.assertEqual(self.index.compact(), 5)
+        self.assertEqual(self.index.stats(), {"rows": 6, "live": 6, "dead": 0, "dim": 16})
+        self.assertFalse(self.index.needs_compaction())
+        self.assertEqual(dict(self.index.search(self.vectors[1], k=100)), dict(before))
+
+    def test_search_exclude_and_min_similarity(self):
+        self.index.add_many((issue_id, vector) for issue_id, vector in self.vectors.items())
+        self.assertNotIn(1, self.ids(exclude={1}))
+        self.assertEqual(self.ids(exclude={1, 2}), set(self.vectors) - {1, 2})
+        self.assertEqual(self.ids(min_similarity=0.99), {1})
+
+    def test_writes_from_another_process_are_seen(self):
+        self.index.add_many((issue_id, self.vectors[issue_id]) for issue_id in (1, 2, 3))
+        self.assertEqual(self.ids(), {1, 2, 3})  # caches the live-row state
+        other = EmbeddingIndex(self.path)
+        other.add(4, self.vectors[4])
+        other.remove(2)
+        self.assertEqual(self.ids(), {1, 3, 4})
+        # This instance's own append must not extend a state that missed those rows
+        other.add(5, self.vectors[5])
+        self.index.add(6, self.vectors[6])
+        self.assertEqual(self.ids(), {1, 3, 4, 5, 6})
+
+
+@override_settings(LIVE_FEED_COALESCE_SECONDS=0.2)
+class LiveFeedTests(TransactionTestCase):
+    def setUp(self):
+        # The in-memory channel layer only carries events in the serving process
+        live.serving = True
+        self.addCleanup(setattr, live, 'serving', False)
+
+    async def connect(self, *paths):
+        communicators = []
+        for path in paths:
+            communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), path)
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            communicators.append(communicator)
+        return communicators
+
+    async def disconnect(self, communicators):
+        for communicator in communicators:
+            await communicator.disconnect()
+
+    async def test_events_within_the_window_arrive_as_one_message(self):
+        feed, single = sockets = await self.connect('/ws/issues/', '/ws/issues/7/')
+        try:
+            publish = sync_to_async(live.publish)
+            for count in (1, 2, 3):
+                await publish(7, live.VOTES, upvotes_count=count)
+            # Several issues at once take the issue.batch path on the global feed
+            await sync_to_async(live.publish_many)([
+                (7, [live.STATUS, live.VOTES], {'status': 'Resolved', 'upvotes_count': 4}),
+                (8, [live.VOTES], {'upvotes_count': 1}),
+            ])
+
+            merged = {
+                'issue_id': 7, 'events': [live.VOTES, live.STATUS],
+                'changes': {'upvotes_count': 4, 'status': 'Resolved'},
+            }
+            self.assertEqual(await feed.receive_json_from(timeout=2), {'type': 'issues', 'issues': [
+                merged, {'issue_id': 8, 'events': [live.VOTES], 'changes': {'upvotes_count': 1}},
+            ]})
+            self.assertEqual(await single.receive_json_from(timeout=2), {'type': 'issues', 'issues': [merged]})
+            self.assertTrue(await feed.receive_nothing(timeout=0.5))
+            self.assertTrue(await single.receive_nothing(timeout=0.5))
+        finally:
+            await self.disconnect(sockets)
+
+    async def test_ping(self):
+        sockets = await self.connect('/ws/issues/')
+        try:
+            await sockets[0].send_json_to({'type': 'ping'})
+            self.assertEqual(await sockets[0].receive_json_from(timeout=2), {'type': 'pong'})
+        finally:
+            await self.disconnect(sockets)
@@ -5,19 +5,28 @@ from .views import (
     MyIssuesView,
     user_info,
     UpdateIssueView,
+    bulk_update_issues,
+    export_issues,
     DeleteIssueView,
     upvote_issue,
     remove_vote_issue,
     get_issue_detail,
+    issue_classification,
     user_voted_issues,
     public_issues,
+    search_issues,
+    map_issues,
+    issue_stats,
     delete_comment,
     comments_view,
     update_comment,
     update_user,
     my_comments,
     recent_activity,
-    predict_image 
+    predict_image,
+    classifier_stats,
+    response_cache_stats,
+    similar_issues,
 )
 
 urlpatterns = [
@@ -27,13 +36,22 @@ urlpatterns = [
     path('my-comments/', my_comments, name='my-comments'),
     path('recent-activity/', recent_activity, name='recent_activity'),
     path("predict-image/", predict_image, name="predict-image"),
+    path("classifier-stats/", classifier_stats, name="classifier-stats"),
+    path("cache-stats/", response_cache_stats, name="cache-stats"),
+    path("similar-issues/", similar_issues, name="similar-issues"),
     path('user/info/', user_info, name='user-info'),
     path('update-issue/<int:pk>/', UpdateIssueView.as_view(), name='update-issue'),
+    path('issues/bulk-update/', bulk_update_issues, name='bulk-update-issues'),
+    path('issues/export/<str:fmt>/', export_issues, name='export-issues'),
     path('issue/<int:issue_id>/upvote/', upvote_issue, name='upvote-issue'),
     path('issue/<int:issue_id>/remove-vote/', remove_vote_issue, name='remove-vote'),
     path('issue/<int:issue_id>/', get_issue_detail, name='issue-detail'),
+    path('issue/<int:issue_id>/classification/', issue_classification, name='issue-classification'),
     path('comment/<int:comment_id>/update/', update_comment, name='update_comment'),
     path('public-issues/', public_issues, name='public-issues'),
+    path('search/', search_issues, name='search-issues'),
+    path('map/issues/', map_issues, name='map-issues'),
+    path('stats/', issue_stats, name='issue-stats'),
     path('issue/<int:issue_id>/comments/', comments_view, name='comments_view'),
     path('comment/<int:comment_id>/delete/', delete_comment, name='delete_comment'),
     path('issue/<int:pk>/delete/', DeleteIssueView.as_view(), name='delete-issue'),
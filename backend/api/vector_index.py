@@ -0,0 +1,235 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+
+def normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class EmbeddingIndex:
+    """Append-only, memory-mapped float16 index of issue image embeddings.
+
+    Records are (issue_id, unit-length float16 vector) appended to one file,
+    so adding an issue is a single small write. Removing an issue appends a
+    tombstone (same id, all-zero vector). Searches memory-map the file and
+    score every live row with a chunked matrix-vector product; there is no
+    per-row Python or ORM work. compact() rewrites the file without dead rows;
+    it is left to `manage.py embedding_index --compact [--if-needed]` so an
+    issue delete never pays for a full rewrite. needs_compaction() is true
+    once dead rows pass `compact_ratio` of the file.
+
+    The vector width is fixed by the first record and kept in a JSON sidecar.
+    """
+    chunk_rows = 65536
+    search_block_rows = 4096
+
+    def __init__(self, path, compact_ratio=0.25):
+        self.path = str(path)
+        self.meta_path = self.path + '.meta.json'
+        self.compact_ratio = compact_ratio
+        self._lock = threading.Lock()
+        self._dim = None
+        self._cached = None  # (row count, ids, live mask, dead row count)
+
+    # --- layout -------------------------------------------------------------
+
+    @property
+    def dim(self):
+        if self._dim is None and os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                self._dim = json.load(f)['dim']
+        return self._dim
+
+    def _dtype(self, dim):
+        return np.dtype([('id', '<i8'), ('vec', '<f2', (dim,))])
+
+    def _ensure_dim(self, dim):
+        if self.dim is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.meta_path, 'w') as f:
+                json.dump({'dim': dim}, f)
+            self._dim = dim
+        elif self.dim != dim:
+            raise ValueError(
+                f"Embedding width {dim} does not match index width {self.dim}; "
+                "rebuild the index with `manage.py embedding_index --rebuild`."
+            )
+
+    def _records(self):
+        if self.dim is None or not os.path.exists(self.path):
+            return None
+        dtype = self._dtype(self.dim)
+        # Ignore a trailing partial record another process is still writing
+        rows = os.path.getsize(self.path) // dtype.itemsize
+        if rows == 0:
+            return None
+        return np.memmap(self.path, dtype=dtype, mode='r', shape=(rows,))
+
+    def _state(self, records):
+        """ids, live-row mask and dead-row count; recomputed only when rows were added.
+        A row is live if it is the newest record for its id and not a tombstone.
+        """
+        if self._cached is not None and self._cached[0] == len(records):
+            return self._cached[1:]
+        ids = np.array(records['id'])
+        newest = np.zeros(len(ids), dtype=bool)
+        _, last_from_end = np.unique(ids[::-1], return_index=True)
+        newest[len(ids) - 1 - last_from_end] = True
+        is_tombstone = ~np.any(records['vec'] != 0, axis=1)
+        live = newest & ~is_tombstone
+        self._cached = (len(records), ids, live, len(ids) - int(live.sum()))
+        return self._cached[1:]
+
+    def _append(self, rows):
+        cached = self._cached
+        with open(self.path, 'ab') as f:
+            before = f.tell() // rows.dtype.itemsize
+            f.write(rows.tobytes())
+        if cached is not None and cached[0] == before:
+            # Extend the cached state instead of rescanning the whole file
+            _, ids, live, _ = cached
+            new_ids = rows['id']
+            live = live & ~np.isin(ids, new_ids)
+            ids = np.concatenate([ids, new_ids])
+            live = np.concatenate([live, np.any(rows['vec'] != 0, axis=1)])
+            self._cached = (len(ids), ids, live, len(ids) - int(live.sum()))
+        else:
+            self._cached = None
+
+    # --- writes -------------------------------------------------------------
+
+    def add(self, issue_id, embedding):
+        vector = normalize(embedding)
+        with self._lock:
+            self._ensure_dim(len(vector))
+            row = np.zeros(1, dtype=self._dtype(self.dim))
+            row['id'] = issue_id
+            row['vec'] = vector
+            self._append(row)
+
+    def add_many(self, items):
+        """Append (issue_id, embedding) pairs with a single write."""
+        items = [(issue_id, normalize(embedding)) for issue_id, embedding in items]
+        if not items:
+            return
+        with self._lock:
+            self._ensure_dim(len(items[0][1]))
+            rows = np.zeros(len(items), dtype=self._dtype(self.dim))
+            rows['id'] = [issue_id for issue_id, _ in items]
+            rows['vec'] = np.stack([vector for _, vector in items])
+            self._append(rows)
+
+    def remove(self, issue_id):
+        """Append a tombstone for `issue_id` (one small write)."""
+        with self._lock:
+            if self.dim is None:
+                return
+            row = np.zeros(1, dtype=self._dtype(self.dim))
+            row['id'] = issue_id
+            self._append(row)
+
+    def needs_compaction(self):
+        with self._lock:
+            records = self._records()
+            if records is None:
+                return False
+            _, _, dead = self._state(records)
+            return dead > self.compact_ratio * len(records)
+
+    def rebuild(self, items):
+        """Replace the index with (issue_id, embedding) pairs from `items`."""
+        with self._lock:
+            tmp_path = self.path + '.tmp'
+            dim, pending = None, []
+
+            def flush(f):
+                rows = np.zeros(len(pending), dtype=self._dtype(dim))
+                rows['id'] = [issue_id for issue_id, _ in pending]
+                rows['vec'] = np.stack([vector for _, vector in pending])
+                f.write(rows.tobytes())
+                pending.clear()
+
+            with open(tmp_path, 'wb') as f:
+                for issue_id, embedding in items:
+                    vector = normalize(embedding)
+                    dim = dim or len(vector)
+                    pending.append((issue_id, vector))
+                    if len(pending) >= self.chunk_rows:
+                        flush(f)
+                if pending:
+                    flush(f)
+            self._replace(tmp_path, dim)
+
+    def compact(self):
+        """Keep only live rows (drops tombstones and superseded records). Returns rows removed."""
+        with self._lock:
+            records = self._records()
+            if records is None:
+                return 0
+            _, live, _ = self._state(records)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                for start in range(0, len(records), self.chunk_rows):
+                    chunk = records[start:start + self.chunk_rows]
+                    f.write(np.ascontiguousarray(chunk[live[start:start + self.chunk_rows]]).tobytes())
+            removed = len(records) - int(live.sum())
+            del records
+            self._replace(tmp_path, self.dim)
+            return removed
+
+    def _replace(self, tmp_path, dim):
+        os.replace(tmp_path, self.path)
+        self._cached = None
+        if dim is not None:
+            self._dim = None
+            with open(self.meta_path, 'w') as f:
+                json.dump({'dim': dim}, f)
+
+    # --- reads --------------------------------------------------------------
+
+    def search(self, embedding, k=5, min_similarity=None, exclude=()):
+        """Top-k (issue_id, cosine similarity) pairs, best first."""
+        query = normalize(embedding)
+        with self._lock:
+            records = self._records()
+            if records is None:
+                return []
+            if len(query) != self.dim:
+                raise ValueError(f"Query width {len(query)} does not match index width {self.dim}")
+            ids, live, _ = self._state(records)
+
+        # Widen float16 rows into a reused float32 block small enough to stay in
+        # cache, then score the block with one BLAS matrix-vector product.
+        scores = np.empty(len(records), dtype=np.float32)
+        block = np.empty((min(self.search_block_rows, len(records)), self.dim), dtype=np.float32)
+        vectors = records['vec']
+        for start in range(0, len(records), self.search_block_rows):
+            chunk = vectors[start:start + self.search_block_rows]
+            widened = block[:len(chunk)]
+            widened[...] = chunk
+            np.dot(widened, query, out=scores[start:start + len(chunk)])
+        scores[~live] = -np.inf
+        if exclude:
+            scores[np.isin(ids, list(exclude))] = -np.inf
+        if min_similarity is not None:
+            scores[scores < min_similarity] = -np.inf
+
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+    def stats(self):
+        with self._lock:
+            records = self._records()
+            if records is None:
+                return {"rows": 0, "live": 0, "dead": 0, "dim": self.dim}
+            _, live, dead = self._state(records)
+            return {"rows": len(records), "live": int(live.sum()), "dead": dead, "dim": self.dim}
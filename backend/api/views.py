@@ -3,17 +3,36 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.http import Http404, StreamingHttpResponse
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, F, IntegerField, Min
+from django.db.models.functions import Cast
 from django.utils.timezone import now
 from django.utils.timezone import localtime
+from datetime import date
 from .models import CustomUser, Issue ,Comment
-from .serializers import UserSerializer, IssueSerializer ,CommentSerializer
-from .classify import classify_issue_image
+from .serializers import UserSerializer, IssueSerializer, IssueListSerializer, CommentSerializer
+from .classify import (
+    VALID_CATEGORIES, classify_issue_image, classify_with_embedding, open_image, is_animated_image,
+    prediction_cache, scheduler as classify_scheduler,
+)
+from .duplicates import find_similar
+from . import search
+from . import geo
+from . import rollups
+from . import derivatives
+from . import bulk
+from . import export
+from .tasks import classify_issue, submit_classification
+from .permissions import IsAdmin
+from .pagination import KeysetPaginator, InvalidCursor
+from .votes import toggle_upvote, remove_upvote, voted_issue_ids
+from .conditional import feed_state, feed_validators, issue_validators
+from .response_cache import response_cache
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.generics import DestroyAPIView
-import os
-import tempfile
 import traceback
-from PIL import Image
 
 
 #  Create User (Signup)
@@ -32,7 +51,10 @@ class CreateUserView(generics.CreateAPIView):
 #  Report Issue (by Reporter)
 class ReportIssueView(generics.CreateAPIView):
     """Authenticated reporters create a new Issue.
-    After saving, we optionally classify the uploaded image to auto-set category.
+    After saving, we classify the uploaded image (usually a prediction-cache
+    hit after predict-image) to auto-set category and priority. With
+    settings.CLASSIFY_ASYNC the issue is returned at once with
+    classification_status='pending' and classified on a worker thread.
     Animated images are rejected in create(); classification thresholds apply.
     """
     queryset = Issue.objects.all()
@@ -40,55 +62,25 @@ class ReportIssueView(generics.CreateAPIView):
     permission_classes = [IsAuthenticated]
 
     def perform_create(self, serializer):
-        issue = serializer.save(reporter=self.request.user)
+        if not serializer.validated_data.get('image'):
+            serializer.save(reporter=self.request.user)
+            self.extra_response_data = {"category": None, "confidence": None}
+            return
 
-        predicted_category = None
-        confidence = None
+        # Reporter-chosen priority wins; otherwise derive it from the predicted category
+        update_priority = not self.request.data.get('priority')
 
-        if issue.image:
-            try:
-                try:
-                    with Image.open(issue.image.path) as im:
-                        is_animated = getattr(im, "is_animated", False) or getattr(im, "n_frames", 1) > 1
-                except Exception:
-                    is_animated = False
-
-                if is_animated:
-                    # Skip classification for animated images; treat as unknown
-                    predicted_category, confidence = "unknown", 0.0
-                else:
-                    # Client may send a tentative category+confidence from precheck
-                    client_cat = self.request.data.get("category")
-                    client_conf = self.request.data.get("confidence")
-                    parsed_conf = None
-                    if client_conf is not None:
-                        try:
-                            parsed_conf = float(client_conf)
-                        except (TypeError, ValueError):
-                            parsed_conf = None
-
-                    def passes_threshold(cat, conf):
-                        # Enforce server-side thresholds. 'other' requires higher confidence.
-                        if cat not in VALID_CATEGORIES or conf is None:
-                            return False
-                        if cat == "other":
-                            return conf >= 0.6
-                        return conf >= 0.5
-
-                    if passes_threshold(client_cat, parsed_conf):
-                        predicted_category, confidence = client_cat, parsed_conf
-                    else:
-                        image_path = issue.image.path
-                        predicted_category, confidence = classify_issue_image(
-                            image_path, threshold=0.5, other_threshold=0.6
-                        )
-                if predicted_category in VALID_CATEGORIES:
-                    issue.category = predicted_category
-                issue.save()
-                print(f"[DL] Image classified as: {predicted_category} ({confidence*100:.2f}% confidence)")
-            except Exception as e:
-                print(f"[DL] Image classification failed: {e}")
+        if getattr(settings, 'CLASSIFY_ASYNC', False):
+            # Respond now; a worker fills in category/priority/confidence and
+            # clients poll /api/issue/<id>/classification/.
+            issue = serializer.save(reporter=self.request.user, classification_status='pending')
+            transaction.on_commit(lambda: submit_classification(issue.pk, update_priority))
+            return
 
+        issue = serializer.save(reporter=self.request.user)
+        predicted_category, confidence = classify_issue(
+            issue, update_priority, image_bytes=getattr(self, 'upload_bytes', None)
+        )
         self.extra_response_data = {
             "category": predicted_category,
             "confidence": confidence,
@@ -101,6 +93,7 @@ class ReportIssueView(generics.CreateAPIView):
         uploaded = request.FILES.get('image')
         if uploaded is not None:
             raw = uploaded.read()
+            self.upload_bytes = raw
             try:
                 if is_animated_bytes(raw):
                     return Response({
@@ -120,9 +113,6 @@ class ReportIssueView(generics.CreateAPIView):
 
 
 
-# Allowed ML categories. The UI and thresholds rely on this list.
-VALID_CATEGORIES = ['water', 'road', 'electricity', 'garbage', 'other']
-
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def predict_image(request):
@@ -135,31 +125,23 @@ def predict_image(request):
         return Response({"error": "No image uploaded"}, status=status.HTTP_400_BAD_REQUEST)
 
     raw = uploaded_file.read()
-    try:
-        if is_animated_bytes(raw):
-            return Response({
-                "category": "unknown",
-                "confidence": 0.0,
-                "is_unknown": True,
-                "reason": "animated_image"
-            })
-    finally:
-        try:
-            uploaded_file.seek(0)
-        except Exception:
-            pass
-
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp:
-        for chunk in uploaded_file.chunks():
-            tmp.write(chunk)
-        tmp_path = tmp.name
+    if is_animated_bytes(raw):
+        return Response({
+            "category": "unknown",
+            "confidence": 0.0,
+            "is_unknown": True,
+            "reason": "animated_image"
+        })
 
+    img = None
     try:
+        # Decode once, in memory: the animation check and the classifier share
+        # this image object; no temp file is written.
         try:
-            with Image.open(tmp_path) as im:
-                is_animated = getattr(im, "is_animated", False) or getattr(im, "n_frames", 1) > 1
+            img = open_image(raw)
+            is_animated = is_animated_image(img)
         except Exception:
-            is_animated = False
+            img, is_animated = None, False
 
         if is_animated:
             return Response({
@@ -170,7 +152,10 @@ def predict_image(request):
             })
 
         # Run classifier with explicit thresholds
-        category, confidence = classify_issue_image(tmp_path, threshold=0.5, other_threshold=0.6)
+        category, confidence = classify_issue_image(
+            img if img is not None else raw, threshold=0.5, other_threshold=0.6,
+            image_bytes=raw,
+        )
 
         if category not in VALID_CATEGORIES:
             category = "unknown"
@@ -201,8 +186,68 @@ def predict_image(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     finally:
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
+        if img is not None:
+            img.close()
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def similar_issues(request):
+    """Likely duplicates of an uploaded photo, for warning reporters before
+    they submit. Uses the image embedding index, never a table scan.
+    Optional `k` (default 5, max 20) limits the number of matches.
+    """
+    uploaded_file = request.FILES.get('image')
+    if not uploaded_file:
+        return Response({"error": "No image uploaded"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        k = max(1, min(int(request.data.get('k', 5)), 20))
+    except (TypeError, ValueError):
+        k = 5
+
+    raw = uploaded_file.read()
+    if is_animated_bytes(raw):
+        return Response({"results": [], "reason": "animated_image"})
+
+    _, _, embedding = classify_with_embedding(raw, image_bytes=raw)
+    if embedding is None:
+        return Response({"results": [], "reason": "embedding_unavailable"})
+
+    matches = find_similar(embedding, k=k)
+    issues = Issue.objects.select_related('reporter').defer('embedding').in_bulk([pk for pk, _ in matches])
+    results = [
+        {
+            "id": issue.id,
+            "title": issue.title,
+            "status": issue.status,
+            "category": issue.category,
+            "address": issue.address,
+            "created_at": issue.created_at.isoformat(),
+            "reporter_username": issue.reporter.username,
+            "image": issue.image.url if issue.image else None,
+            "similarity": round(similarity, 4),
+        }
+        for pk, similarity in matches
+        if (issue := issues.get(pk)) is not None
+    ]
+    return Response({"results": results})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def classifier_stats(request):
+    """Admin-only: inference batcher queue/batch stats and prediction cache hit rates."""
+    return Response({
+        "batcher": classify_scheduler.stats(),
+        "cache": prediction_cache.stats(),
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def response_cache_stats(request):
+    """Admin-only: shared response cache hits, misses and stampede waits per endpoint (this process)."""
+    return Response(response_cache.stats())
 
 
 class UpdateIssueView(generics.RetrieveUpdateAPIView):
@@ -230,6 +275,95 @@ class UpdateIssueView(generics.RetrieveUpdateAPIView):
         except Exception:
             pass
 
+BULK_FILTER_FIELDS = ('status', 'category', 'priority')
+
+
+@api_view(['POST'])
+@permission_classes([IsAdmin])
+def bulk_update_issues(request):
+    """Admin triage: set status and/or priority on many issues at once.
+    Body: "ids": [..] or "filter": {status, category, priority, created_from,
+    created_to (YYYY-MM-DD)}, plus "status" and/or "priority". Applied in one
+    transaction; resolving statuses record the admin as resolved_by.
+    Returns the outcome per id (updated, unchanged, not_found) and totals.
+    """
+    data = request.data
+    new_status, new_priority = data.get('status') or None, data.get('priority') or None
+    if not new_status and not new_priority:
+        return Response({"error": "Give a status and/or priority to set"}, status=status.HTTP_400_BAD_REQUEST)
+    if new_status and new_status not in dict(Issue.STATUS_CHOICES):
+        return Response({"error": f"Unknown status '{new_status}'"}, status=status.HTTP_400_BAD_REQUEST)
+    if new_priority and new_priority not in dict(Issue.PRIORITY_CHOICES):
+        return Response({"error": f"Unknown priority '{new_priority}'"}, status=status.HTTP_400_BAD_REQUEST)
+
+    max_issues = settings.BULK_UPDATE_MAX_ISSUES
+    ids = None
+    if 'ids' in data:
+        try:
+            ids = list(dict.fromkeys(int(pk) for pk in data['ids']))
+        except (TypeError, ValueError):
+            return Response({"error": "ids must be a list of issue ids"}, status=status.HTTP_400_BAD_REQUEST)
+        if not ids:
+            return Response({"error": "ids is empty"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > max_issues:
+            return Response({"error": f"At most {max_issues} ids per request"}, status=status.HTTP_400_BAD_REQUEST)
+        issues = Issue.objects.filter(pk__in=ids)
+    elif isinstance(data.get('filter'), dict) and data['filter']:
+        criteria = data['filter']
+        unknown = set(criteria) - set(BULK_FILTER_FIELDS) - {'created_from', 'created_to'}
+        if unknown:
+            return Response({"error": f"Unknown filter fields: {', '.join(sorted(unknown))}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        issues = Issue.objects.filter(**{name: criteria[name] for name in BULK_FILTER_FIELDS if name in criteria})
+        try:
+            if criteria.get('created_from'):
+                issues = issues.filter(created_at__date__gte=date.fromisoformat(criteria['created_from']))
+            if criteria.get('created_to'):
+                issues = issues.filter(created_at__date__lte=date.fromisoformat(criteria['created_to']))
+        except (TypeError, ValueError):
+            return Response({"error": "created_from and created_to must be YYYY-MM-DD dates"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        matched = issues.count()
+        if matched > max_issues:
+            return Response({"error": f"Filter matches {matched} issues; at most {max_issues} per request"},
+                            status=status.HTTP_400_BAD_REQUEST)
+    else:
+        return Response({"error": "Give ids or a filter"}, status=status.HTTP_400_BAD_REQUEST)
+
+    outcomes = bulk.update_issues(issues, request.user, status=new_status, priority=new_priority, ids=ids)
+    totals = {outcome: 0 for outcome in (bulk.UPDATED, bulk.UNCHANGED, bulk.NOT_FOUND)}
+    for outcome in outcomes.values():
+        totals[outcome] += 1
+    return Response({
+        "results": [{"id": pk, "result": outcome} for pk, outcome in outcomes.items()],
+        **totals,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def export_issues(request, fmt):
+    """Admin-only bulk export for analytics, streamed as CSV or NDJSON
+    (fmt = csv | ndjson) in id order. Query params: from, to (YYYY-MM-DD,
+    by creation date), status, category. Memory use doesn't grow with the
+    number of rows; see api/export.py.
+    """
+    if fmt not in export.FORMATS:
+        return Response({"error": "Format must be csv or ndjson"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        filters = export.parse_filters(request.query_params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    content_type = 'text/csv; charset=utf-8' if fmt == 'csv' else 'application/x-ndjson; charset=utf-8'
+    chunks = export.batched(export.lines(fmt, export.issue_rows(**filters)))
+    chunks = export.for_handler(chunks, request.META)
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="issues-{now():%Y%m%d-%H%M%S}.{fmt}"'
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
 class DeleteIssueView(DestroyAPIView):
     """Allow a reporter to delete only their own issues."""
     queryset = Issue.objects.all()
@@ -245,12 +379,13 @@ class DeleteIssueView(DestroyAPIView):
 
 
 class MyIssuesView(generics.ListAPIView):
-    """List only the authenticated user's own issues."""
-    serializer_class = IssueSerializer
+    """List only the authenticated user's own issues (compact; see IssueListSerializer)."""
+    serializer_class = IssueListSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Issue.objects.filter(reporter=self.request.user)
+        fields = IssueListSerializer.selected_fields(self.request)
+        return Issue.objects.filter(reporter=self.request.user).with_feed_data(self.request.user, fields)
 
 
 @api_view(['POST'])
@@ -261,47 +396,32 @@ def upvote_issue(request, issue_id):
     - Otherwise toggles presence in issue.upvotes ManyToMany.
     Always returns current upvotes_count and user_has_voted.
     """
-    user = request.user
     try:
-        issue = Issue.objects.get(id=issue_id)
+        action, upvotes_count, user_has_voted = toggle_upvote(issue_id, request.user)
     except Issue.DoesNotExist:
         return Response({"error": "Issue not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    if issue.reporter == user:
-        # No-op for self-vote: do not treat as error, do not change counts
-        return Response({
-            "message": "Self-vote not allowed",
-            "upvotes_count": issue.upvotes.count(),
-            "user_has_voted": False,
-        }, status=status.HTTP_200_OK)
-
-    if issue.upvotes.filter(pk=user.pk).exists():
-        issue.upvotes.remove(user)
-        return Response({
-            "message": "Vote removed",
-            "upvotes_count": issue.upvotes.count(),
-            "user_has_voted": False,
-        }, status=status.HTTP_200_OK)
-
-    issue.upvotes.add(user)
+    messages = {
+        'self': "Self-vote not allowed",
+        'removed': "Vote removed",
+        'added': "Vote added",
+    }
     return Response({
-        "message": "Vote added",
-        "upvotes_count": issue.upvotes.count(),
-        "user_has_voted": True,
+        "message": messages[action],
+        "upvotes_count": upvotes_count,
+        "user_has_voted": user_has_voted,
     }, status=status.HTTP_200_OK)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def remove_vote_issue(request, issue_id):
     """Legacy explicit remove endpoint (kept for compatibility)."""
-    user = request.user
     try:
-        issue = Issue.objects.get(id=issue_id)
+        removed = remove_upvote(issue_id, request.user)
     except Issue.DoesNotExist:
         return Response({"error": "Issue not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    if issue.upvotes.filter(pk=user.pk).exists():
-        issue.upvotes.remove(user)
+    if removed:
         return Response({"message": "Vote removed"}, status=status.HTTP_200_OK)
     else:
         return Response({"message": "No vote to remove"}, status=status.HTTP_400_BAD_REQUEST)
@@ -328,6 +448,13 @@ def get_issue_detail(request, issue_id):
     """Return a public detail payload for a single issue including
     current upvotes count and whether the requesting user has voted.
     """
+    validators = issue_validators(request, issue_id, 'detail')
+    if validators is None:
+        return Response({"error": "Issue not found"}, status=status.HTTP_404_NOT_FOUND)
+    not_modified = validators.not_modified(request)
+    if not_modified is not None:
+        return not_modified
+
     try:
         issue = Issue.objects.get(id=issue_id)
     except Issue.DoesNotExist:
@@ -343,23 +470,232 @@ def get_issue_detail(request, issue_id):
         "category": issue.category,
         "priority": issue.priority,
         "created_at": issue.created_at.isoformat(),
-        "upvotes_count": issue.upvotes.count(),
+        "upvotes_count": issue.upvotes_count,
         "user_has_voted": user_has_voted,
         "reporter_username": issue.reporter.username if issue.reporter else None,
         "resolved_by_username": issue.resolved_by.username if issue.resolved_by else None,
         "image": issue.image.url if issue.image else None,
+        "image_variants": derivatives.variant_urls(issue.image),
         "address": issue.address,
     }
-    return Response(data, status=status.HTTP_200_OK)
+    return validators.apply(Response(data, status=status.HTTP_200_OK))
 
     
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def issue_classification(request, issue_id):
+    """Poll the image classification result of an issue (see CLASSIFY_ASYNC)."""
+    issue = (
+        Issue.objects.filter(id=issue_id)
+        .values('id', 'classification_status', 'category', 'priority', 'confidence')
+        .first()
+    )
+    if issue is None:
+        return Response({"error": "Issue not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response(issue, status=status.HTTP_200_OK)
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def public_issues(request):
-    """Unauthenticated list of all issues (for community feed)."""
-    issues = Issue.objects.all() 
-    serializer = IssueSerializer(issues, many=True, context={'request': request})
-    return Response(serializer.data)
+    """Unauthenticated list of issues (for community feed).
+    Passing `cursor` or `page_size` switches to the keyset-paginated feed:
+    {"results": [...], "next": <cursor or null>, "page_size": n}.
+    Without them the full list is returned as before.
+    Items are compact by default; use ?fields=a,b and ?expand=comments for more.
+    Supports If-None-Match.
+
+    The payload is built without a user or host and kept in the shared
+    response cache; user_has_voted and absolute media URLs are filled in per
+    request afterwards.
+    """
+    fields = IssueListSerializer.selected_fields(request)
+    params = request.query_params
+    paginated = 'cursor' in params or 'page_size' in params
+    # Keyed by what the view reads, so arbitrary extra query parameters
+    # can't multiply the cached entries
+    variant = repr((sorted(fields), paginated and (params.get('cursor', ''), KeysetPaginator(request).page_size)))
+
+    def build():
+        state = feed_state()
+        issues = Issue.objects.with_feed_data(None, fields)
+        context = {'request': request, 'shared': True}
+        if paginated:
+            paginator = KeysetPaginator(request)
+            page = paginator.paginate_queryset(issues)
+            serializer = IssueListSerializer(page, many=True, context=context)
+            return {'state': state, 'data': paginator.get_paginated_data(serializer.data)}
+        serializer = IssueListSerializer(issues, many=True, context=context)
+        return {'state': state, 'data': serializer.data}
+
+    try:
+        entry = response_cache.get_or_build('public_issues', variant, build)
+    except InvalidCursor:
+        return Response({"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+
+    validators = feed_validators(request, state=entry['state'])
+    not_modified = validators.not_modified(request)
+    if not_modified is not None:
+        return not_modified
+
+    # The cached items hold relative media URLs and no vote flags; fill both
+    # in on copies, since they may be the very objects the cache holds
+    data = entry['data']
+    voted = None
+    if 'user_has_voted' in fields and request.user.is_authenticated:
+        voted = voted_issue_ids(request.user)
+
+    def for_request(item):
+        item = dict(item)
+        if item.get('image'):
+            item['image'] = request.build_absolute_uri(item['image'])
+        if 'image_variants' in item:
+            item['image_variants'] = derivatives.absolute_variant_urls(item['image_variants'], request)
+        if voted is not None:
+            item['user_has_voted'] = item['id'] in voted
+        return item
+
+    items = [for_request(item) for item in (data['results'] if isinstance(data, dict) else data)]
+    data = {**data, 'results': items} if isinstance(data, dict) else items
+    return validators.apply(Response(data))
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def search_issues(request):
+    """Full-text search over issue title, description and address.
+    Query params: q (required), status, category, limit (max 50), offset.
+    Results are BM25-ranked and include highlighted snippets.
+    """
+    q = request.query_params.get('q', '').strip()
+    if not q:
+        return Response({"error": "Missing search query 'q'"}, status=status.HTTP_400_BAD_REQUEST)
+    if not search.fts_available():
+        return Response({"error": "Search is not available"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 20)), 50))
+        offset = max(0, int(request.query_params.get('offset', 0)))
+    except ValueError:
+        return Response({"error": "limit and offset must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+    issues = search.search(
+        q,
+        status=request.query_params.get('status'),
+        category=request.query_params.get('category'),
+        limit=limit,
+        offset=offset,
+    )
+    data = [
+        {
+            "id": issue.id,
+            "title": issue.title,
+            "title_highlight": issue.title_highlight,
+            "description_snippet": issue.description_snippet,
+            "status": issue.status,
+            "category": issue.category,
+            "priority": issue.priority,
+            "address": issue.address,
+            "created_at": issue.created_at.isoformat(),
+            "rank": issue.rank,
+        }
+        for issue in issues
+    ]
+    return Response({"results": data, "limit": limit, "offset": offset})
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def issue_stats(request):
+    """Dashboard statistics from the rollup table: counts by status, category
+    and priority, resolution times, open-issue age and issues created per day.
+    Query params: from, to (YYYY-MM-DD, by creation date), category.
+    """
+    try:
+        start = date.fromisoformat(request.query_params['from']) if request.query_params.get('from') else None
+        end = date.fromisoformat(request.query_params['to']) if request.query_params.get('to') else None
+    except ValueError:
+        return Response({"error": "from and to must be YYYY-MM-DD dates"}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(rollups.summary(start, end, request.query_params.get('category')))
+
+
+MAP_POINT_FIELDS = ('id', 'title', 'status', 'category', 'priority', 'latitude', 'longitude')
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def map_issues(request):
+    """Issues for the map view, by bounding box or radius.
+    - bbox=min_lng,min_lat,max_lng,max_lat&zoom=N: below GEO_CLUSTER_MAX_ZOOM the
+      points are grouped server-side into count buckets (one per ~64px); at or
+      above it individual points are returned.
+    - lat=..&lng=..&radius=<metres>: points in the circle, nearest first.
+    Optional filters: status, category.
+    """
+    params = request.query_params
+    max_points = settings.GEO_MAX_POINTS
+    try:
+        if 'bbox' in params:
+            error = "bbox must be min_lng,min_lat,max_lng,max_lat in range, and zoom an integer"
+            bbox = geo.parse_bbox(params['bbox'])
+            zoom = int(params['zoom']) if 'zoom' in params else None
+            center = None
+        else:
+            error = f"lat and lng must be coordinates and radius 0-{settings.GEO_MAX_RADIUS_M} metres"
+            lat, lng = float(params['lat']), float(params['lng'])
+            radius = float(params.get('radius', 1000))
+            if not (-90 <= lat <= 90 and -180 <= lng <= 180 and 0 < radius <= settings.GEO_MAX_RADIUS_M):
+                raise ValueError
+            bbox, zoom, center = geo.bbox_around(lat, lng, radius), None, (lat, lng)
+    except KeyError:
+        return Response({"error": "Give either bbox or lat, lng and radius"}, status=status.HTTP_400_BAD_REQUEST)
+    except ValueError:
+        return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+    issues = Issue.objects.filter(geo.bbox_q(*bbox))
+    if params.get('status'):
+        issues = issues.filter(status=params['status'])
+    if params.get('category'):
+        issues = issues.filter(category=params['category'])
+
+    if zoom is not None and zoom < settings.GEO_CLUSTER_MAX_ZOOM:
+        size = geo.cluster_degrees(max(zoom, 0))
+        clusters = (
+            issues
+            .annotate(
+                cx=Cast((F('longitude') + 180) / size, IntegerField()),
+                cy=Cast((F('latitude') + 90) / size, IntegerField()),
+            )
+            .values('cx', 'cy')
+            .annotate(count=Count('id'), lat=Avg('latitude'), lng=Avg('longitude'), first_id=Min('id'))
+            .order_by()
+        )
+        data = [
+            {
+                "lat": c['lat'],
+                "lng": c['lng'],
+                "count": c['count'],
+                # Lets the client link a lone point without a second request
+                "issue_id": c['first_id'] if c['count'] == 1 else None,
+            }
+            for c in clusters
+        ]
+        return Response({"clusters": data, "zoom": zoom})
+
+    if center is None:
+        points = list(issues.order_by('-created_at').values(*MAP_POINT_FIELDS)[:max_points + 1])
+    else:
+        # Nearest first in SQL, so only max_points + 1 rows are read; the
+        # bbox only approximates the circle, so trim the corners exactly
+        nearest = issues.annotate(order=geo.distance_order(*center)).order_by('order')
+        points = []
+        for point in nearest.values(*MAP_POINT_FIELDS)[:max_points + 1]:
+            distance = geo.haversine_m(center[0], center[1], point['latitude'], point['longitude'])
+            if distance <= radius:
+                point['distance_m'] = round(distance, 1)
+                points.append(point)
+        points.sort(key=lambda p: p['distance_m'])
+    truncated = len(points) > max_points
+    return Response({"points": points[:max_points], "truncated": truncated})
 
 
 @api_view(["GET", "POST"])
@@ -368,12 +704,18 @@ def comments_view(request, issue_id):
     """List or create comments for a given issue.
     GET returns all comments; POST creates a new comment by the user.
     """
-    issue = get_object_or_404(Issue, id=issue_id)
-
     if request.method == "GET":
-        comments = Comment.objects.filter(issue=issue).order_by("created_at")
+        validators = issue_validators(request, issue_id, 'comments')
+        if validators is None:
+            raise Http404
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+        comments = Comment.objects.filter(issue_id=issue_id).select_related('user', 'issue').order_by("created_at")
         serializer = CommentSerializer(comments, many=True)
-        return Response(serializer.data)
+        return validators.apply(Response(serializer.data))
+
+    issue = get_object_or_404(Issue, id=issue_id)
 
     if request.method == "POST":
         serializer = CommentSerializer(data=request.data)
@@ -418,6 +760,7 @@ def user_info(request):
         "role": request.user.role,
         "date_joined": request.user.date_joined.isoformat(), 
         "profile_picture": profile_picture_url,
+        "profile_picture_variants": derivatives.variant_urls(request.user.profile_picture, request),
     })
 
 
@@ -482,20 +825,29 @@ def my_comments(request):
 @permission_classes([AllowAny])  
 def recent_activity(request):
     """Public endpoint: recent issues for the home page activity section."""
-    issues = Issue.objects.select_related('reporter').order_by('-created_at')[:5]  
-    data = [
-        {
-            "id": issue.id,
-            "title": issue.title,
-            "description": issue.description,
-            "category": issue.category,
-            "status": issue.status,
-            "created_at": localtime(issue.created_at).isoformat(),  
-            "reporter": issue.reporter.username
-        }
-        for issue in issues
-    ]
-    return Response(data)
+    def build():
+        state = feed_state()
+        issues = Issue.objects.select_related('reporter').order_by('-created_at')[:5]
+        data = [
+            {
+                "id": issue.id,
+                "title": issue.title,
+                "description": issue.description,
+                "category": issue.category,
+                "status": issue.status,
+                "created_at": localtime(issue.created_at).isoformat(),
+                "reporter": issue.reporter.username
+            }
+            for issue in issues
+        ]
+        return {'state': state, 'data': data}
+
+    entry = response_cache.get_or_build('recent_activity', '', build)
+    validators = feed_validators(request, per_user=False, state=entry['state'])
+    not_modified = validators.not_modified(request)
+    if not_modified is not None:
+        return not_modified
+    return validators.apply(Response(entry['data']))
 
 
 def is_animated_bytes(data: bytes) -> bool:
@@ -0,0 +1,82 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import live, response_cache
+from .models import Issue
+
+UpvoteLink = Issue.upvotes.through
+
+
+def _adjust_count(issue_id, delta, count):
+    """Apply `delta` to the stored counter; `count` is the resulting value,
+    read by the caller after its first write, so no other vote can have
+    changed it in between.
+    """
+    Issue.objects.filter(pk=issue_id).update(upvotes_count=F('upvotes_count') + delta, activity_at=timezone.now())
+    # The through-table writes above don't send m2m_changed
+    response_cache.invalidate()
+    live.publish(issue_id, live.VOTES, upvotes_count=count)
+
+
+def _delete_vote(issue_id, user):
+    """Delete `user`'s vote, then read (reporter id, upvotes_count) of the
+    issue. The DELETE comes first so the transaction starts by writing:
+    SQLite then waits for its write lock up front, whereas a transaction that
+    read first can't upgrade its lock under contention and fails at once with
+    "database is locked". Elsewhere select_for_update() serializes on the
+    issue row. Raises Issue.DoesNotExist.
+    """
+    removed, _ = UpvoteLink.objects.filter(issue_id=issue_id, customuser_id=user.pk).delete()
+    row = (
+        Issue.objects.select_for_update()
+        .filter(pk=issue_id)
+        .values_list('reporter_id', 'upvotes_count')
+        .first()
+    )
+    if row is None:
+        raise Issue.DoesNotExist
+    return bool(removed), row
+
+
+def toggle_upvote(issue_id, user):
+    """Add or remove `user`'s vote on an issue in one transaction.
+
+    Works on the through table directly: a DELETE, and only if nothing was
+    deleted an INSERT, followed by an atomic F() update of the stored counter.
+    Returns (action, upvotes_count, user_has_voted) where action is one of
+    'self', 'added' or 'removed'. Raises Issue.DoesNotExist.
+    """
+    with transaction.atomic():
+        removed, (reporter_id, count) = _delete_vote(issue_id, user)
+        if removed:
+            _adjust_count(issue_id, -1, max(count - 1, 0))
+            return 'removed', max(count - 1, 0), False
+
+        if reporter_id == user.pk:
+            return 'self', count, False
+
+        try:
+            with transaction.atomic():
+                UpvoteLink.objects.create(issue_id=issue_id, customuser_id=user.pk)
+        except IntegrityError:
+            # A concurrent request from the same user got there first
+            return 'added', count, True
+        _adjust_count(issue_id, 1, count + 1)
+        return 'added', count + 1, True
+
+
+def remove_upvote(issue_id, user):
+    """Delete `user`'s vote if present. Returns True if a vote was removed.
+    Raises Issue.DoesNotExist.
+    """
+    with transaction.atomic():
+        removed, (_, count) = _delete_vote(issue_id, user)
+        if removed:
+            _adjust_count(issue_id, -1, max(count - 1, 0))
+        return removed
+
+
+def voted_issue_ids(user):
+    """Ids of every issue `user` has upvoted."""
+    return set(UpvoteLink.objects.filter(customuser_id=user.pk).values_list('issue_id', flat=True))
@@ -13,4 +13,19 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+# Initialise Django before importing anything that loads models
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.security.websocket import AllowedHostsOriginValidator  # noqa: E402
+
+from api import live  # noqa: E402
+from api.routing import websocket_urlpatterns  # noqa: E402
+
+live.serving = True
+
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    # Live issue feed, see api/live.py
+    'websocket': AllowedHostsOriginValidator(URLRouter(websocket_urlpatterns)),
+})
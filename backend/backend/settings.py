@@ -61,6 +61,7 @@ INSTALLED_APPS = [
     'api',
     'rest_framework',
     'corsheaders',
+    'channels',
     # 'djoser',
 ]
 
@@ -102,6 +103,10 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file, not the shared in-memory default: SQLite's busy timeout
+        # doesn't apply between connections sharing one in-memory cache, and
+        # the vote tests write from several threads at once
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
@@ -154,12 +159,104 @@ CORS_ALLOW_CREDENTIALS = True
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Image classifier: concurrent requests are micro-batched into one forward pass.
+# A batch runs as soon as it has CLASSIFIER_BATCH_MAX_SIZE images or the oldest
+# request has waited CLASSIFIER_BATCH_MAX_WAIT_MS.
+CLASSIFIER_BATCHING = True
+CLASSIFIER_BATCH_MAX_SIZE = 8
+CLASSIFIER_BATCH_MAX_WAIT_MS = 5
+# Seconds a request waits for its batch before predicting on its own
+CLASSIFIER_BATCH_TIMEOUT_S = float(os.getenv('CLASSIFIER_BATCH_TIMEOUT_S', '30'))
+
+# LRU of class probabilities keyed by model version + SHA-256 of the image, shared
+# by predict-image and report. Set the distance (bits out of 64) to also reuse
+# labels for near-duplicate photos where no embedding is needed (predict-image);
+# None disables that tier, size 0 the cache.
+CLASSIFIER_CACHE_SIZE = 2048
+CLASSIFIER_CACHE_PHASH_DISTANCE = 4
+
+# Classify report images after responding instead of inside the request.
+# New issues come back with classification_status='pending'; poll
+# /api/issue/<id>/classification/ for the result.
+CLASSIFY_ASYNC = os.getenv('CLASSIFY_ASYNC', '0') == '1'
+CLASSIFY_ASYNC_WORKERS = 2
+
+# Duplicate detection: classifier embeddings live in an append-only float16
+# index; /api/similar-issues/ returns issues at or above this cosine similarity.
+EMBEDDING_INDEX_PATH = BASE_DIR / 'embeddings.idx'
+DUPLICATE_MIN_SIMILARITY = 0.85
+
+# 'keras' serves api/model.keras; 'tflite' serves the quantized api/model.tflite
+# produced by `python export_model.py`.
+CLASSIFIER_BACKEND = os.getenv('CLASSIFIER_BACKEND', 'keras')
+
+# The model is loaded lazily on first use. Inference workers can set
+# CLASSIFIER_WARMUP=1 to load it and run a dummy prediction at startup.
+CLASSIFIER_WARMUP_ON_STARTUP = os.getenv('CLASSIFIER_WARMUP', '0') == '1'
+
+# Map queries: issue coordinates are indexed on a fixed grid of this many
+# degrees (~1.1 km); after changing it run `manage.py rebuild_geo_cells`.
+GEO_CELL_DEGREES = 0.01
+GEO_CLUSTER_MAX_ZOOM = 16  # /api/map/issues/ returns clusters below this zoom
+GEO_MAX_POINTS = 500
+GEO_MAX_RADIUS_M = 50000
+
+# Shared response cache for the anonymous feed endpoints (public-issues,
+# recent-activity). Entries are invalidated on any issue/comment/vote change,
+# but only within one cache backend: 'locmem' is per process, so with more
+# than one worker the others serve stale feeds for up to RESPONSE_CACHE_TIMEOUT.
+# Use 'file' (shared by the workers on this host) or 'redis'
+# (RESPONSE_CACHE_URL) when running several.
+RESPONSE_CACHE_BACKEND = os.getenv('RESPONSE_CACHE', 'locmem')
+RESPONSE_CACHE_TIMEOUT = 300
+RESPONSE_CACHES = {
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'responses'),
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('RESPONSE_CACHE_URL', 'redis://127.0.0.1:6379/1'),
+    },
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+    },
+}
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': RESPONSE_CACHES[RESPONSE_CACHE_BACKEND],
+}
+
+# Resized WebP/JPEG copies of uploaded issue and profile images (longest edge
+# in px), written under MEDIA_ROOT/variants/ by the worker pool after upload.
+# Backfill existing media with `manage.py build_image_variants`.
+IMAGE_VARIANTS = {'thumb': 320, 'medium': 1024}
+IMAGE_VARIANT_QUALITY = 80
+
+# Largest number of issues one admin bulk status/priority update may touch
+BULK_UPDATE_MAX_ISSUES = 5000
+
+# Live feed (ws/issues/): events of one issue arriving within this many
+# seconds are sent to each client as a single update
+LIVE_FEED_COALESCE_SECONDS = 0.5
+
 # 2. Define ASGI_APPLICATION
 ASGI_APPLICATION = "backend.asgi.application"  # Change 'backend' to your Django project name if different
 
 # 3. Define CHANNEL_LAYERS
+# Set CHANNEL_REDIS_URL (e.g. redis://localhost:6379/0) to run more than one
+# server process or to see live feed events from management commands. The
+# in-memory layer only delivers within the single process serving ws/, so
+# api/live.py doesn't publish from any other process with it.
+CHANNEL_REDIS_URL = os.getenv('CHANNEL_REDIS_URL')
 CHANNEL_LAYERS = {
     "default": {
+        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        "CONFIG": {"hosts": [CHANNEL_REDIS_URL]},
+    } if CHANNEL_REDIS_URL else {
         "BACKEND": "channels.layers.InMemoryChannelLayer",  # For testing/dev only
     }
 }
\ No newline at end of file
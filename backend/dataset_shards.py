@@ -0,0 +1,263 @@
+"""Preprocessed, sharded copy of the training images.
+
+    python dataset_shards.py              # ingest new or changed images
+    python dataset_shards.py --rebuild    # rewrite every shard from scratch
+
+Images under dataset/scraped-images-bs4/<category>/ are decoded and resized
+to 224x224 once (nearest-neighbour, as flow_from_directory does) and stored
+as uint8 rows in fixed-size shard-NNNNN.npy files under dataset/shards/.
+index.json is the label index: the shard row counts and, for every source
+image, its label, size/mtime, shard and row. Re-running only decodes images
+that are new or changed; deleted images are dropped from the index and their
+rows reclaimed by --rebuild. Train on the shards with
+`python train_model.py --pipeline shards`.
+"""
+import argparse
+import json
+import os
+import time
+from multiprocessing import Pool
+
+import numpy as np
+from PIL import Image
+
+BASE_DIR = os.path.dirname(__file__)
+DATA_DIR = os.path.join(BASE_DIR, '..', 'dataset', 'scraped-images-bs4')
+SHARDS_DIR = os.path.join(BASE_DIR, '..', 'dataset', 'shards')
+IMAGE_SIZE = 224
+SHARD_SIZE = 1024
+# Same white-list as flow_from_directory
+EXTENSIONS = ('png', 'jpg', 'jpeg', 'bmp', 'ppm', 'tif', 'tiff')
+
+
+def load_image(path):
+    """(224, 224, 3) uint8 array, or None if the file can't be decoded."""
+    try:
+        with Image.open(path) as img:
+            return np.asarray(img.convert('RGB').resize((IMAGE_SIZE, IMAGE_SIZE), Image.NEAREST), dtype=np.uint8)
+    except Exception as e:
+        print(f"❌ Skipping {path}: {e}")
+        return None
+
+
+def scan(data_dir):
+    """{relpath: (category, size, mtime_ns)} for every image, in the order
+    flow_from_directory lists them (class, then sorted walk, then file name).
+    """
+    found = {}
+    for category in sorted(os.listdir(data_dir)):
+        class_dir = os.path.join(data_dir, category)
+        if not os.path.isdir(class_dir):
+            continue
+        for root, _, files in sorted(os.walk(class_dir)):
+            for name in sorted(files):
+                if name.lower().rsplit('.', 1)[-1] not in EXTENSIONS:
+                    continue
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                found[os.path.relpath(path, data_dir)] = (category, stat.st_size, stat.st_mtime_ns)
+    return found
+
+
+class Split:
+    """Rows of one subset, grouped by shard, with labels as class indices."""
+
+    def __init__(self, entries, categories):
+        self.rows_by_shard = {}
+        for entry in sorted(entries, key=lambda e: (e['shard'], e['row'])):
+            rows, labels = self.rows_by_shard.setdefault(entry['shard'], ([], []))
+            rows.append(entry['row'])
+            labels.append(categories.index(entry['category']))
+        self.rows_by_shard = {
+            shard: (np.array(rows), np.array(labels, dtype=np.int32))
+            for shard, (rows, labels) in self.rows_by_shard.items()
+        }
+        self.classes = np.concatenate([labels for _, labels in self.rows_by_shard.values()]) \
+            if self.rows_by_shard else np.array([], dtype=np.int32)
+        self.samples = len(self.classes)
+
+
+class ShardStore:
+    def __init__(self, root=SHARDS_DIR):
+        self.root = root
+        self.index_path = os.path.join(root, 'index.json')
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+        else:
+            self.index = self._empty_index()
+
+    @staticmethod
+    def _empty_index():
+        return {'image_size': IMAGE_SIZE, 'shard_size': SHARD_SIZE, 'shards': [], 'images': {}}
+
+    def _shard_path(self, shard):
+        return os.path.join(self.root, f'shard-{shard:05d}.npy')
+
+    def shard(self, shard):
+        """Memory-mapped uint8 rows of one shard."""
+        count = self.index['shards'][shard]
+        return np.load(self._shard_path(shard), mmap_mode='r')[:count]
+
+    def categories(self):
+        return sorted({entry['category'] for entry in self.index['images'].values()})
+
+    def split(self, categories, validation_split=0.2):
+        """(train, validation) Splits. Like flow_from_directory, the first
+        `validation_split` of each class's files (in listing order) validate.
+        """
+        by_class = {}
+        for relpath in sorted(self.index['images'], key=_listing_key):
+            entry = self.index['images'][relpath]
+            by_class.setdefault(entry['category'], []).append(entry)
+        train, val = [], []
+        for entries in by_class.values():
+            cut = int(validation_split * len(entries))
+            val += entries[:cut]
+            train += entries[cut:]
+        return Split(train, categories), Split(val, categories)
+
+    # --- ingest -------------------------------------------------------------
+
+    def ingest(self, data_dir=DATA_DIR, workers=None, rebuild=False):
+        """Bring the shards in line with `data_dir`. Returns counts of
+        added, updated, removed and skipped images.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        if rebuild:
+            for name in os.listdir(self.root):
+                if name.startswith('shard-'):
+                    os.remove(os.path.join(self.root, name))
+            self.index = self._empty_index()
+        images = self.index['images']
+        skipped_before = self.index.setdefault('skipped', {})
+        found = scan(data_dir)
+
+        removed = [relpath for relpath in images if relpath not in found]
+        for relpath in removed:
+            del images[relpath]
+        for relpath in [r for r in skipped_before if r not in found]:
+            del skipped_before[relpath]
+
+        new, changed = [], []
+        for relpath, (_, size, mtime_ns) in found.items():
+            if relpath in images:
+                entry = images[relpath]
+                if (entry['size'], entry['mtime_ns']) != (size, mtime_ns):
+                    changed.append(relpath)
+            elif relpath in skipped_before:
+                entry = skipped_before[relpath]
+                if (entry['size'], entry['mtime_ns']) != (size, mtime_ns):
+                    new.append(relpath)  # was undecodable; try again
+            else:
+                new.append(relpath)
+
+        counts = {'added': 0, 'updated': 0, 'removed': len(removed), 'skipped': 0}
+        paths = [os.path.join(data_dir, relpath) for relpath in changed + new]
+        with Pool(workers) as pool:
+            decoded = pool.imap(load_image, paths, chunksize=16)
+            self._write(decoded, changed, new, found, counts)
+
+        self._save_index()
+        return counts
+
+    def _write(self, decoded, changed, new, found, counts):
+        images, skipped = self.index['images'], self.index['skipped']
+
+        def record(relpath, **where):
+            category, size, mtime_ns = found[relpath]
+            images[relpath] = {'category': category, 'size': size, 'mtime_ns': mtime_ns, **where}
+            skipped.pop(relpath, None)
+
+        def skip(relpath):
+            category, size, mtime_ns = found[relpath]
+            skipped[relpath] = {'category': category, 'size': size, 'mtime_ns': mtime_ns}
+            images.pop(relpath, None)
+            counts['skipped'] += 1
+
+        # Changed images are rewritten in place
+        open_shards = {}
+        for relpath in changed:
+            array = next(decoded)
+            if array is None:
+                skip(relpath)
+                continue
+            entry = images[relpath]
+            if entry['shard'] not in open_shards:
+                open_shards[entry['shard']] = np.load(self._shard_path(entry['shard']), mmap_mode='r+')
+            open_shards[entry['shard']][entry['row']] = array
+            record(relpath, shard=entry['shard'], row=entry['row'])
+            counts['updated'] += 1
+        for shard in open_shards.values():
+            shard.flush()
+        open_shards.clear()
+
+        # New images fill the last shard, then new ones of SHARD_SIZE rows
+        shards = self.index['shards']
+        if shards and shards[-1] < SHARD_SIZE:
+            shard_id = len(shards) - 1
+            buffer = list(self.shard(shard_id))
+        else:
+            shard_id, buffer = len(shards), []
+        pending = []  # relpaths in `buffer` not yet in the index
+
+        def flush():
+            array = np.stack(buffer) if buffer else np.zeros((0, IMAGE_SIZE, IMAGE_SIZE, 3), np.uint8)
+            tmp_path = self._shard_path(shard_id) + '.tmp.npy'
+            np.save(tmp_path, array)
+            os.replace(tmp_path, self._shard_path(shard_id))
+            if shard_id < len(shards):
+                shards[shard_id] = len(buffer)
+            else:
+                shards.append(len(buffer))
+            start = len(buffer) - len(pending)
+            for offset, relpath in enumerate(pending):
+                record(relpath, shard=shard_id, row=start + offset)
+
+        started = time.perf_counter()
+        for relpath in new:
+            array = next(decoded)
+            if array is None:
+                skip(relpath)
+                continue
+            buffer.append(array)
+            pending.append(relpath)
+            counts['added'] += 1
+            if len(buffer) == SHARD_SIZE:
+                flush()
+                print(f"   shard {shard_id:05d} written ({counts['added']} new images, "
+                      f"{counts['added'] / (time.perf_counter() - started):.0f} images/sec)")
+                shard_id, buffer, pending = shard_id + 1, [], []
+        if pending:
+            flush()
+
+    def _save_index(self):
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+
+
+def _listing_key(relpath):
+    # sorted(os.walk()) orders by directory, then files by name
+    return os.path.dirname(relpath), os.path.basename(relpath)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--shards-dir', default=SHARDS_DIR)
+    parser.add_argument('--workers', type=int, default=None, help="Decode processes (default: CPU count).")
+    parser.add_argument('--rebuild', action='store_true', help="Discard existing shards and re-ingest everything.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store = ShardStore(args.shards_dir)
+    counts = store.ingest(args.data_dir, workers=args.workers, rebuild=args.rebuild)
+    print(f"✅ Shards updated in {time.perf_counter() - start:.1f}s: {counts}")
+    print(f"   {len(store.index['images'])} images in {len(store.index['shards'])} shards, "
+          f"classes {store.categories()}")
+
+
+if __name__ == '__main__':
+    main()
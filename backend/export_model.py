@@ -0,0 +1,138 @@
+"""Export api/model.keras to a quantized TFLite model for serving.
+
+    python export_model.py                  # float16 weights (default)
+    python export_model.py --quantize int8  # int8, calibrated on training images
+
+Writes api/model.tflite and api/model.tflite.report.json, which compares the
+TFLite model against the Keras model on the validation split used by
+train_model.py (accuracy delta, top-1 agreement, per-image latency).
+Serve it with CLASSIFIER_BACKEND=tflite.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.models import load_model
+from tensorflow.keras.preprocessing.image import ImageDataGenerator
+
+BASE_DIR = os.path.dirname(__file__)
+DATA_DIR = os.path.join(BASE_DIR, '..', 'dataset', 'scraped-images-bs4')
+KERAS_PATH = os.path.join(BASE_DIR, 'api', 'model.keras')
+TFLITE_PATH = os.path.join(BASE_DIR, 'api', 'model.tflite')
+
+
+def split_generator(subset, batch_size=32):
+    # Same rescale and validation_split as train_model.py, so subset='validation'
+    # is the same held-out images. No augmentation, fixed order.
+    datagen = ImageDataGenerator(rescale=1./255, validation_split=0.2)
+    return datagen.flow_from_directory(
+        DATA_DIR,
+        target_size=(224, 224),
+        batch_size=batch_size,
+        class_mode='categorical',
+        subset=subset,
+        shuffle=False,
+    )
+
+
+def convert(model, quantize, calibration_batches):
+    # Export the embedding (input of the softmax layer) as a second output so
+    # duplicate detection works on the TFLite backend too.
+    model = tf.keras.Model(model.inputs, [model.output, model.layers[-1].input])
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if quantize == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantize == 'int8':
+        calib = split_generator('training', batch_size=1)
+
+        def representative_dataset():
+            for _ in range(min(calibration_batches, len(calib))):
+                images, _ = next(calib)
+                yield [images.astype(np.float32)]
+
+        # Full-integer kernels; float32 input/output so serving code is unchanged
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+
+    return converter.convert()
+
+
+def evaluate(keras_model, tflite_path):
+    from api.inference import TFLiteBackend
+
+    tflite_model = TFLiteBackend(tflite_path)
+    val = split_generator('validation')
+
+    keras_pred, tflite_pred, truth = [], [], []
+    keras_time = tflite_time = 0.0
+    for _ in range(len(val)):
+        images, labels = next(val)
+        images = images.astype(np.float32)
+
+        start = time.perf_counter()
+        keras_pred.append(np.argmax(keras_model.predict_on_batch(images), axis=1))
+        keras_time += time.perf_counter() - start
+
+        # Single-image calls, which is what a request without batching pays
+        start = time.perf_counter()
+        tflite_pred.append(np.array([
+            np.argmax(tflite_model.predict(images[i:i + 1])[0][0]) for i in range(len(images))
+        ]))
+        tflite_time += time.perf_counter() - start
+
+        truth.append(np.argmax(labels, axis=1))
+
+    keras_pred = np.concatenate(keras_pred)
+    tflite_pred = np.concatenate(tflite_pred)
+    truth = np.concatenate(truth)
+    n = len(truth)
+
+    keras_acc = float(np.mean(keras_pred == truth))
+    tflite_acc = float(np.mean(tflite_pred == truth))
+    return {
+        'validation_images': n,
+        'keras_accuracy': round(keras_acc, 4),
+        'tflite_accuracy': round(tflite_acc, 4),
+        'accuracy_delta': round(tflite_acc - keras_acc, 4),
+        'top1_agreement': round(float(np.mean(keras_pred == tflite_pred)), 4),
+        'keras_ms_per_image_batched': round(1000 * keras_time / n, 2),
+        'tflite_ms_per_image_single': round(1000 * tflite_time / n, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quantize', choices=['float16', 'int8'], default='float16')
+    parser.add_argument('--calibration-images', type=int, default=200,
+                        help="Training images used to calibrate int8 ranges.")
+    parser.add_argument('--skip-report', action='store_true', help="Export only; don't evaluate.")
+    args = parser.parse_args()
+
+    keras_model = load_model(KERAS_PATH)
+    print(f"✅ Loaded Keras model from {KERAS_PATH}")
+
+    tflite_bytes = convert(keras_model, args.quantize, args.calibration_images)
+    with open(TFLITE_PATH, 'wb') as f:
+        f.write(tflite_bytes)
+    print(f"✅ {args.quantize} TFLite model saved at: {TFLITE_PATH}")
+    print(f"   Size: {os.path.getsize(KERAS_PATH) / 1e6:.1f} MB -> {len(tflite_bytes) / 1e6:.1f} MB")
+
+    if args.skip_report:
+        return
+
+    report = {'quantize': args.quantize, **evaluate(keras_model, TFLITE_PATH)}
+    report_path = TFLITE_PATH + '.report.json'
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    for key, value in report.items():
+        print(f"   {key}: {value}")
+    print(f"✅ Accuracy report saved at: {report_path}")
+
+
+if __name__ == '__main__':
+    main()
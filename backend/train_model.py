@@ -1,56 +1,214 @@
+"""Train the issue image classifier (MobileNetV2 backbone + dense head).
+
+    python train_model.py                        # ImageDataGenerator input (default)
+    python train_model.py --pipeline tfdata      # tf.data: parallel decode, cache, prefetch
+    python train_model.py --pipeline tfdata --benchmark-batches 200   # time input only
+    python train_model.py --pipeline shards      # preprocessed shards from dataset_shards.py
+    python train_model.py --feature-cache        # head phase on precomputed backbone features
+
+All pipelines use the same train/validation split and class weights; each
+epoch prints its images/sec so they can be compared. The shards pipeline
+reads 224x224 uint8 images memory-mapped from dataset/shards/ (run
+`python dataset_shards.py` first, and again after new images arrive), so no
+JPEG is decoded during training.
+
+With --feature-cache the frozen backbone runs once over every image (plus a
+fixed number of augmented variants) and the head trains on the stored
+GlobalAveragePooling2D features. Fine-tuning is unchanged.
+"""
+import argparse
+import hashlib
+import json
 import os
+import time
 import numpy as np
 import joblib
+import tensorflow as tf
+from dataset_shards import ShardStore
 from sklearn.utils.class_weight import compute_class_weight
 from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from tensorflow.keras.optimizers import Adam
-from tensorflow.keras.models import Model
-from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Dropout
+from tensorflow.keras.models import Model, Sequential
+from tensorflow.keras.layers import (
+    Dense, GlobalAveragePooling2D, Dropout, Input, RandomFlip, RandomRotation, RandomZoom, Rescaling,
+)
+from tensorflow.keras.utils import to_categorical
 from tensorflow.keras.applications import MobileNetV2
-from tensorflow.keras.callbacks import ModelCheckpoint, EarlyStopping
+from tensorflow.keras.callbacks import Callback, ModelCheckpoint, EarlyStopping
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument('--pipeline', choices=['generator', 'tfdata', 'shards'], default='generator')
+parser.add_argument('--batch-size', type=int, default=16)
+parser.add_argument('--cache', default='memory',
+                    help="tf.data only: cache decoded images in 'memory', in files at this path prefix "
+                         "(delete them when the dataset changes), or 'none'.")
+parser.add_argument('--benchmark-batches', type=int, default=0,
+                    help="Only time N batches of the training input pipeline, then exit.")
+parser.add_argument('--feature-cache', action='store_true',
+                    help="Train the head on backbone features precomputed into feature_cache/.")
+parser.add_argument('--augment-variants', type=int, default=4,
+                    help="Feature cache: augmented copies stored per training image, besides the original.")
+args = parser.parse_args()
+if args.feature_cache and args.pipeline == 'shards':
+    parser.error("--feature-cache reads the image folders; use it with --pipeline generator or tfdata")
 
 # Paths and persistence locations
 DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'dataset', 'scraped-images-bs4')
 MODEL_SAVE_PATH = os.path.join(os.path.dirname(__file__), 'api', 'model.keras')
 CLASS_WEIGHT_PATH = os.path.join(os.path.dirname(__file__), 'api', 'class_weights.pkl')
 LABELS_PATH = os.path.join(os.path.dirname(__file__), 'api', 'class_labels.pkl')
+FEATURE_CACHE_DIR = os.path.join(os.path.dirname(__file__), 'feature_cache')
 
 # Ensure directories exist for saving artifacts
 os.makedirs(os.path.dirname(MODEL_SAVE_PATH), exist_ok=True)
 os.makedirs(os.path.dirname(CLASS_WEIGHT_PATH), exist_ok=True)
 os.makedirs(os.path.dirname(LABELS_PATH), exist_ok=True)
 
-# Discover class labels from directory names
-categories = sorted(os.listdir(DATA_DIR))
-num_classes = len(categories)
-print(f"✅ Classes found: {categories}")
-
-# Image generators with augmentation and train/val split
-datagen = ImageDataGenerator(
-    rescale=1./255,
-    validation_split=0.2,
-    rotation_range=20,
-    zoom_range=0.2,
-    horizontal_flip=True
-)
+if args.pipeline == 'shards':
+    # Same class order and per-class validation split as flow_from_directory;
+    # train_gen/val_gen are Splits carrying .classes and .samples
+    shard_store = ShardStore()
+    categories = shard_store.categories()
+    num_classes = len(categories)
+    print(f"✅ Classes found: {categories}")
+    train_gen, val_gen = shard_store.split(categories, validation_split=0.2)
+    print(f"✅ {train_gen.samples} training and {val_gen.samples} validation images "
+          f"in {len(shard_store.index['shards'])} shards")
+else:
+    # Discover class labels from directory names
+    categories = sorted(os.listdir(DATA_DIR))
+    num_classes = len(categories)
+    print(f"✅ Classes found: {categories}")
 
-# Training data generator
-train_gen = datagen.flow_from_directory(
-    DATA_DIR,
-    target_size=(224, 224),
-    batch_size=16,
-    class_mode='categorical',
-    subset='training'
-)
+    # Image generators with augmentation and train/val split
+    datagen = ImageDataGenerator(
+        rescale=1./255,
+        validation_split=0.2,
+        rotation_range=20,
+        zoom_range=0.2,
+        horizontal_flip=True
+    )
 
-# Validation data generator
-val_gen = datagen.flow_from_directory(
-    DATA_DIR,
-    target_size=(224, 224),
-    batch_size=16,
-    class_mode='categorical',
-    subset='validation'
-)
+    # Training data generator
+    train_gen = datagen.flow_from_directory(
+        DATA_DIR,
+        target_size=(224, 224),
+        batch_size=args.batch_size,
+        class_mode='categorical',
+        subset='training'
+    )
+
+    # Validation data generator
+    val_gen = datagen.flow_from_directory(
+        DATA_DIR,
+        target_size=(224, 224),
+        batch_size=args.batch_size,
+        class_mode='categorical',
+        subset='validation'
+    )
+
+# tf.data pipeline over the generators' own file lists, so the split is identical.
+# Files are read and decoded in parallel (out of order), decoded 224x224 images
+# are cached so later epochs skip JPEG decoding entirely, and augmentation runs
+# on whole batches with Keras preprocessing layers while the next batch loads.
+AUTOTUNE = tf.data.AUTOTUNE
+
+augment = Sequential([
+    RandomRotation(20 / 360),
+    RandomZoom(0.2),
+    RandomFlip('horizontal'),
+])
+rescale = Rescaling(1./255)
+
+
+def load_image(path, label):
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    # Nearest-neighbour, like flow_from_directory and the serving code
+    image = tf.image.resize(image, (224, 224), method='nearest')
+    return tf.cast(image, tf.uint8), tf.one_hot(label, num_classes)
+
+
+def make_dataset(gen, training):
+    ds = tf.data.Dataset.from_tensor_slices((gen.filepaths, gen.classes.astype(np.int32)))
+    ds = ds.map(load_image, num_parallel_calls=AUTOTUNE, deterministic=False)
+    if args.cache != 'none':
+        ds = ds.cache('' if args.cache == 'memory' else f"{args.cache}-{'train' if training else 'val'}")
+    return finish_dataset(ds, training)
+
+
+def finish_dataset(ds, training):
+    """Shuffle, batch, augment and rescale a dataset of (uint8 image, one-hot label)."""
+    if training:
+        ds = ds.shuffle(2048, reshuffle_each_iteration=True)
+    ds = ds.batch(args.batch_size)
+    if training:
+        ds = ds.map(lambda x, y: (augment(tf.cast(x, tf.float32), training=True), y), num_parallel_calls=AUTOTUNE)
+    ds = ds.map(lambda x, y: (rescale(tf.cast(x, tf.float32)), y), num_parallel_calls=AUTOTUNE)
+    return ds.prefetch(AUTOTUNE)
+
+
+def make_shard_dataset(split, training):
+    """Stream a Split's rows from the memory-mapped shards. Rows are read in
+    shard order in blocks (mostly sequential I/O); training visits the shards
+    in a new random order each epoch and the shuffle buffer mixes within them.
+    """
+    def rows():
+        shards = list(split.rows_by_shard)
+        if training:
+            np.random.shuffle(shards)
+        for shard in shards:
+            images = shard_store.shard(shard)
+            shard_rows, labels = split.rows_by_shard[shard]
+            for start in range(0, len(shard_rows), 256):
+                block = images[shard_rows[start:start + 256]]
+                yield from zip(block, labels[start:start + 256])
+
+    ds = tf.data.Dataset.from_generator(rows, output_signature=(
+        tf.TensorSpec((224, 224, 3), tf.uint8),
+        tf.TensorSpec((), tf.int32),
+    ))
+    ds = ds.map(lambda x, y: (x, tf.one_hot(y, num_classes)), num_parallel_calls=AUTOTUNE)
+    return finish_dataset(ds, training)
+
+
+if args.pipeline == 'tfdata':
+    train_data = make_dataset(train_gen, training=True)
+    val_data = make_dataset(val_gen, training=False)
+elif args.pipeline == 'shards':
+    train_data = make_shard_dataset(train_gen, training=True)
+    val_data = make_shard_dataset(val_gen, training=False)
+else:
+    train_data, val_data = train_gen, val_gen
+
+
+class ImagesPerSecond(Callback):
+    """Print training+validation images/sec for every epoch."""
+
+    def __init__(self, images_per_epoch):
+        super().__init__()
+        self.images_per_epoch = images_per_epoch
+        self.rates = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.started = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = time.perf_counter() - self.started
+        self.rates.append(self.images_per_epoch / elapsed)
+        print(f"   {args.pipeline}: {self.rates[-1]:.1f} images/sec ({elapsed:.1f}s epoch)")
+
+
+if args.benchmark_batches:
+    batches = iter(train_data if args.pipeline == 'generator' else train_data.repeat())
+    next(batches)  # exclude start-up (thread pools, first file reads)
+    start, images = time.perf_counter(), 0
+    for _ in range(args.benchmark_batches):
+        x, _ = next(batches)
+        images += len(x)
+    elapsed = time.perf_counter() - start
+    print(f"✅ {args.pipeline} input pipeline: {images / elapsed:.1f} images/sec "
+          f"({images} images in {elapsed:.1f}s, batch size {args.batch_size})")
+    raise SystemExit(0)
 
 # Compute balanced class weights to handle dataset imbalance
 labels = train_gen.classes
@@ -70,9 +228,9 @@ base_model.trainable = False
 
 x = base_model.output
 x = GlobalAveragePooling2D()(x)
-x = Dense(256, activation='relu')(x)
+x = Dense(256, activation='relu', name='head_hidden')(x)
 x = Dropout(0.5)(x)
-output = Dense(num_classes, activation='softmax')(x)
+output = Dense(num_classes, activation='softmax', name='head_output')(x)
 
 model = Model(inputs=base_model.input, outputs=output)
 model.compile(optimizer=Adam(learning_rate=0.001), loss='categorical_crossentropy', metrics=['accuracy'])
@@ -81,15 +239,123 @@ model.summary()
 # Checkpoint the best model and stop early 
 checkpoint = ModelCheckpoint(MODEL_SAVE_PATH, monitor='val_loss', save_best_only=True, verbose=1)
 early_stop = EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
+throughput = ImagesPerSecond(train_gen.samples + val_gen.samples)
 
-# Train the new head with frozen backbone
-history = model.fit(
-    train_gen,
-    epochs=30,
-    validation_data=val_gen,
-    class_weight=class_weights,
-    callbacks=[checkpoint, early_stop]
-)
+
+# Precomputed backbone features. The store is keyed by a fingerprint of the
+# image files (path, label, size, mtime), the backbone weights and the number
+# of variants; any change re-extracts it.
+def dataset_fingerprint():
+    digest = hashlib.sha256()
+    for gen in (train_gen, val_gen):
+        for path, label in zip(gen.filepaths, gen.classes):
+            stat = os.stat(path)
+            digest.update(f"{os.path.relpath(path, DATA_DIR)}|{label}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def backbone_fingerprint():
+    digest = hashlib.sha256(base_model.name.encode())
+    for weights in base_model.get_weights():
+        digest.update(np.ascontiguousarray(weights).tobytes())
+    return digest.hexdigest()
+
+
+def extract_features(gen, name, variants, extractor):
+    """Write backbone features for every image to <name>_features.npy, variant 0
+    unaugmented and the rest randomly augmented, with labels alongside.
+    """
+    n = len(gen.filepaths)
+    features = np.lib.format.open_memmap(
+        os.path.join(FEATURE_CACHE_DIR, f'{name}_features.npy'),
+        mode='w+', dtype=np.float16, shape=(n * variants, extractor.output_shape[-1]),
+    )
+    for variant in range(variants):
+        ds = tf.data.Dataset.from_tensor_slices((gen.filepaths, gen.classes.astype(np.int32)))
+        ds = ds.map(load_image, num_parallel_calls=AUTOTUNE).batch(64)
+        if variant > 0:
+            ds = ds.map(lambda x, y: (augment(tf.cast(x, tf.float32), training=True), y), num_parallel_calls=AUTOTUNE)
+        ds = ds.map(lambda x, y: rescale(tf.cast(x, tf.float32)), num_parallel_calls=AUTOTUNE).prefetch(AUTOTUNE)
+        row = variant * n
+        for images in ds:
+            batch = extractor(images, training=False).numpy()
+            features[row:row + len(batch)] = batch
+            row += len(batch)
+        print(f"   {name}: variant {variant + 1}/{variants} extracted")
+    features.flush()
+    np.save(os.path.join(FEATURE_CACHE_DIR, f'{name}_labels.npy'), np.tile(gen.classes, variants))
+
+
+def load_features():
+    os.makedirs(FEATURE_CACHE_DIR, exist_ok=True)
+    meta_path = os.path.join(FEATURE_CACHE_DIR, 'meta.json')
+    meta = {
+        'dataset': dataset_fingerprint(),
+        'backbone': backbone_fingerprint(),
+        'variants': 1 + args.augment_variants,
+    }
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            cached = json.load(f) == meta
+    else:
+        cached = False
+
+    if cached:
+        print(f"✅ Reusing backbone features from {FEATURE_CACHE_DIR}")
+    else:
+        start = time.perf_counter()
+        if os.path.exists(meta_path):
+            os.remove(meta_path)  # invalid until the new store is complete
+        extractor = Model(base_model.input, GlobalAveragePooling2D()(base_model.output))
+        extract_features(train_gen, 'train', meta['variants'], extractor)
+        extract_features(val_gen, 'val', 1, extractor)
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f)
+        print(f"✅ Backbone features extracted in {time.perf_counter() - start:.1f}s")
+
+    return [
+        np.load(os.path.join(FEATURE_CACHE_DIR, f'{name}.npy'), mmap_mode='r')
+        for name in ('train_features', 'train_labels', 'val_features', 'val_labels')
+    ]
+
+
+if args.feature_cache:
+    # Train the same head (same layer names) on the features, then copy its
+    # weights into the full model
+    train_x, train_y, val_x, val_y = load_features()
+    features_in = Input(shape=(train_x.shape[1],))
+    h = Dense(256, activation='relu', name='head_hidden')(features_in)
+    h = Dropout(0.5)(h)
+    head = Model(features_in, Dense(num_classes, activation='softmax', name='head_output')(h))
+    head.compile(optimizer=Adam(learning_rate=0.001), loss='categorical_crossentropy', metrics=['accuracy'])
+
+    start = time.perf_counter()
+    history = head.fit(
+        train_x,
+        to_categorical(train_y, num_classes),
+        batch_size=args.batch_size,
+        epochs=30,
+        shuffle=True,
+        validation_data=(val_x, to_categorical(val_y, num_classes)),
+        class_weight=class_weights,
+        callbacks=[EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)],
+    )
+    print(f"✅ Head trained on cached features in {time.perf_counter() - start:.1f}s")
+
+    for name in ('head_hidden', 'head_output'):
+        model.get_layer(name).set_weights(head.get_layer(name).get_weights())
+    model.save(MODEL_SAVE_PATH)
+    # Fine-tuning only overwrites the saved model if it beats the head
+    checkpoint.best = min(history.history['val_loss'])
+else:
+    # Train the new head with frozen backbone
+    history = model.fit(
+        train_data,
+        epochs=30,
+        validation_data=val_data,
+        class_weight=class_weights,
+        callbacks=[checkpoint, early_stop, throughput]
+    )
 
 # Fine-tune: unfreeze last ~50 layers of the backbone at a low LR
 base_model.trainable = True
@@ -99,11 +365,11 @@ for layer in base_model.layers[:-50]:
 model.compile(optimizer=Adam(learning_rate=1e-5), loss='categorical_crossentropy', metrics=['accuracy'])
 
 history_ft = model.fit(
-    train_gen,
+    train_data,
     epochs=15,
-    validation_data=val_gen,
+    validation_data=val_data,
     class_weight=class_weights,
-    callbacks=[checkpoint, early_stop]
+    callbacks=[checkpoint, early_stop, throughput]
 )
 
 # Persist artifacts for inference (class weights optional; labels needed)
@@ -111,4 +377,5 @@ joblib.dump(class_weights, CLASS_WEIGHT_PATH)
 joblib.dump(categories, LABELS_PATH)
 print(f"✅ Model saved at: {MODEL_SAVE_PATH}")
 print(f"✅ Class weights saved at: {CLASS_WEIGHT_PATH}")
-print(f"✅ Class labels saved at: {LABELS_PATH}")
\ No newline at end of file
+print(f"✅ Class labels saved at: {LABELS_PATH}")
+print(f"✅ {args.pipeline} pipeline: {np.mean(throughput.rates):.1f} images/sec on average over {len(throughput.rates)} epochs")
\ No newline at end of file
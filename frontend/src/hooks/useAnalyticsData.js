@@ -17,7 +17,7 @@ const useAnalyticsData = () => {
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const res = await fetch(`${BASE_URL}/api/public-issues/`);
+        const res = await fetch(`${BASE_URL}/api/public-issues/?fields=status,category,created_at,upvotes_count,comments_count`);
         if (!res.ok) throw new Error(`Failed to fetch issues: ${res.status}`);
 
         const issues = await res.json();
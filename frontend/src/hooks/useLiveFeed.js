@@ -0,0 +1,49 @@
+import { useEffect, useRef } from 'react';
+import api from '../api';
+
+// Same host as the REST API, ws:// or wss:// to match http:// or https://
+const WS_URL = api.defaults.baseURL.replace(/^http/, 'ws');
+const MAX_RETRY_MS = 30000;
+
+// Subscribes to the backend live feed: ws/issues/ for every issue, or
+// ws/issues/<issueId>/ for one. onIssues receives a list of
+// { issue_id, events, changes } whenever issues change; events are
+// 'created', 'status', 'priority', 'category', 'votes', 'comments', 'deleted'.
+// Reconnects with backoff, so pages can drop their polling.
+const useLiveFeed = (onIssues, issueId = null) => {
+  const handler = useRef(onIssues);
+  handler.current = onIssues;
+
+  useEffect(() => {
+    const path = issueId ? `/ws/issues/${issueId}/` : '/ws/issues/';
+    let socket = null;
+    let retryMs = 1000;
+    let timer = null;
+    let stopped = false;
+
+    const connect = () => {
+      socket = new WebSocket(`${WS_URL}${path}`);
+      socket.onopen = () => {
+        retryMs = 1000;
+      };
+      socket.onmessage = (e) => {
+        const data = JSON.parse(e.data);
+        if (data.type === 'issues') handler.current(data.issues);
+      };
+      socket.onclose = () => {
+        if (stopped) return;
+        timer = setTimeout(connect, retryMs);
+        retryMs = Math.min(retryMs * 2, MAX_RETRY_MS);
+      };
+    };
+
+    connect();
+    return () => {
+      stopped = true;
+      clearTimeout(timer);
+      if (socket) socket.close();
+    };
+  }, [issueId]);
+};
+
+export default useLiveFeed;
@@ -3,6 +3,7 @@ import api from "../api";
 import CommentsSection from "../components/CommentsSection";
 import styles from "../styles/CommunityIssues.module.css";
 import Navbar from "../components/Navbar";
+import useLiveFeed from "../hooks/useLiveFeed";
 import {
   FiCalendar,
   FiClock,
@@ -25,18 +26,24 @@ function CommunityIssues() {
     sortBy: "",
   });
 
+  const fetchIssues = async () => {
+    const resIssues = await api.get("/api/public-issues/");
+    const issuesData = resIssues.data.map(issue => ({
+      ...issue,
+      // Resized copies when the backend has built them, else the original
+      image: fixImageUrl(issue.image_variants?.medium?.jpeg || issue.image),
+      imageWebp: fixImageUrl(issue.image_variants?.medium?.webp),
+      upvotes_count: Number(issue.upvotes_count) || 0,
+      user_has_voted: Boolean(issue.user_has_voted),
+    }));
+    setIssues(issuesData);
+    return issuesData;
+  };
+
   useEffect(() => {
   const fetchIssuesAndComments = async () => {
     try {
-      const resIssues = await api.get("/api/public-issues/");
-      const issuesData = resIssues.data.map(issue => ({
-        ...issue,
-        image: fixImageUrl(issue.image),
-        upvotes_count: Number(issue.upvotes_count) || 0,
-        user_has_voted: Boolean(issue.user_has_voted),
-      }));
-
-      setIssues(issuesData);
+      const issuesData = await fetchIssues();
 
       const counts = {};
       await Promise.all(
@@ -58,6 +65,33 @@ function CommunityIssues() {
   fetchIssuesAndComments();
 }, []);
 
+  // Pushed changes from the backend instead of re-fetching the list
+  useLiveFeed((updates) => {
+    if (updates.some((u) => u.events.includes("created"))) {
+      fetchIssues().catch((error) => console.error("Error refreshing issues:", error));
+    }
+    const deleted = new Set(updates.filter((u) => u.events.includes("deleted")).map((u) => u.issue_id));
+    const byId = Object.fromEntries(updates.map((u) => [u.issue_id, u.changes]));
+    setIssues((prevIssues) =>
+      prevIssues
+        .filter((issue) => !deleted.has(issue.id))
+        .map((issue) => {
+          const changes = byId[issue.id];
+          if (!changes) return issue;
+          const fields = { ...changes };
+          delete fields.comments_count;
+          return { ...issue, ...fields };
+        })
+    );
+    setCommentCounts((prev) => {
+      const next = { ...prev };
+      updates.forEach((u) => {
+        if (u.changes.comments_count !== undefined) next[u.issue_id] = u.changes.comments_count;
+      });
+      return next;
+    });
+  });
+
 
   const fixImageUrl = (imageUrl) => {
     if (!imageUrl) return null;
@@ -221,14 +255,18 @@ function CommunityIssues() {
               }`}
             >
               {issue.image && (
-                <img
-                  src={issue.image}
-                  alt="Issue"
-                  className={styles.image}
-                  onError={(e) => {
-                    e.target.style.display = "none"; 
-                  }}
-                />
+                <picture>
+                  {issue.imageWebp && <source srcSet={issue.imageWebp} type="image/webp" />}
+                  <img
+                    src={issue.image}
+                    alt="Issue"
+                    className={styles.image}
+                    loading="lazy"
+                    onError={(e) => {
+                      e.target.style.display = "none"; 
+                    }}
+                  />
+                </picture>
               )}
 
               <div className={styles.details}>
@@ -2,6 +2,7 @@ import { Link, useNavigate } from "react-router-dom";
 import { useEffect, useState } from "react";
 import styles from "../styles/Home.module.css";
 import Symbol from "../assets/Symbol.png";
+import useLiveFeed from "../hooks/useLiveFeed";
 
 export default function Home() {
   const navigate = useNavigate();
@@ -21,12 +22,25 @@ export default function Home() {
     navigate("/");
   };
 
-  useEffect(() => {
+  const fetchActivities = () => {
     fetch("http://localhost:8000/api/recent-activity/") 
       .then((res) => res.json())
       .then((data) => setActivities(data))
       .catch((err) => console.error("Error fetching recent activity:", err));
-  }, []);
+  };
+
+  useEffect(fetchActivities, []);
+
+  // Re-fetch only when a new issue arrives or a shown one changes status
+  useLiveFeed((updates) => {
+    const shown = new Set(activities.map((a) => a.id));
+    const relevant = updates.some(
+      (u) =>
+        u.events.includes("created") ||
+        (shown.has(u.issue_id) && u.events.some((e) => ["status", "category", "deleted"].includes(e)))
+    );
+    if (relevant) fetchActivities();
+  });
 
   const getIcon = (category) => {
     switch (category) {
@@ -239,7 +239,17 @@ function MyIssuesPage() {
             <div key={issue.id} className={styles.issueCard}>
               <div className={styles.issueRow}>
                 {issue.image && (
-                  <img src={issue.image} alt="Issue" className={styles.issueImage} />
+                  <picture>
+                    {issue.image_variants?.thumb && (
+                      <source srcSet={issue.image_variants.thumb.webp} type="image/webp" />
+                    )}
+                    <img
+                      src={issue.image_variants?.thumb?.jpeg || issue.image}
+                      alt="Issue"
+                      className={styles.issueImage}
+                      loading="lazy"
+                    />
+                  </picture>
                 )}
 
                 <div className={styles.issueDetails}>
@@ -1,8 +1,29 @@
+"""Scrape Bing image results into dataset/scraped-images-bs4/<category>/.
+
+    python scraper.py                         # all categories
+    python scraper.py --categories road water --max-images 100
+    python scraper.py --search-url 'http://127.0.0.1:8000/search?q={query}&first={first}'
+
+Search pages and images are fetched concurrently over one pooled session,
+with at most --per-host requests in flight to any single host. Every image
+URL is recorded in a SQLite manifest (category, query, status, SHA-256,
+file), so an interrupted run picks up where it stopped and a re-run only
+fetches what is missing. Files are named by content hash, and byte-identical
+images (including ones already in the dataset folders) are stored once.
+"""
+import argparse
+import hashlib
 import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote, urlsplit
+
 import requests
 from bs4 import BeautifulSoup
-from urllib.parse import quote
-import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 categories = {
     "road": ["pothole on road", "damaged road surface", "road damage"],
@@ -13,59 +34,307 @@ categories = {
 }
 
 output_dir = os.path.join("dataset", "scraped-images-bs4")
-os.makedirs(output_dir, exist_ok=True)
 
-def scrape_bing_images(query, folder, start_count, max_images=50):
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
-    count = 0
-    page = 0
+SEARCH_URL = "https://www.bing.com/images/search?q={query}&first={first}&FORM=HDRSC2"
+HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
+RESULTS_PER_PAGE = 35
+MIN_IMAGE_BYTES = 5000
 
-    while count < max_images and page < 5:
-        start = page * 35
-        search_url = f"https://www.bing.com/images/search?q={quote(query)}&first={start}&FORM=HDRSC2"
-        print(f"🔎 Fetching: {search_url}")
+# Manifest statuses that are final: the URL is never fetched again
+DONE, DUPLICATE, TOO_SMALL, ERROR = 'done', 'duplicate', 'too_small', 'error'
+FINAL_STATUSES = (DONE, DUPLICATE, TOO_SMALL)
 
-        try:
-            response = requests.get(search_url, headers=headers)
-            soup = BeautifulSoup(response.text, "html.parser")
-            image_tags = soup.find_all("img")
-
-            for img in image_tags:
-                if count >= max_images:
-                    break
-                img_url = img.get("src") or img.get("data-src")
-                if img_url and img_url.startswith("http"):
-                    try:
-                        img_resp = requests.get(img_url, timeout=5)
-                        if len(img_resp.content) < 5000:
-                            continue
-                        filename = os.path.join(folder, f"{start_count + count}.jpg")
-                        with open(filename, "wb") as f:
-                            f.write(img_resp.content)
-                        print(f"✅ Saved: {filename}")
-                        count += 1
-                    except Exception as e:
-                        print(f"❌ Error downloading image: {e}")
 
+class Manifest:
+    """SQLite record of every image URL seen, shared by the worker threads."""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS images ("
+                " url TEXT PRIMARY KEY, category TEXT, query TEXT, status TEXT,"
+                " sha256 TEXT, path TEXT, bytes INTEGER, error TEXT, fetched_at REAL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS images_sha256 ON images (sha256)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS images_path ON images (path)")
+
+    def _one(self, sql, params):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchone()
+
+    def status(self, url):
+        row = self._one("SELECT status FROM images WHERE url = ?", (url,))
+        return row[0] if row else None
+
+    def has_path(self, path):
+        return self._one("SELECT 1 FROM images WHERE path = ?", (path,)) is not None
+
+    def saved_count(self, category, query):
+        return self._one(
+            "SELECT COUNT(*) FROM images WHERE category = ? AND query = ? AND status = ?",
+            (category, query, DONE),
+        )[0]
+
+    def record(self, url, category, query, status, sha256=None, path=None, size=None, error=None):
+        with self.lock, self.conn:
+            self._upsert(url, category, query, status, sha256, path, size, error)
+
+    def claim(self, url, category, query, sha256, path, size):
+        """Record a downloaded image unless the same bytes are already stored.
+        Returns the existing file's path for a duplicate, else None.
+        """
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT path FROM images WHERE sha256 = ? AND status = ?", (sha256, DONE)
+            ).fetchone()
+            if row:
+                self._upsert(url, category, query, DUPLICATE, sha256, row[0], size, None)
+                return row[0]
+            self._upsert(url, category, query, DONE, sha256, path, size, None)
+            return None
+
+    def _upsert(self, url, category, query, status, sha256, path, size, error):
+        self.conn.execute(
+            "INSERT INTO images (url, category, query, status, sha256, path, bytes, error, fetched_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(url) DO UPDATE SET category = excluded.category, query = excluded.query,"
+            " status = excluded.status, sha256 = excluded.sha256, path = excluded.path,"
+            " bytes = excluded.bytes, error = excluded.error, fetched_at = excluded.fetched_at",
+            (url, category, query, status, sha256, path, size, error, time.time()),
+        )
+
+    def summary(self):
+        with self.lock:
+            return dict(self.conn.execute("SELECT status, COUNT(*) FROM images GROUP BY status").fetchall())
+
+
+def make_session(pool_size):
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    retries = Retry(total=2, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class Scraper:
+    def __init__(self, manifest, out_dir=output_dir, search_url=SEARCH_URL, workers=16, per_host=4,
+                 timeout=10, max_images=50, pages=5):
+        self.manifest = manifest
+        self.out_dir = out_dir
+        self.search_url = search_url
+        self.workers = workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.max_images = max_images
+        self.pages = pages
+        self.session = make_session(workers)
+        self._host_slots = {}
+        self._lock = threading.Lock()
+        self._quota = threading.Lock()
+        self._remaining = {}  # (category, query) -> images still wanted
+        self._in_flight = {}  # (category, query) -> downloads holding a slot
+        self._deferred = {}  # (category, query) -> URLs waiting for a slot to be handed back
+        self.bytes_downloaded = 0
+
+    def _slot(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_slots[host]
+
+    def get(self, url):
+        with self._slot(url):
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            with self._lock:
+                self.bytes_downloaded += len(response.content)
+            return response
+
+    def search(self, query, page):
+        """Image URLs on one page of search results."""
+        url = self.search_url.format(query=quote(query), first=page * RESULTS_PER_PAGE)
+        print(f"🔎 Fetching: {url}")
+        try:
+            soup = BeautifulSoup(self.get(url).text, "html.parser")
         except Exception as e:
             print(f"❌ Error fetching page: {e}")
+            return []
+        urls = []
+        for img in soup.find_all("img"):
+            img_url = img.get("src") or img.get("data-src")
+            if img_url and img_url.startswith("http"):
+                urls.append(img_url)
+        return urls
 
-        page += 1
-        time.sleep(1)
+    def _reserve(self, key, url):
+        """Reserve one of the query's remaining image slots. While every slot
+        is held by an in-flight download, park the URL instead of the worker:
+        that download may still turn out too small or a duplicate, and then
+        its worker fetches the parked URL (see _release).
+        """
+        with self._quota:
+            if self._remaining[key] > 0:
+                self._remaining[key] -= 1
+                self._in_flight[key] = self._in_flight.get(key, 0) + 1
+                return True
+            if self._in_flight.get(key, 0):
+                self._deferred.setdefault(key, []).append(url)
+            return False
 
-    print(f"✅ Finished '{query}' with {count} images\n")
-    return count
+    def _release(self, key, saved):
+        """Hand the slot back unless the image was saved. Returns a parked
+        URL to fetch with the returned slot, or None.
+        """
+        with self._quota:
+            self._in_flight[key] -= 1
+            if not saved:
+                self._remaining[key] += 1
+                if self._deferred.get(key):
+                    return self._deferred[key].pop()
+            elif self._remaining[key] <= 0 and not self._in_flight[key]:
+                self._deferred.pop(key, None)  # quota met: the parked URLs aren't needed
+            return None
 
-if __name__ == "__main__":
-    for category, query_list in categories.items():
-        category_folder = os.path.join(output_dir, category)
-        os.makedirs(category_folder, exist_ok=True)
+    def download(self, url, category, query):
+        """Fetch `url`, then any URLs of the query parked while it was in
+        flight. Returns the statuses of the images fetched.
+        """
+        key = (category, query)
+        statuses = []
+        while url is not None and self._reserve(key, url):
+            status = ERROR
+            try:
+                status = self._fetch_image(url, category, query)
+            finally:
+                url = self._release(key, saved=status == DONE)
+            statuses.append(status)
+        return statuses
+
+    def _fetch_image(self, url, category, query):
+        try:
+            content = self.get(url).content
+        except Exception as e:
+            self.manifest.record(url, category, query, ERROR, error=str(e)[:500])
+            print(f"❌ Error downloading image: {e}")
+            return ERROR
+
+        if len(content) < MIN_IMAGE_BYTES:
+            self.manifest.record(url, category, query, TOO_SMALL, size=len(content))
+            return TOO_SMALL
+
+        sha256 = hashlib.sha256(content).hexdigest()
+        path = os.path.join(self.out_dir, category, f"{sha256[:20]}.jpg")
+        # The file is in place before the manifest says DONE, so a crash in
+        # between only costs a re-fetch on the next run
+        tmp_path = f"{path}.{threading.get_ident()}.part"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            self.manifest.record(url, category, query, ERROR, sha256=sha256, size=len(content), error=str(e)[:500])
+            print(f"❌ Error saving image: {e}")
+            return ERROR
 
-        current_image_count = len(os.listdir(category_folder))
-        print(f"\n🎯 Category: {category} | Starting from image: {current_image_count}")
+        existing = self.manifest.claim(url, category, query, sha256, path, len(content))
+        if existing is not None:
+            # Same bytes stored under another name (an older file or another
+            # category); the same name is the same file and stays
+            if os.path.abspath(existing) != os.path.abspath(path):
+                os.remove(path)
+            return DUPLICATE
+        print(f"✅ Saved: {path}")
+        return DONE
 
-        for q in query_list:
-            downloaded = scrape_bing_images(q, category_folder, start_count=current_image_count, max_images=50)
-            current_image_count += downloaded
+    def index_existing(self, category):
+        """Hash files already in the category folder (e.g. from older runs) so
+        byte-identical downloads are skipped.
+        """
+        folder = os.path.join(self.out_dir, category)
+        for name in sorted(os.listdir(folder)):
+            path = os.path.join(folder, name)
+            if not os.path.isfile(path) or name.endswith(".part") or self.manifest.has_path(path):
+                continue
+            with open(path, "rb") as f:
+                content = f.read()
+            self.manifest.claim(f"file:{path}", category, "", hashlib.sha256(content).hexdigest(), path, len(content))
 
-    print("\n🎉 BS4 Bing Scraping Complete!")
+    def run(self, selected):
+        started = time.perf_counter()
+        totals = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pages = {}
+            for category, queries in selected.items():
+                os.makedirs(os.path.join(self.out_dir, category), exist_ok=True)
+                self.index_existing(category)
+                for query in queries:
+                    remaining = self.max_images - self.manifest.saved_count(category, query)
+                    self._remaining[(category, query)] = remaining
+                    if remaining <= 0:
+                        print(f"✅ '{query}' already has {self.max_images} images")
+                        continue
+                    for page in range(self.pages):
+                        pages[pool.submit(self.search, query, page)] = (category, query)
+
+            images, seen = [], set()
+            for future in as_completed(pages):
+                category, query = pages[future]
+                for url in future.result():
+                    if url in seen or self.manifest.status(url) in FINAL_STATUSES:
+                        continue
+                    seen.add(url)
+                    images.append(pool.submit(self.download, url, category, query))
+
+            for future in as_completed(images):
+                for status in future.result():
+                    totals[status] = totals.get(status, 0) + 1
+
+        elapsed = time.perf_counter() - started
+        megabytes = self.bytes_downloaded / 1e6
+        print(f"\n🎉 Scraping complete in {elapsed:.1f}s: {totals or 'nothing new'}")
+        print(f"   {megabytes:.1f} MB downloaded ({megabytes / elapsed:.2f} MB/s)")
+        return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--categories", nargs="+", choices=sorted(categories), default=sorted(categories))
+    parser.add_argument("--max-images", type=int, default=50, help="Images to keep per search query.")
+    parser.add_argument("--pages", type=int, default=5, help="Result pages fetched per query.")
+    parser.add_argument("--workers", type=int, default=16, help="Concurrent requests overall.")
+    parser.add_argument("--per-host", type=int, default=4, help="Concurrent requests to any one host.")
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--output-dir", default=output_dir)
+    parser.add_argument("--manifest", help="Manifest path (default: scraper-manifest.sqlite3 next to --output-dir).")
+    parser.add_argument("--search-url", default=SEARCH_URL,
+                        help="Search page template with {query} and {first}; point it at a local stand-in to test.")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    # Kept outside the output folder: train_model.py reads every entry there as a class
+    default_manifest = os.path.join(os.path.dirname(os.path.abspath(args.output_dir)), "scraper-manifest.sqlite3")
+    manifest = Manifest(args.manifest or default_manifest)
+    scraper = Scraper(
+        manifest,
+        out_dir=args.output_dir,
+        search_url=args.search_url,
+        workers=args.workers,
+        per_host=args.per_host,
+        timeout=args.timeout,
+        max_images=args.max_images,
+        pages=args.pages,
+    )
+    scraper.run({category: categories[category] for category in args.categories})
+    print(f"   Manifest: {manifest.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Tests for scraper.py against a local http.server stand-in for the search
+engine and image hosts.
+
+    python -m unittest test_scraper
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import scraper
+
+# /img/<n> bodies: 0 is too small, 1 and 2 are byte-identical
+IMAGES = {n: b"x" * 6000 + str(n).encode() for n in range(1, 7)}
+IMAGES[0] = b"tiny"
+IMAGES[2] = IMAGES[1]
+
+
+class StandIn(BaseHTTPRequestHandler):
+    image_requests = []
+
+    def do_GET(self):
+        if self.path.startswith("/search"):
+            base = f"http://127.0.0.1:{self.server.server_port}"
+            body = "".join(f'<img src="{base}/img/{n}">' for n in sorted(IMAGES)).encode()
+            if "first=0" not in self.path:
+                body = b"<html></html>"
+        elif self.path.startswith("/img/"):
+            StandIn.image_requests.append(self.path)
+            body = IMAGES[int(self.path.rsplit("/", 1)[1])]
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ScraperTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.search_url = f"http://127.0.0.1:{cls.server.server_port}/search?q={{query}}&first={{first}}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.out_dir = os.path.join(self.tmp, "images")
+        StandIn.image_requests.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def run_scraper(self, max_images=3):
+        manifest = scraper.Manifest(os.path.join(self.tmp, "manifest.sqlite3"))
+        s = scraper.Scraper(manifest, out_dir=self.out_dir, search_url=self.search_url,
+                            workers=4, per_host=2, max_images=max_images, pages=2)
+        s.run({"road": ["pothole"]})
+        return manifest
+
+    def done_rows(self, manifest):
+        with manifest.lock:
+            return manifest.conn.execute("SELECT path FROM images WHERE status = ?", (scraper.DONE,)).fetchall()
+
+    def stored_files(self):
+        folder = os.path.join(self.out_dir, "road")
+        return sorted(name for name in os.listdir(folder))
+
+    def test_quota_is_exact_and_every_done_row_has_its_file(self):
+        manifest = self.run_scraper(max_images=3)
+        rows = self.done_rows(manifest)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(len(self.stored_files()), 3)
+        for (path,) in rows:
+            self.assertTrue(os.path.isfile(path), path)
+
+    def test_duplicates_are_stored_once(self):
+        manifest = self.run_scraper(max_images=10)
+        self.assertEqual(manifest.summary().get(scraper.DUPLICATE), 1)
+        self.assertEqual(manifest.summary().get(scraper.TOO_SMALL), 1)
+        self.assertEqual(len(self.stored_files()), 5)
+
+    def test_second_run_fetches_nothing(self):
+        self.run_scraper(max_images=3)
+        StandIn.image_requests.clear()
+        self.run_scraper(max_images=3)
+        self.assertEqual(StandIn.image_requests, [])
+
+    def test_failed_write_is_not_recorded_done(self):
+        real_replace = os.replace
+        name = f"{hashlib.sha256(IMAGES[3]).hexdigest()[:20]}.jpg"
+
+        def replace(src, dst):
+            if os.path.basename(dst) == name:
+                raise OSError("disk full")
+            return real_replace(src, dst)
+
+        with mock.patch("scraper.os.replace", side_effect=replace):
+            manifest = self.run_scraper(max_images=10)
+        self.assertEqual(len(self.done_rows(manifest)), 4)
+        self.assertFalse([name for name in self.stored_files() if name.endswith(".part")])
+
+        # The next run fetches the image that failed
+        manifest = self.run_scraper(max_images=10)
+        self.assertEqual(len(self.done_rows(manifest)), 5)
+        self.assertEqual(len(self.stored_files()), 5)
+
+    def test_crash_after_write_refetches_on_resume(self):
+        real_claim = scraper.Manifest.claim
+        first = threading.Lock()
+
+        def claim(manifest, *args):
+            if first.acquire(blocking=False):
+                # The process dies between writing the file and recording it
+                raise KeyboardInterrupt
+            return real_claim(manifest, *args)
+
+        with mock.patch.object(scraper.Manifest, "claim", claim):
+            with self.assertRaises(KeyboardInterrupt):
+                self.run_scraper(max_images=3)
+
+        manifest = self.run_scraper(max_images=3)
+        rows = self.done_rows(manifest)
+        self.assertEqual(len(rows), 3)
+        for (path,) in rows:
+            self.assertTrue(os.path.isfile(path), path)
+
+    def test_full_quota_parks_the_url_instead_of_the_worker(self):
+        s = scraper.Scraper(mock.Mock(), out_dir=self.out_dir)
+        key = ("road", "pothole")
+        s._remaining[key] = 1
+        self.assertTrue(s._reserve(key, "http://a/1"))
+        # Returns at once; the URL waits for the in-flight download's outcome
+        self.assertFalse(s._reserve(key, "http://a/2"))
+        self.assertEqual(s._release(key, saved=False), "http://a/2")
+        self.assertTrue(s._reserve(key, "http://a/2"))
+        self.assertIsNone(s._release(key, saved=True))
+        self.assertFalse(s._reserve(key, "http://a/3"))
+
+
+if __name__ == "__main__":
+    unittest.main()